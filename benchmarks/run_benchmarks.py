@@ -0,0 +1,521 @@
+"""
+Headless benchmarks for FocusView's hot paths.
+
+Runs under the offscreen Qt platform with the fake idle backend and a recorded
+calendar fixture served by a local stub HTTP server, and prints the results as
+JSON so they can be compared between runs:
+
+    python benchmarks/run_benchmarks.py --output bench.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calendar_fixture.json')
+STUB_PAGE_SIZE = 25
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('FOCUSVIEW_IDLE_BACKEND', 'fake')
+sys.path.insert(0, REPO_ROOT)
+
+from PyQt6.QtCore import QT_VERSION_STR, QSize
+from google.oauth2.credentials import Credentials
+
+import calendar_service
+import idle_monitor
+import main
+import painted_overlay
+import screensaver_window
+from memory_stats import resident_memory_bytes
+from event_cache import EventCache
+from event_model import CalendarEvent
+from painted_overlay import PaintedScreensaverWindow
+from screensaver_window import ScreensaverWindow
+from state_store import AppState
+
+
+# --- Fixture & stub server ---
+
+def load_fixture_items():
+    """
+    Returns the recorded event resources, moved forward by whole days so the
+    recording day becomes today. Whole days keep all-day events valid.
+    """
+    with open(FIXTURE_FILE, 'r', encoding='utf-8') as f:
+        fixture = json.load(f)
+    recorded_day = datetime.datetime.fromisoformat(fixture['recorded_at']).date()
+    shift = datetime.timedelta(days=(datetime.date.today() - recorded_day).days)
+
+    def shifted(time_info):
+        if 'dateTime' in time_info:
+            moved = datetime.datetime.fromisoformat(time_info['dateTime']) + shift
+            return dict(time_info, dateTime=moved.isoformat())
+        moved = datetime.date.fromisoformat(time_info['date']) + shift
+        return dict(time_info, date=moved.isoformat())
+
+    return [
+        dict(item, start=shifted(item['start']), end=shifted(item['end']))
+        for item in fixture['response']['items']
+    ]
+
+
+def start_stub_server(items):
+    """
+    Serves calendarList, events().list (with pagination, sync tokens and ETags) and
+    batch requests on a free local port. server.calendar_ids selects how many calendars
+    exist; the fixture events are spread across them round-robin.
+    """
+
+    def list_events(calendar_id, query, if_none_match):
+        calendar_ids = server.calendar_ids
+        if calendar_id not in calendar_ids:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        calendar_items = items[calendar_ids.index(calendar_id)::len(calendar_ids)]
+        # The fixture never changes, so a calendar's ETag only depends on its id.
+        etag = f'"stub-{calendar_id}"'
+        if 'syncToken' in query:
+            if if_none_match == etag:
+                return 304, None
+            return 200, {'kind': 'calendar#events', 'etag': etag, 'items': [], 'nextSyncToken': 'stub-delta'}
+        offset = int(query.get('pageToken', ['0'])[0])
+        body = {'kind': 'calendar#events', 'items': calendar_items[offset:offset + STUB_PAGE_SIZE]}
+        if offset + STUB_PAGE_SIZE < len(calendar_items):
+            body['nextPageToken'] = str(offset + STUB_PAGE_SIZE)
+        else:
+            body['nextSyncToken'] = 'stub-full'
+            body['etag'] = etag
+        return 200, body
+
+    def route(path, if_none_match=None):
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if parts[-3:] == ['users', 'me', 'calendarList']:
+            entries = [
+                {'id': calendar_id, 'selected': True, 'primary': index == 0}
+                for index, calendar_id in enumerate(server.calendar_ids)
+            ]
+            return 200, {'kind': 'calendar#calendarList', 'items': entries}
+        if len(parts) >= 3 and parts[-3] == 'calendars' and parts[-1] == 'events':
+            return list_events(unquote(parts[-2]), query, if_none_match)
+        return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+
+    class StubCalendarHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so the client's connection reuse is part of what gets measured.
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes; without this, Nagle plus delayed ACKs add ~40 ms per call.
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            status, body = route(self.path, self.headers['If-None-Match'])
+            if body is None:
+                self._send(status, None, b'')
+            else:
+                self._send(status, 'application/json; charset=UTF-8', json.dumps(body).encode('utf-8'))
+
+        def do_POST(self):
+            """Answers a multipart/mixed batch request by routing each embedded GET."""
+            content_type = self.headers['Content-Type']
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            message = BytesParser().parsebytes(
+                f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body
+            )
+            boundary = 'stub-batch-boundary'
+            chunks = []
+            for part in message.get_payload():
+                request_line, *header_lines = part.get_payload().split('\r\n\r\n')[0].splitlines()
+                headers = dict(line.split(': ', 1) for line in header_lines if ': ' in line)
+                status, response = route(request_line.split(' ')[1], headers.get('If-None-Match'))
+                content_id = part['Content-ID'].strip('<>')
+                chunks.append(
+                    f'--{boundary}\r\n'
+                    'Content-Type: application/http\r\n'
+                    f'Content-ID: <response-{content_id}>\r\n\r\n'
+                    f'HTTP/1.1 {status} OK\r\n'
+                )
+                if response is None:
+                    chunks.append('Content-Length: 0\r\n\r\n\r\n')
+                else:
+                    chunks.append(
+                        'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                        f'{json.dumps(response)}\r\n'
+                    )
+            payload = (''.join(chunks) + f'--{boundary}--\r\n').encode('utf-8')
+            self._send(200, f'multipart/mixed; boundary={boundary}', payload)
+
+        def _send(self, status, content_type, payload):
+            self.send_response(status)
+            if content_type is not None:
+                self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubCalendarHandler)
+    server.calendar_ids = ['primary']
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class PaintRecordingWindow(ScreensaverWindow):
+    """ScreensaverWindow that remembers when its first frame after a reset finished painting."""
+    painted_at = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.painted_at is None:
+            self.painted_at = time.perf_counter()
+
+
+# --- Helpers ---
+
+def summarize(samples_seconds):
+    samples = sorted(s * 1000 for s in samples_seconds)
+    return {
+        'runs': len(samples),
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def make_events(items, count, id_prefix):
+    """Builds 'count' CalendarEvent records from the fixture, cycling it if needed."""
+    events = []
+    for index in range(count):
+        item = dict(items[index % len(items)], id=f'{id_prefix}{index}')
+        events.append(CalendarEvent.from_api(item))
+    events.sort(key=lambda event: event.start)
+    return events
+
+
+# --- Benchmarks ---
+
+def _resident_mb():
+    size = resident_memory_bytes()
+    return None if size is None else round(size / (1024 * 1024), 1)
+
+def bench_memory():
+    """
+    Resident memory at startup (before the overlay is built), with the 1080p
+    overlay visible, hidden, and released by dormant mode. Measured in a fresh
+    process, so what the other benchmarks allocated doesn't count towards any state.
+    """
+    probe = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--memory-probe'],
+        stdout=subprocess.PIPE, text=True, check=True,
+    )
+    return json.loads(probe.stdout)
+
+
+def probe_memory(items, work_dir):
+    """The --memory-probe process: takes one controller through the states, collecting garbage before each sample."""
+    # An empty cache in the work directory, so the user's own event cache can't skew the numbers.
+    calendar_service._cache = EventCache(os.path.join(work_dir, 'event_cache.json'))
+    controller = main.AppController(state=AppState(os.path.join(work_dir, 'state.jsonl')))
+
+    def sample():
+        controller.app.processEvents()
+        gc.collect()
+        return _resident_mb()
+
+    try:
+        results = {'startup': sample()}
+        overlay = controller.ensure_overlay()
+        overlay.update_events(make_events(items, 10, 'memory'))
+        window = overlay.primary
+        window.resize(1920, 1080)
+        window.show()
+        controller.app.processEvents()
+        window.repaint()
+        results['visible'] = sample()
+        window.hide()
+        results['hidden'] = sample()
+        controller.enter_dormant()
+        results['dormant'] = sample()
+    finally:
+        controller.fetcher.stop()
+    return results
+
+
+def bench_fetch(server, stub_url, work_dir, repeat):
+    """
+    End-to-end get_upcoming_events against the stub server: full sync and delta
+    sync (answered 304 Not Modified), for a single calendar and for several calendars fetched in one batch.
+    """
+    token_file = os.path.join(work_dir, 'token.json')
+    with open(token_file, 'w') as f:
+        f.write('{}')
+    cache_file = os.path.join(work_dir, 'event_cache.json')
+    calendar_service.TOKEN_FILE = token_file
+    calendar_service._client = calendar_service.CalendarClient(
+        credentials=Credentials(token='benchmark'), api_endpoint=stub_url
+    )
+
+    def full_sync():
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        calendar_service._cache = EventCache(cache_file)
+        delta_sync()
+
+    def delta_sync():
+        # Every call should reach the stub, not be answered from the refresh interval.
+        calendar_service.get_fetch_policy().reset()
+        calendar_service.get_upcoming_events()
+
+    results = {}
+    for calendar_ids in (['primary'], ['primary', 'team', 'rooms', 'on-call']):
+        server.calendar_ids = calendar_ids
+        full = timed(full_sync, repeat)
+        delta = timed(delta_sync, repeat)
+        results[f'{len(calendar_ids)}_calendars'] = {
+            'full_sync': full,
+            'delta_sync': delta,
+            'events_returned': len(calendar_service.get_cached_events()),
+        }
+    return results
+
+
+def bench_show_latency(controller, repeat):
+    """
+    Time from the fake backend crossing the threshold to the first painted overlay
+    frame, with the window prewarmed as it is by the time the threshold is reached.
+    """
+    backend = idle_monitor.FakeIdleBackend(supports_notifications=True)
+    controller.idle_backend = backend
+    backend.start_notifications(main.IDLE_THRESHOLD_SECONDS, controller.check_idle_status, controller.check_idle_status)
+    controller.prewarm()
+    controller.app.processEvents()
+    window = controller.overlay.primary
+    fade = controller.overlay.fade
+
+    def wait_until_hidden():
+        # Each show must start from a hidden window; reversing a running fade-out paints nothing new.
+        deadline = time.perf_counter() + 5
+        while (fade.metrics is not None or window.isVisible()) and time.perf_counter() < deadline:
+            controller.app.processEvents()
+
+    samples = []
+    for _ in range(repeat + 1):
+        backend.simulate_input()
+        wait_until_hidden()
+        window.painted_at = None
+
+        start = time.perf_counter()
+        backend.set_idle_time(main.IDLE_THRESHOLD_SECONDS)
+        deadline = start + 5
+        while window.painted_at is None and time.perf_counter() < deadline:
+            controller.app.processEvents()
+        if window.painted_at is None:
+            raise RuntimeError("The overlay was never painted.")
+        samples.append(window.painted_at - start)
+
+    backend.simulate_input()
+    controller.app.processEvents()
+    return {'first_show_ms': round(samples[0] * 1000, 3), 'repeat_show': summarize(samples[1:])}
+
+
+def bench_fade(controller, repeat):
+    """Frame pacing of the fade-in and fade-out, driven through the fake backend like a real show and hide."""
+    backend = controller.idle_backend
+    fade = controller.overlay.fade
+
+    def wait_for(direction):
+        deadline = time.perf_counter() + 5
+        while fade.direction == direction and fade.metrics is not None and time.perf_counter() < deadline:
+            controller.app.processEvents()
+        return fade.last_metrics[direction]
+
+    samples = {'in': [], 'out': []}
+    for _ in range(repeat):
+        backend.set_idle_time(main.IDLE_THRESHOLD_SECONDS)
+        samples['in'].append(wait_for('in'))
+        backend.simulate_input()
+        samples['out'].append(wait_for('out'))
+
+    return {
+        direction: {
+            'frames': round(statistics.fmean(m['frames'] for m in runs), 1),
+            'worst_frame_ms': max(m['worst_frame_ms'] for m in runs),
+            'dropped_frames': sum(m['dropped_frames'] for m in runs),
+        }
+        for direction, runs in samples.items()
+    }
+
+
+def bench_update_events(controller, items, repeat):
+    """update_events cost while visible, both for changed and for unchanged event lists."""
+    window = controller.overlay.primary
+    window.resize(1920, 1080)
+    window.show()
+    controller.app.processEvents()
+
+    results = {}
+    for count in (0, 5, 50):
+        first = make_events(items, count, 'a')
+        second = make_events(items, count, 'b')
+        lists = [first, second]
+
+        def changed(state={'index': 0}):
+            state['index'] ^= 1
+            window.update_events(lists[state['index']])
+            controller.app.processEvents()
+
+        def unchanged():
+            window.update_events(first)
+            controller.app.processEvents()
+
+        results[str(count)] = {'changed': timed(changed, repeat), 'unchanged': timed(unchanged, repeat)}
+
+    window.hide()
+    controller.app.processEvents()
+    return results
+
+
+def bench_paint(controller, repeat):
+    """paintEvent cost of the whole window at 1080p and 4K, with a cold and a warm background cache."""
+    window = controller.overlay.primary
+    window.show()
+    results = {}
+    for name, size in (('1080p', QSize(1920, 1080)), ('4k', QSize(3840, 2160))):
+        window.resize(size)
+        controller.app.processEvents()
+
+        window.background_cache.invalidate()
+        start = time.perf_counter()
+        window.repaint()
+        cold = time.perf_counter() - start
+
+        results[name] = {'cold_cache_ms': round(cold * 1000, 3), 'warm': timed(window.repaint, repeat)}
+    window.hide()
+    controller.app.processEvents()
+    return results
+
+
+def bench_painted(controller, repeat):
+    """
+    The same measurements for the painted render mode, plus a clock tick, which
+    only repaints the clock's own rect.
+    """
+    window = PaintedScreensaverWindow()
+    window.update_events(controller.current_events)
+    window.show()
+    results = {}
+    for name, size in (('1080p', QSize(1920, 1080)), ('4k', QSize(3840, 2160))):
+        window.resize(size)
+        controller.app.processEvents()
+
+        window.background_cache.invalidate()
+        painted_overlay._card_cache.clear()
+        start = time.perf_counter()
+        window.repaint()
+        cold = time.perf_counter() - start
+
+        def clock_tick(state={'text': '00:00'}):
+            state['text'] = '00:01' if state['text'] == '00:00' else '00:00'
+            window.clock.set_text(state['text'])
+            window.relayout()
+            window.repaint(window.paint_ops['clock'][0])
+
+        results[name] = {
+            'cold_cache_ms': round(cold * 1000, 3),
+            'warm': timed(window.repaint, repeat),
+            'clock_tick': timed(clock_tick, repeat),
+        }
+    window.hide()
+    window.deleteLater()
+    controller.app.processEvents()
+    return results
+
+
+def main_benchmarks():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=30, help='Runs per measurement (default: 30).')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    # Internal: the fresh process bench_memory() measures in.
+    parser.add_argument('--memory-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # background.jpg is looked up relative to the working directory.
+    os.chdir(REPO_ROOT)
+    items = load_fixture_items()
+    if args.memory_probe:
+        with tempfile.TemporaryDirectory() as work_dir:
+            with contextlib.redirect_stdout(sys.stderr):
+                results = probe_memory(items, work_dir)
+        print(json.dumps(results))
+        return
+
+    server = start_stub_server(items)
+    stub_url = f'http://127.0.0.1:{server.server_address[1]}/calendar/v3/'
+
+    # The app's own progress messages go to stderr so stdout stays valid JSON.
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(sys.stderr):
+        results = {'fetch': bench_fetch(server, stub_url, work_dir, args.repeat)}
+
+        screensaver_window.ScreensaverWindow = PaintRecordingWindow
+        # A fresh state journal, so a snooze in the user's own state can't skew the numbers.
+        controller = main.AppController(state=AppState(os.path.join(work_dir, 'state.jsonl')))
+        results['startup_ms'] = {
+            phase: round(seconds * 1000, 3) for phase, seconds in controller.startup_timings.items()
+        }
+        try:
+            results['show_latency'] = bench_show_latency(controller, args.repeat)
+            results['fade'] = bench_fade(controller, args.repeat)
+            results['update_events'] = bench_update_events(controller, items, args.repeat)
+            results['paint'] = bench_paint(controller, args.repeat)
+            results['paint_painted'] = bench_painted(controller, args.repeat)
+            results['memory_mb'] = bench_memory()
+        finally:
+            controller.fetcher.stop()
+            server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'platform': platform.platform(),
+            'qpa': os.environ['QT_QPA_PLATFORM'],
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main_benchmarks()
@@ -0,0 +1,461 @@
+"""
+Soak test for FocusView: weeks of idle and active periods in a few minutes.
+
+Runs the real AppController on a virtual clock under the offscreen Qt platform,
+with the fake idle backend and a generated calendar. One day plan (from --seed)
+is replayed every simulated day: typing interleaved with breaks long enough for
+the overlay to show, returns by key, click, pointer motion, wheel or idle reset,
+context menu choices (snooze, postpone, mark done, close for the session), and
+an overnight overlay that is dismissed in the morning and then goes dormant.
+Every morning the Python heap, live QObjects, resident memory and the timer
+wakeups of the previous day are sampled. As every day is the same, the figures
+should stay flat after the warm-up; the run fails when one keeps growing:
+
+    python benchmarks/soak.py --days 14 --output soak.json
+"""
+
+import argparse
+import collections
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('FOCUSVIEW_IDLE_BACKEND', 'fake')
+sys.path.insert(0, REPO_ROOT)
+
+from PyQt6 import sip
+from PyQt6.QtCore import QT_VERSION_STR, QEvent, QObject, QPoint, QPointF, Qt, QTimer
+from PyQt6.QtGui import QKeyEvent, QMouseEvent, QWheelEvent
+from PyQt6.QtWidgets import QApplication, QMenu
+
+import calendar_service
+import idle_monitor
+import main
+import transitions
+from calendar_sources import CalendarSource
+from event_model import CalendarEvent
+from instrumentation import get_instruments
+from memory_stats import resident_memory_bytes
+from state_store import AppState
+
+WORKDAY_START_HOUR = 8
+WORKDAY_END_HOUR = 18
+# Typing resets the idle time this often; it has to stay below the idle threshold.
+INPUT_INTERVAL_SECONDS = 4
+# The first working minutes of a day, after which the day's sample is taken.
+MORNING_SECONDS = 10 * 60
+# Days whose figures are ignored while caches, pools and the allocator fill up.
+WARMUP_DAYS = 2
+# Growth over the days after the warm-up, taken from the least-squares trend, beyond which the run fails.
+GROWTH_LIMITS = {
+    'python_objects': 500,
+    'heap_blocks': 5000,
+    'qobjects': 10,
+    'rss_mb': 16.0,
+    'wakeups': 10,
+}
+# Menu entries the simulated user picks, by the text they start with.
+MENU_CHOICES = {
+    'menu_snooze': 'Snooze 5 min',
+    'menu_postpone': 'Postpone until next event',
+    'menu_done': 'Mark current event as done',
+    'menu_close': 'Close overlay for session',
+}
+RETURNS = ('key', 'click', 'motion', 'wheel', 'idle', 'menu_snooze', 'menu_postpone', 'menu_done')
+# Real-time limit for anything the harness waits on: a fetch, a fade, a queued hide.
+WAIT_TIMEOUT_SECONDS = 5
+
+
+class VirtualClock:
+    """Monotonic and wall-clock time that only move when advance() is called."""
+    def __init__(self, start_time):
+        self._time = start_time
+        self._monotonic = 1000.0
+
+    def time(self):
+        return self._time
+
+    def monotonic(self):
+        return self._monotonic
+
+    def advance(self, seconds):
+        self._time += seconds
+        self._monotonic += seconds
+
+    def now(self):
+        return datetime.datetime.fromtimestamp(self._time).astimezone()
+
+
+class GeneratedCalendarSource(CalendarSource):
+    """
+    The same meetings on every virtual day, with ids unique per day. Every
+    fetch builds new CalendarEvent records and yields a partial first page, as
+    a paginated Google sync does.
+    """
+    name = 'generated'
+    MEETINGS = (
+        (9, 0, 15, 'Stand-up'),
+        (10, 30, 60, 'Design review'),
+        (13, 0, 45, 'Lunch & learn'),
+        (15, 0, 30, '1:1'),
+        (16, 30, 60, 'Planning'),
+    )
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.fetches = 0
+
+    def _events(self):
+        now = self.clock.now()
+        events = []
+        for offset in range(3):
+            day = now.date() + datetime.timedelta(days=offset)
+            events.append(CalendarEvent(
+                id=f'{day}-focus', summary='Focus week', start=datetime.datetime.combine(day, datetime.time()).astimezone(),
+                end=datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time()).astimezone(), all_day=True,
+            ))
+            for hour, minute, minutes, summary in self.MEETINGS:
+                start = datetime.datetime.combine(day, datetime.time(hour, minute)).astimezone()
+                events.append(CalendarEvent(
+                    id=f'{day}-{hour:02}{minute:02}', summary=summary, start=start,
+                    end=start + datetime.timedelta(minutes=minutes), html_link=f'https://calendar.invalid/{day}/{hour}',
+                ))
+        return [event for event in events if event.end > now][:calendar_service.MAX_RESULTS]
+
+    def cached_events(self):
+        return self._events()
+
+    def iter_upcoming_events(self):
+        self.fetches += 1
+        events = self._events()
+        yield events[:3]
+        yield events
+
+
+def make_day_plan(rng):
+    """
+    Returns the day after its first MORNING_SECONDS as (kind, seconds,
+    how_the_user_returns) segments until about WORKDAY_END_HOUR: 'active'
+    typing and 'away' breaks, some too short for the overlay. Every return is
+    used at least once; the last break ends by closing the overlay for the session.
+    """
+    returns = list(RETURNS)
+    rng.shuffle(returns)
+    plan = []
+    remaining = (WORKDAY_END_HOUR - WORKDAY_START_HOUR) * 3600 - MORNING_SECONDS
+    while remaining > 0:
+        away = rng.choice((5, rng.uniform(20, 120), rng.uniform(120, 25 * 60)))
+        active = rng.uniform(2 * 60, 40 * 60)
+        how = returns.pop() if returns else rng.choice(RETURNS)
+        plan.append(('away', away, how))
+        plan.append(('active', active, None))
+        remaining -= away + active
+    plan.append(('away', 60, 'menu_close'))
+    return plan
+
+
+def count_qobjects(app):
+    """
+    Live QObjects by class: everything below the application, the top-level
+    widgets and every parentless QObject Python holds.
+    """
+    roots = [app, *app.topLevelWidgets()]
+    roots += [
+        obj for obj in gc.get_objects()
+        if isinstance(obj, QObject) and not sip.isdeleted(obj) and obj.parent() is None and not obj.isWidgetType()
+    ]
+    seen = {}
+    for root in roots:
+        for obj in (root, *root.findChildren(QObject)):
+            seen[sip.unwrapinstance(obj)] = type(obj).__name__
+    return collections.Counter(seen.values())
+
+
+def least_squares_slope(values):
+    count = len(values)
+    mean_x = (count - 1) / 2
+    mean_y = sum(values) / count
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(count))
+    return numerator / denominator
+
+
+class SoakRun:
+    def __init__(self, days, seed, work_dir):
+        self.days = days
+        self.rng = random.Random(seed)
+        self.plan = make_day_plan(self.rng)
+        start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+        self.clock = VirtualClock(start.timestamp())
+        self.source = GeneratedCalendarSource(self.clock)
+        self.state = AppState(
+            os.path.join(work_dir, 'state.jsonl'), clock=self.clock.time, current_boot=self.clock.time()
+        )
+        self.controller = main.AppController(
+            self.source, state=self.state, clock=self.clock.monotonic, wall_clock=self.clock.time
+        )
+        self.app = self.controller.app
+        self.backend = idle_monitor.FakeIdleBackend()
+        self.controller.idle_backend = self.backend
+        self.wakeups = 0
+        self.samples = []
+        self.qobject_classes = []
+        self.returns = collections.Counter()
+
+    # --- Virtual time ---
+
+    def advance(self, seconds):
+        self.clock.advance(seconds)
+        self.backend.advance(seconds)
+
+    def run_for(self, seconds):
+        """Moves virtual time forward, running every deadline that falls due exactly on time."""
+        target = self.clock.monotonic() + seconds
+        scheduler = self.controller.scheduler
+        spins = 0
+        while True:
+            deadline = scheduler.next_deadline()
+            if deadline is None or deadline > target:
+                break
+            if deadline <= self.clock.monotonic():
+                spins += 1
+                if spins > 1000:
+                    due = [key for key, (when, _) in scheduler._deadlines.items() if when <= self.clock.monotonic()]
+                    raise RuntimeError(f"Deadlines {due} keep falling due at {self.clock.now()} without time passing.")
+            else:
+                spins = 0
+                self.advance(deadline - self.clock.monotonic())
+            self.wakeups += 1
+            scheduler.run_due()
+            self.pump()
+        self.advance(target - self.clock.monotonic())
+
+    def pump(self):
+        """Does what the idle event loop would: deliver posted events, finished fetches and fades, deferred deletes."""
+        deadline = time.perf_counter() + WAIT_TIMEOUT_SECONDS
+        while True:
+            self.app.processEvents()
+            fade = getattr(self.controller.overlay, 'fade', None)
+            busy = self.controller.fetcher._in_flight or (fade is not None and fade.metrics is not None)
+            if not busy:
+                break
+            if time.perf_counter() > deadline:
+                raise RuntimeError("A calendar fetch or a fade never finished.")
+            time.sleep(0.001)
+        self.app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+    def wait_until_hidden(self):
+        deadline = time.perf_counter() + WAIT_TIMEOUT_SECONDS
+        while self.controller.is_overlay_visible():
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"The overlay didn't hide at {self.clock.now()}.")
+            self.app.processEvents()
+            time.sleep(0.001)
+        self.pump()
+
+    # --- The simulated user ---
+
+    def type_for(self, seconds):
+        elapsed = 0.0
+        while elapsed < seconds:
+            step = min(INPUT_INTERVAL_SECONDS, seconds - elapsed)
+            self.backend.simulate_input()
+            self.run_for(step)
+            elapsed += step
+
+    def come_back(self, how):
+        """Ends a break: dismisses the overlay in the given way if it is showing, then resumes typing."""
+        self.returns[how] += 1
+        overlay = self.controller.overlay
+        if not self.controller.is_overlay_visible():
+            self.backend.simulate_input()
+            return
+        window = overlay.primary
+        center = QPointF(window.rect().center())
+        if how == 'key':
+            QApplication.sendEvent(window, QKeyEvent(QEvent.Type.KeyPress, Qt.Key.Key_Space, Qt.KeyboardModifier.NoModifier))
+        elif how == 'click':
+            self._send_mouse(window, QEvent.Type.MouseButtonPress, center, Qt.MouseButton.LeftButton)
+        elif how == 'motion':
+            self._send_mouse(window, QEvent.Type.MouseMove, center, Qt.MouseButton.NoButton)
+            self._send_mouse(window, QEvent.Type.MouseMove, center + QPointF(40, 30), Qt.MouseButton.NoButton)
+        elif how == 'wheel':
+            QApplication.sendEvent(window, QWheelEvent(
+                center, window.mapToGlobal(center), QPoint(), QPoint(0, 120), Qt.MouseButton.NoButton,
+                Qt.KeyboardModifier.NoModifier, Qt.ScrollPhase.NoScrollPhase, False,
+            ))
+        elif how in MENU_CHOICES:
+            # menu.exec() runs a nested event loop; the choice is made from inside it.
+            QTimer.singleShot(0, lambda: self._choose(MENU_CHOICES[how]))
+            self._send_mouse(window, QEvent.Type.MouseButtonPress, center, Qt.MouseButton.RightButton)
+        if how == 'idle':
+            # Nothing reaches the window; an idle poll right after an input sees the reset.
+            for _ in range(4 * main.CHECK_INTERVAL_SECONDS):
+                self.backend.simulate_input()
+                self.run_for(0.5)
+        self.backend.simulate_input()
+        self.wait_until_hidden()
+
+    def _send_mouse(self, window, event_type, position, button):
+        buttons = button if event_type == QEvent.Type.MouseButtonPress else Qt.MouseButton.NoButton
+        QApplication.sendEvent(window, QMouseEvent(
+            event_type, position, window.mapToGlobal(position), button, buttons, Qt.KeyboardModifier.NoModifier,
+        ))
+
+    def _choose(self, text):
+        menus = [widget for widget in QApplication.topLevelWidgets() if isinstance(widget, QMenu) and widget.isVisible()]
+        for menu in menus:
+            for action in menu.actions():
+                if action.text().startswith(text):
+                    action.trigger()
+            menu.close()
+
+    def reboot(self):
+        """The machine restarts overnight: a new boot ends 'close for session', and FocusView starts polling again."""
+        self.state.current_boot = self.clock.time()
+        self.controller.check_idle_status()
+
+    def run_day(self, day):
+        for kind, seconds, how in self.plan:
+            if kind == 'active':
+                self.type_for(seconds)
+            else:
+                self.run_for(seconds)
+                self.come_back(how)
+        # Evening and night: away until the next morning, rebooting at midnight.
+        midnight = datetime.datetime.combine(self.clock.now().date() + datetime.timedelta(days=1), datetime.time())
+        self.run_for(midnight.timestamp() - self.clock.time())
+        self.reboot()
+        self.run_for(WORKDAY_START_HOUR * 3600)
+        self.come_back('key')
+
+    def sample(self, day):
+        gc.collect()
+        self.pump()
+        rss = resident_memory_bytes()
+        sample = {
+            'day': day,
+            'python_objects': len(gc.get_objects()),
+            'heap_blocks': sys.getallocatedblocks(),
+            'rss_mb': None if rss is None else round(rss / (1024 * 1024), 1),
+            'wakeups': self.wakeups,
+        }
+        classes = count_qobjects(self.app)
+        sample['qobjects'] = sum(classes.values())
+        self.qobject_classes.append(classes)
+        self.wakeups = 0
+        self.samples.append(sample)
+        print(f"Soak day {day}: {json.dumps(sample)}")
+        return sample
+
+    def run(self, trace_allocations=False):
+        self.controller.check_idle_status()
+        self.run_for(WORKDAY_START_HOUR * 3600)
+        self.come_back('key')
+        tracemalloc_start = None
+        for day in range(1, self.days + 1):
+            # Each day begins after the morning's first minutes, by which time the night's overlay went dormant.
+            self.type_for(MORNING_SECONDS)
+            if day > 1:
+                self.sample(day - 1)
+            if trace_allocations and day == WARMUP_DAYS + 1:
+                tracemalloc.start(10)
+                tracemalloc_start = tracemalloc.take_snapshot()
+            self.run_day(day)
+        self.type_for(MORNING_SECONDS)
+        self.sample(self.days)
+        top_allocations = None
+        if tracemalloc_start is not None:
+            growth = tracemalloc.take_snapshot().compare_to(tracemalloc_start, 'lineno')
+            tracemalloc.stop()
+            top_allocations = [str(stat) for stat in growth[:10]]
+        self.controller.fetcher.stop()
+        return self.report(top_allocations)
+
+    def report(self, top_allocations):
+        steady = self.samples[WARMUP_DAYS:]
+        growth = {}
+        for metric, limit in GROWTH_LIMITS.items():
+            values = [sample[metric] for sample in steady]
+            if None in values:
+                continue
+            trend = least_squares_slope(values) * (len(values) - 1)
+            growth[metric] = {'growth': round(trend, 1), 'limit': limit, 'ok': trend <= limit}
+        first, last = self.qobject_classes[WARMUP_DAYS], self.qobject_classes[-1]
+        qobject_growth = {name: last[name] - first[name] for name in last if last[name] > first[name]}
+        counters = get_instruments().counters
+        results = {
+            'days': self.days,
+            'ok': all(entry['ok'] for entry in growth.values()),
+            'growth_after_warmup': growth,
+            'qobject_growth_by_class': qobject_growth,
+            'returns': dict(self.returns),
+            'hides': {dict(labels)['reason']: value for (name, labels), value in counters.items() if name == 'hides'},
+            'calendar_fetches': self.source.fetches,
+            'samples': self.samples,
+        }
+        if top_allocations is not None:
+            results['top_allocation_growth'] = top_allocations
+        return results
+
+
+def main_soak():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=14, help='Simulated days (default: 14).')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the day plan (default: 1).')
+    parser.add_argument(
+        '--dormant-after', type=float, default=main.DORMANT_AFTER_SECONDS,
+        help='DORMANT_AFTER_SECONDS for the run; 0 never releases the overlay, so leaks it would hide show up.',
+    )
+    parser.add_argument('--tracemalloc', action='store_true', help='Report the allocation sites that grew after the warm-up.')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+    if args.days < WARMUP_DAYS + 3:
+        parser.error(f"--days must be at least {WARMUP_DAYS + 3} to see a trend after the warm-up.")
+
+    os.chdir(REPO_ROOT)
+    # Fades run on real time; shortened, the run doesn't wait on them.
+    transitions.FADE_IN_MS = transitions.FADE_OUT_MS = 1
+    # A dormant release that never comes: longer than any run.
+    main.DORMANT_AFTER_SECONDS = args.dormant_after or 10 * 365 * 24 * 3600
+
+    started = time.perf_counter()
+    # The app's own progress messages go to stderr so stdout stays valid JSON.
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(sys.stderr):
+        results = SoakRun(args.days, args.seed, work_dir).run(args.tracemalloc)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'platform': platform.platform(),
+            'qpa': os.environ['QT_QPA_PLATFORM'],
+            'seed': args.seed,
+            'dormant_after_seconds': args.dormant_after,
+            'wall_seconds': round(time.perf_counter() - started, 1),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(0 if results['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main_soak()
@@ -1,68 +1,398 @@
+import copy
 import datetime
-import os.path
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import os
+import time
+from urllib.parse import urljoin
+
+from event_cache import EventCache
+from fetch_policy import FetchPolicy
+from instrumentation import get_instruments
 
 # The same scope as in the authentication flow.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 TOKEN_FILE = 'token.json'
 
-def get_upcoming_events():
+# How far ahead the agenda reaches: 0 is the rest of today, 7 is today plus the
+# next 7 days. This is also the locally synced window, which is re-anchored with
+# a full sync once a day; every other refresh is a delta.
+AGENDA_HORIZON_DAYS = 7
+MAX_RESULTS = 10
+HTTP_TIMEOUT_SECONDS = 20
+
+# Events per page. Pages are merged into the cache and shown as they arrive.
+PAGE_SIZE = 250
+# Only request the properties the cache stores.
+EVENT_FIELDS = 'etag,items(id,status,summary,start,end,htmlLink),nextPageToken,nextSyncToken'
+CALENDAR_LIST_FIELDS = 'items(id,primary,selected,hidden,deleted),nextPageToken'
+
+# Google accepts up to 1000 calls per batch request but recommends at most 50.
+MAX_BATCH_SIZE = 50
+BATCH_PATH = '/batch/calendar/v3'
+BATCH_URI = 'https://www.googleapis.com' + BATCH_PATH
+
+_cache = None
+_client = None
+_policy = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = EventCache()
+    return _cache
+
+
+def local_midnight(day):
+    return datetime.datetime.combine(day, datetime.time()).astimezone()
+
+
+def horizon_end():
+    """Returns the local midnight that ends the agenda horizon."""
+    return local_midnight(datetime.date.today() + datetime.timedelta(days=AGENDA_HORIZON_DAYS + 1))
+
+
+def _current_window():
+    """Returns the (timeMin, timeMax) pair of today's sync window in UTC."""
+    window_start = local_midnight(datetime.date.today()).astimezone(datetime.UTC)
+    window_end = horizon_end().astimezone(datetime.UTC)
+    return window_start.isoformat(), window_end.isoformat()
+
+
+def _list_calendar_ids(service):
+    """Returns the ids of the calendars the user has selected for display, primary first."""
+    calendar_ids = []
+    page_token = None
+    while True:
+        result = service.calendarList().list(
+            pageToken=page_token, minAccessRole='reader', fields=CALENDAR_LIST_FIELDS
+        ).execute()
+        for entry in result.get('items', []):
+            if entry.get('deleted') or entry.get('hidden'):
+                continue
+            if entry.get('primary'):
+                calendar_ids.insert(0, entry['id'])
+            elif entry.get('selected'):
+                calendar_ids.append(entry['id'])
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return calendar_ids or ['primary']
+
+
+class _CalendarFetch:
+    """Progress of one calendar's events().list call across pages."""
+    def __init__(self, calendar_id, sync_token, etag, window_start, window_end):
+        self.calendar_id = calendar_id
+        self.window = (window_start, window_end)
+        self.sync_token = sync_token
+        self.etag = etag
+        # Items of the most recent page, plus whether the calendar's cached events
+        # must be dropped before they are applied.
+        self.items = []
+        self.needs_reset = False
+        self.page_token = None
+        self.next_sync_token = None
+        self.next_etag = None
+        self.error = None
+        self.done = False
+        if sync_token:
+            self.full = False
+            # singleEvents must match the parameters of the initial full sync.
+            self.params = {'calendarId': calendar_id, 'singleEvents': True, 'syncToken': sync_token}
+        else:
+            self.restart_full()
+
+    def restart_full(self):
+        # Full sync. singleEvents=True expands recurring events into individual instances.
+        self.full = True
+        self.needs_reset = True
+        self.items = []
+        self.page_token = None
+        self.params = {
+            'calendarId': self.calendar_id,
+            'singleEvents': True,
+            'timeMin': self.window[0],
+            'timeMax': self.window[1],
+        }
+
+    def request(self, service):
+        request = service.events().list(
+            pageToken=self.page_token, maxResults=PAGE_SIZE, fields=EVENT_FIELDS, **self.params
+        )
+        if self.etag and not self.full and self.page_token is None:
+            # Unchanged calendars answer 304 Not Modified with an empty body.
+            request.headers['If-None-Match'] = self.etag
+        return request
+
+    def handle(self, response, error):
+        from googleapiclient.errors import HttpError
+
+        if error is not None:
+            status = error.resp.status if isinstance(error, HttpError) else None
+            if status == 304:
+                # Nothing changed since the stored ETag, so the stored sync token stays valid.
+                self.items = []
+                self.next_sync_token = self.sync_token
+                self.next_etag = self.etag
+                self.done = True
+            # 410 Gone means the sync token expired; anything else is a real failure.
+            elif status == 410 and not self.full:
+                get_instruments().log(
+                    'sync_token_expired',
+                    f"Sync token for '{self.calendar_id}' expired. Performing a full sync of it.",
+                    calendar_id=self.calendar_id,
+                )
+                self.restart_full()
+            else:
+                self.error = error
+                self.done = True
+            return
+        self.items = response.get('items', [])
+        self.page_token = response.get('nextPageToken')
+        if not self.page_token:
+            # Only the final page carries nextSyncToken.
+            self.next_sync_token = response.get('nextSyncToken')
+            self.next_etag = response.get('etag')
+            self.done = True
+
+
+def _execute_round(service, fetches, batch_uri):
+    """Requests the next page of every fetch, bundled into batch HTTP requests when there are several."""
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import BatchHttpRequest
+
+    if len(fetches) == 1:
+        fetch = fetches[0]
+        try:
+            fetch.handle(fetch.request(service).execute(), None)
+        except HttpError as error:
+            fetch.handle(None, error)
+        return
+
+    for offset in range(0, len(fetches), MAX_BATCH_SIZE):
+        batch = BatchHttpRequest(batch_uri=batch_uri)
+        for fetch in fetches[offset:offset + MAX_BATCH_SIZE]:
+            batch.add(
+                fetch.request(service),
+                callback=lambda request_id, response, error, fetch=fetch: fetch.handle(response, error),
+            )
+        batch.execute()
+
+
+def iter_sync_events(service, cache, batch_uri=BATCH_URI):
     """
-    Fetches the next 10 upcoming events from the primary Google Calendar.
-    Returns a list of formatted events or an empty list on error.
+    Brings the cache up to date for every selected calendar, one round of pages at a time.
+    Calendars with a valid sync token for today's window get an incremental sync,
+    the others a full sync of the window. All calendars are fetched together in
+    batch requests, one round per page, and each page is merged into the cache as
+    soon as it arrives. Yields after every round that leaves more pages to fetch,
+    so callers can show partial results.
+    A calendar that fails keeps its cached events; if every calendar fails, the
+    first error is raised. A new window is synced into a staged cache that only
+    replaces the previous window once one of its fetches has succeeded; calendars
+    that fail on the new window keep their events from the previous one.
     """
+    window_start, window_end = _current_window()
+    target = cache
+    replaced = None
+    if (cache.window_start, cache.window_end) != (window_start, window_end) or not cache.calendar_ids:
+        # The window is re-anchored once a day, which is also when the calendar list is re-read.
+        target = cache.staged(window_start, window_end, _list_calendar_ids(service))
+        # adopt() swaps in new dictionaries rather than changing them, so this keeps the previous window.
+        replaced = copy.copy(cache)
+
+    fetches = [
+        _CalendarFetch(
+            calendar_id, target.sync_token(calendar_id), target.etag(calendar_id), window_start, window_end
+        )
+        for calendar_id in target.calendar_ids
+    ]
+    if not fetches:
+        cache.adopt(target)
+    pending = fetches
+    while pending:
+        _execute_round(service, pending, batch_uri)
+        for fetch in pending:
+            if fetch.error is not None:
+                if replaced is not None:
+                    target.keep_calendar(replaced, fetch.calendar_id)
+                continue
+            if fetch.needs_reset:
+                target.reset_calendar(fetch.calendar_id)
+                fetch.needs_reset = False
+            target.apply(fetch.calendar_id, fetch.items)
+        if target is not cache and any(fetch.error is None for fetch in pending):
+            cache.adopt(target)
+            target = cache
+        pending = [fetch for fetch in fetches if not fetch.done]
+        if pending:
+            yield
+
+    failed = []
+    for fetch in fetches:
+        if fetch.error is not None:
+            get_instruments().log(
+                'calendar_error',
+                f"Could not sync calendar '{fetch.calendar_id}': {fetch.error}",
+                calendar_id=fetch.calendar_id,
+                error=str(fetch.error),
+            )
+            failed.append(fetch)
+        else:
+            cache.set_sync_token(fetch.calendar_id, fetch.next_sync_token)
+            cache.set_etag(fetch.calendar_id, fetch.next_etag)
+    cache.prune(datetime.datetime.now().astimezone())
+    if len(failed) < len(fetches):
+        cache.save()
+    if failed and len(failed) == len(fetches):
+        raise failed[0].error
+
+
+def sync_events(service, cache, batch_uri=BATCH_URI):
+    for _ in iter_sync_events(service, cache, batch_uri):
+        pass
+
+
+class CalendarClient:
+    """
+    Long-lived Calendar API client.
+    Credentials, the parsed discovery document and the keep-alive HTTP connection
+    are created once and reused for every refresh. Expired access tokens are
+    refreshed in memory; token.json is only rewritten when the token rotates.
+    The underlying httplib2 connection is not thread-safe, so use one client per thread.
+
+    credentials and api_endpoint override token.json and the Google endpoint,
+    e.g. to point the client at a local stub server.
+    """
+    def __init__(self, token_file=TOKEN_FILE, credentials=None, api_endpoint=None):
+        # The Google client stack takes a few hundred milliseconds to import, so it
+        # is only loaded once a client is actually needed.
+        import httplib2
+        from google.oauth2.credentials import Credentials
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient import discovery_cache
+        from googleapiclient.discovery import build, build_from_document
+
+        self.token_file = token_file
+        self.creds = credentials or Credentials.from_authorized_user_file(token_file, SCOPES)
+        self._saved_token = self.creds.token
+
+        # A single Http instance keeps its connection to the API host alive between calls.
+        http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        self.batch_uri = urljoin(api_endpoint, BATCH_PATH) if api_endpoint else BATCH_URI
+        discovery_doc = discovery_cache.get_static_doc('calendar', 'v3')
+        if discovery_doc:
+            self.service = build_from_document(discovery_doc, http=http, client_options=client_options)
+        else:
+            self.service = build('calendar', 'v3', http=http, client_options=client_options)
+
+    def iter_sync(self, cache):
+        """Generator form of sync(); yields after every round of pages that leaves more to fetch."""
+        try:
+            yield from iter_sync_events(self.service, cache, self.batch_uri)
+        finally:
+            self._persist_token_if_rotated()
+
+    def sync(self, cache):
+        for _ in self.iter_sync(cache):
+            pass
+
+    def _persist_token_if_rotated(self):
+        if self.creds.token == self._saved_token:
+            return
+        tmp_path = self.token_file + '.tmp'
+        with open(tmp_path, 'w') as token:
+            token.write(self.creds.to_json())
+        os.replace(tmp_path, self.token_file)
+        self._saved_token = self.creds.token
+
+
+def get_client():
+    """Returns the shared CalendarClient, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = CalendarClient()
+    return _client
+
+
+def get_fetch_policy():
+    global _policy
+    if _policy is None:
+        _policy = FetchPolicy()
+    return _policy
+
+
+def get_cached_events():
+    """
+    Returns the upcoming events from the local cache without any network access,
+    so the overlay can render immediately while a sync runs.
+    The cache is shared with get_upcoming_events, so call this before background
+    syncs start or from the syncing thread.
+    """
+    now = datetime.datetime.now().astimezone()
+    return _get_cache().upcoming(now, MAX_RESULTS, until=horizon_end())
+
+
+def iter_upcoming_events():
+    """
+    Syncs the selected Google Calendars into the local cache and yields the next
+    10 upcoming events within the horizon as CalendarEvent records: once after
+    every round of pages that leaves more to fetch, and always once at the end.
+    Falls back to the cached events on error, and skips the sync entirely while
+    the fetch policy holds calls back (refresh interval, backoff, open breaker).
+    Each call is recorded as a calendar_fetch span labelled with its outcome;
+    the time spent showing partial results between pages is included.
+    """
+    instruments = get_instruments()
+    started = time.perf_counter()
     if not os.path.exists(TOKEN_FILE):
-        print(f"Error: '{TOKEN_FILE}' not found.")
-        print("Please run authenticate.py first to generate the token file.")
-        return []
+        instruments.log(
+            'calendar_error',
+            f"Error: '{TOKEN_FILE}' not found.\nPlease run authenticate.py first to generate the token file.",
+        )
+        instruments.observe('calendar_fetch', time.perf_counter() - started, outcome='no_token')
+        yield []
+        return
 
-    try:
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-        service = build('calendar', 'v3', credentials=creds)
-
-        # Get the current time in UTC to use as the minimum time for events.
-        now = datetime.datetime.now(datetime.UTC).isoformat()
-
-        # Call the Calendar API to get upcoming events.
-        # singleEvents=True expands recurring events into individual instances.
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            maxResults=10,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        events = events_result.get('items', [])
-
-        if not events:
-            return []
-
-        # Format the events into a simpler structure for the UI to use.
-        formatted_events = []
-        for event in events:
-            start_info = event['start']
-            # All-day events have a 'date', timed events have 'dateTime'.
-            start = start_info.get('dateTime', start_info.get('date'))
-            summary = event.get('summary', 'No Title')
-            formatted_events.append({"start": start, "summary": summary})
-            
-        return formatted_events
+    policy = get_fetch_policy()
+    if not policy.allow_fetch():
+        instruments.observe('calendar_fetch', time.perf_counter() - started, outcome='held_back')
+        yield get_cached_events()
+        return
 
+    from googleapiclient.errors import HttpError
+    try:
+        for _ in get_client().iter_sync(_get_cache()):
+            yield get_cached_events()
     except HttpError as error:
-        print(f'An API error occurred: {error}')
-        return []
+        instruments.log('calendar_error', f'An API error occurred: {error}', status=error.resp.status)
+        outcome = 'api_error'
+        policy.record_failure(error)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return []
-    
+        instruments.log('calendar_error', f"An unexpected error occurred: {e}", error=str(e))
+        outcome = 'error'
+        policy.record_failure(e)
+    else:
+        outcome = 'ok'
+        policy.record_success()
+
+    instruments.observe('calendar_fetch', time.perf_counter() - started, outcome=outcome)
+    yield get_cached_events()
+
+
+def get_upcoming_events():
+    """Returns the final list from iter_upcoming_events()."""
+    events = []
+    for events in iter_upcoming_events():
+        pass
+    return events
+
 
 if __name__ == '__main__':
     upcoming_events = get_upcoming_events()
     if upcoming_events:
         print("Upcoming Events:")
         for event in upcoming_events:
-            print(f"- {event['summary']} (Starts: {event['start']})")
+            print(f"- {event.summary} (Starts: {event.start.isoformat()})")
     else:
-        print("No upcoming events found or an error occurred.")
\ No newline at end of file
+        print("No upcoming events found or an error occurred.")
@@ -0,0 +1,224 @@
+# calendar_sources.py
+
+import datetime
+import hashlib
+import itertools
+import json
+import os
+
+import calendar_service
+import ics_reader
+from instrumentation import get_instruments
+
+SOURCE_ENV_VAR = 'FOCUSVIEW_ICS_PATH'
+# A .ics file or a directory of them. When set (here or through the environment
+# variable), events are read from disk and the Google account is never contacted.
+ICS_PATH = None
+ICS_INDEX_FILE = 'ics_index.json'
+ICS_INDEX_VERSION = 1
+
+
+class CalendarSource:
+    """
+    Where the agenda comes from. cached_events() must return quickly and is called
+    once on the GUI thread before the background fetcher starts; after that, only
+    the fetch thread calls iter_upcoming_events(), which yields lists of upcoming
+    CalendarEvent records (possibly several, as partial results arrive).
+    """
+    name = 'base'
+
+    def is_ready(self):
+        """Returns False (after telling the user why) if the source can't be used."""
+        return True
+
+    def cached_events(self):
+        raise NotImplementedError
+
+    def iter_upcoming_events(self):
+        raise NotImplementedError
+
+    def prewarm(self):
+        """Loads whatever the first fetch needs, ahead of time. Runs on the fetch thread."""
+
+
+class GoogleCalendarSource(CalendarSource):
+    """The user's selected Google Calendars, through calendar_service."""
+    name = 'google'
+
+    def is_ready(self):
+        if not os.path.exists(calendar_service.TOKEN_FILE):
+            print(f"Error: '{calendar_service.TOKEN_FILE}' not found!")
+            print("Please run 'python authenticate.py' once to log in and authorize the application.")
+            return False
+        return True
+
+    def cached_events(self):
+        return calendar_service.get_cached_events()
+
+    def iter_upcoming_events(self):
+        return calendar_service.iter_upcoming_events()
+
+    def prewarm(self):
+        # Imports the client stack and builds the service object; no network access.
+        if os.path.exists(calendar_service.TOKEN_FILE):
+            calendar_service.get_client()
+
+
+def _hashing_lines(f, digest):
+    """Yields decoded lines of a binary file while feeding the raw bytes to digest."""
+    for raw_line in f:
+        digest.update(raw_line)
+        yield raw_line.decode('utf-8', errors='replace')
+
+
+class IcsCalendarSource(CalendarSource):
+    """
+    Events from a local .ics file or a directory of .ics files, for machines
+    without network access.
+    Parsed VEVENTs are kept in a persisted index keyed by each file's mtime and
+    size, with a SHA-256 of the content as the fallback key, so unchanged files
+    are never parsed again, even across restarts. Recurrences are expanded from
+    the index over the agenda horizon only.
+    """
+    name = 'ics'
+
+    def __init__(self, path, index_path=ICS_INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        self.files = {}
+        self._index_dirty = False
+        # Expanded events of the current window, sorted by start.
+        self._events = []
+        self._window = None
+        self._load_index()
+
+    def is_ready(self):
+        if not os.path.exists(self.path):
+            print(f"Error: calendar file or directory '{self.path}' not found!")
+            return False
+        return True
+
+    def cached_events(self):
+        self.refresh()
+        return self._upcoming()
+
+    def iter_upcoming_events(self):
+        with get_instruments().span('calendar_fetch') as span:
+            self.refresh()
+            # Set only once refresh() returned, so a failure is recorded as 'error'.
+            span.labels['outcome'] = 'ok'
+        yield self._upcoming()
+
+    # --- Index ---
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable calendar index '{self.index_path}': {e}")
+            return
+        if data.get('version') == ICS_INDEX_VERSION:
+            self.files = data.get('files', {})
+
+    def _save_index(self):
+        data = {'version': ICS_INDEX_VERSION, 'files': self.files}
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+        self._index_dirty = False
+
+    def _calendar_files(self):
+        if os.path.isfile(self.path):
+            return [os.path.abspath(self.path)]
+        paths = []
+        for root, _, names in os.walk(self.path):
+            paths.extend(os.path.abspath(os.path.join(root, name)) for name in names if name.lower().endswith('.ics'))
+        return sorted(paths)
+
+    def _read_file(self, path):
+        """Returns the file's parsed VEVENTs, from the index when possible. Sets _index_dirty if the index changed."""
+        stat = os.stat(path)
+        entry = self.files.get(path)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['events'], False
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            if entry is None:
+                vevents = list(ics_reader.iter_vevents(_hashing_lines(f, digest)))
+            else:
+                # Touched but possibly unchanged: hash first and only parse on a mismatch.
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(chunk)
+                if digest.hexdigest() == entry['sha256']:
+                    entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                    self._index_dirty = True
+                    return entry['events'], False
+                f.seek(0)
+                digest = hashlib.sha256()
+                vevents = list(ics_reader.iter_vevents(_hashing_lines(f, digest)))
+
+        self.files[path] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': digest.hexdigest(),
+            'events': vevents,
+        }
+        self._index_dirty = True
+        return vevents, True
+
+    # --- Events ---
+
+    def refresh(self):
+        """Re-reads changed files and re-expands recurrences if anything or the day changed."""
+        try:
+            paths = self._calendar_files()
+        except OSError as e:
+            print(f"Could not list calendar files in '{self.path}': {e}")
+            return
+
+        changed = set(self.files) != set(paths)
+        for stale in set(self.files) - set(paths):
+            del self.files[stale]
+            self._index_dirty = True
+        vevents = []
+        for path in paths:
+            try:
+                file_events, file_changed = self._read_file(path)
+            except OSError as e:
+                print(f"Could not read calendar file '{path}': {e}")
+                continue
+            changed = changed or file_changed
+            vevents.extend(file_events)
+        if self._index_dirty:
+            self._save_index()
+
+        window = (calendar_service.local_midnight(datetime.date.today()), calendar_service.horizon_end())
+        if changed or window != self._window:
+            self._window = window
+            events = ics_reader.expand_events(vevents, *window)
+            self._events = sorted(events, key=lambda event: event.start)
+
+    def _upcoming(self):
+        now = datetime.datetime.now().astimezone()
+        seen = set()
+        unique = (
+            event for event in self._events
+            if event.end > now and not (event.id in seen or seen.add(event.id))
+        )
+        return list(itertools.islice(unique, calendar_service.MAX_RESULTS))
+
+
+def create_source(ics_path=None):
+    """
+    Returns the calendar source to use: the given .ics path, else ICS_PATH or the
+    FOCUSVIEW_ICS_PATH environment variable if set, else the Google account.
+    """
+    ics_path = ics_path or ICS_PATH or os.environ.get(SOURCE_ENV_VAR)
+    if ics_path:
+        return IcsCalendarSource(ics_path)
+    return GoogleCalendarSource()
@@ -0,0 +1,93 @@
+# calendar_worker.py
+
+import time
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from instrumentation import get_instruments
+
+
+class _FetchWorker(QObject):
+    """
+    Performs the blocking calendar sync. Lives on CalendarFetcher's background thread.
+    Emits events_ready for every partial result the source yields, then finished, also when the sync fails.
+    """
+    events_ready = pyqtSignal(list)
+    finished = pyqtSignal()
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+
+    @pyqtSlot()
+    def prewarm(self):
+        started = time.perf_counter()
+        try:
+            self.source.prewarm()
+        except Exception as e:
+            get_instruments().log('calendar_error', f"Could not prepare the calendar source: {e}", error=str(e))
+            return
+        elapsed = time.perf_counter() - started
+        get_instruments().observe('calendar_prewarm', elapsed)
+        get_instruments().log('calendar_ready', f"Calendar source ready in {elapsed * 1000:.0f} ms.")
+
+    @pyqtSlot()
+    def fetch(self):
+        # An exception escaping a slot aborts the process, and without finished
+        # the fetcher would never start another fetch.
+        try:
+            for events in self.source.iter_upcoming_events():
+                self.events_ready.emit(events)
+        except Exception as e:
+            get_instruments().log('calendar_error', f"Calendar sync failed: {e}", error=str(e))
+        finally:
+            self.finished.emit()
+
+
+class CalendarFetcher(QObject):
+    """
+    Runs syncs of a CalendarSource on a background QThread so the GUI thread never waits on
+    the network. Results are delivered through the events_ready signal on the GUI
+    thread, first partial ones while further pages are still being fetched. Refresh requests made while a fetch is running are merged into a
+    single follow-up fetch instead of queueing up.
+    """
+    events_ready = pyqtSignal(list)
+    _fetch_requested = pyqtSignal()
+    _prewarm_requested = pyqtSignal()
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self._in_flight = False
+        self._pending = False
+
+        self._thread = QThread()
+        self._worker = _FetchWorker(source)
+        self._worker.moveToThread(self._thread)
+        # Both connections cross threads, so Qt queues them automatically.
+        self._fetch_requested.connect(self._worker.fetch)
+        self._prewarm_requested.connect(self._worker.prewarm)
+        self._worker.events_ready.connect(self.events_ready)
+        self._worker.finished.connect(self._on_fetch_finished)
+        self._thread.start()
+
+    def request_refresh(self):
+        if self._in_flight:
+            self._pending = True
+            return
+        self._in_flight = True
+        self._fetch_requested.emit()
+
+    def prewarm(self):
+        """Asks the background thread to prepare the source before the first fetch needs it."""
+        self._prewarm_requested.emit()
+
+    def stop(self):
+        """Drops any merged request and waits for the running fetch to finish."""
+        self._pending = False
+        self._thread.quit()
+        self._thread.wait()
+
+    def _on_fetch_finished(self):
+        self._in_flight = False
+        if self._pending:
+            self._pending = False
+            self.request_refresh()
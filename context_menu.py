@@ -0,0 +1,40 @@
+# context_menu.py
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QMenu
+
+
+def show_context_menu(window, actions, pos=None):
+    """
+    Shows the overlay's options menu at the global position pos, or centered on
+    window. actions provides snooze_overlay(minutes), postpone_overlay,
+    mark_done, open_calendar and close_for_session.
+    The menu deletes itself once closed; otherwise every menu ever opened
+    would live on as a child of the window.
+    """
+    menu = QMenu(window)
+    menu.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    menu.addAction("Snooze 5 min", lambda: actions.snooze_overlay(5))
+    menu.addAction("Snooze 10 min", lambda: actions.snooze_overlay(10))
+    menu.addAction("Snooze 15 min", lambda: actions.snooze_overlay(15))
+    menu.addSeparator()
+    menu.addAction("Postpone until next event", actions.postpone_overlay)
+    menu.addAction("Mark current event as done", actions.mark_done)
+    menu.addAction("Open in Google Calendar", actions.open_calendar)
+    menu.addSeparator()
+    menu.addAction("Close overlay for session", actions.close_for_session)
+
+    if pos is not None:
+        menu.exec(pos)
+    else:
+        show_menu_centered(menu, window)
+
+
+def show_menu_centered(menu, window):
+    """Exec the menu centered inside the window."""
+    try:
+        center_point = window.mapToGlobal(window.rect().center())
+        menu.exec(center_point)
+    except Exception:
+        # last resort: exec without a position
+        menu.exec()
@@ -0,0 +1,205 @@
+import copy
+import heapq
+import itertools
+import json
+import os
+
+from event_model import CalendarEvent
+
+CACHE_FILE = 'event_cache.json'
+CACHE_VERSION = 2
+
+# Only the fields the app actually uses are kept on disk.
+STORED_FIELDS = ('id', 'status', 'summary', 'start', 'end', 'htmlLink')
+
+
+class EventCache:
+    """
+    Local event store that survives restarts.
+    Holds the events of the current sync window per calendar, keyed by event id,
+    together with each calendar's Calendar API 'nextSyncToken' so later refreshes
+    only need to fetch deltas, and the list ETag for conditional requests.
+    Raw resources are what gets written to disk; parsed CalendarEvent records are
+    kept alongside them so times are only parsed when an event changes.
+    """
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.window_start = None
+        self.window_end = None
+        self.calendar_ids = []
+        self.calendars = {}
+        self.records = {}
+        # Per-calendar records sorted by start, rebuilt lazily after changes.
+        self._sorted = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable event cache '{self.path}': {e}")
+            return
+        if data.get('version') != CACHE_VERSION:
+            return
+        self.window_start = data.get('window_start')
+        self.window_end = data.get('window_end')
+        self.calendar_ids = data.get('calendar_ids', [])
+        self.calendars = data.get('calendars', {})
+        self.records = {}
+        self._sorted = {}
+        for calendar_id in self.calendar_ids:
+            calendar = self.calendars.setdefault(calendar_id, {'sync_token': None, 'etag': None, 'events': {}})
+            self.records[calendar_id] = {}
+            for event_id, event in calendar['events'].items():
+                self._parse(calendar_id, event_id, event)
+
+    def save(self):
+        data = {
+            'version': CACHE_VERSION,
+            'window_start': self.window_start,
+            'window_end': self.window_end,
+            'calendar_ids': self.calendar_ids,
+            'calendars': self.calendars,
+        }
+        # Write to a temp file first so a crash never leaves a truncated cache behind.
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def reset(self, window_start, window_end, calendar_ids):
+        """Drops everything before a full sync of a new window and calendar list."""
+        self.window_start = window_start
+        self.window_end = window_end
+        self.calendar_ids = list(calendar_ids)
+        self.calendars = {}
+        self.records = {}
+        self._sorted = {}
+        for calendar_id in self.calendar_ids:
+            self.reset_calendar(calendar_id)
+
+    def staged(self, window_start, window_end, calendar_ids):
+        """
+        Returns an empty cache for a new window and calendar list, leaving this one
+        untouched. A full sync fills it, and adopt() swaps it in once a fetch has
+        succeeded, so the previous events are kept if every fetch fails.
+        """
+        staged = copy.copy(self)
+        staged.reset(window_start, window_end, calendar_ids)
+        return staged
+
+    def keep_calendar(self, previous, calendar_id):
+        """
+        Carries one calendar's events over from previous (the cache this staged one
+        replaces), e.g. after its fetch for the new window failed. Its sync token is
+        dropped, so its next sync is a full sync of the new window.
+        """
+        if calendar_id not in previous.calendars:
+            return
+        self.calendars[calendar_id] = {
+            'sync_token': None, 'etag': None, 'events': dict(previous.calendars[calendar_id]['events']),
+        }
+        self.records[calendar_id] = dict(previous.records.get(calendar_id, {}))
+        self._sorted.pop(calendar_id, None)
+
+    def adopt(self, staged):
+        """Takes over the window, calendars and events of a cache returned by staged()."""
+        self.window_start = staged.window_start
+        self.window_end = staged.window_end
+        self.calendar_ids = staged.calendar_ids
+        self.calendars = staged.calendars
+        self.records = staged.records
+        self._sorted = staged._sorted
+
+    def reset_calendar(self, calendar_id):
+        """Forgets one calendar's events and sync token, e.g. after its token expired."""
+        self.calendars[calendar_id] = {'sync_token': None, 'etag': None, 'events': {}}
+        self.records[calendar_id] = {}
+        self._sorted.pop(calendar_id, None)
+
+    def sync_token(self, calendar_id):
+        return self.calendars[calendar_id]['sync_token']
+
+    def set_sync_token(self, calendar_id, token):
+        self.calendars[calendar_id]['sync_token'] = token
+
+    def etag(self, calendar_id):
+        return self.calendars[calendar_id].get('etag')
+
+    def set_etag(self, calendar_id, etag):
+        self.calendars[calendar_id]['etag'] = etag
+
+    def apply(self, calendar_id, items):
+        """
+        Merges a page of API results for one calendar into the store.
+        Deleted events arrive as 'cancelled' entries during incremental syncs.
+        Returns True if anything changed.
+        """
+        events = self.calendars[calendar_id]['events']
+        records = self.records[calendar_id]
+        changed = False
+        for item in items:
+            event_id = item.get('id')
+            if not event_id:
+                continue
+            if item.get('status') == 'cancelled':
+                if events.pop(event_id, None) is not None:
+                    records.pop(event_id, None)
+                    changed = True
+                continue
+            stored = {key: item[key] for key in STORED_FIELDS if key in item}
+            if events.get(event_id) != stored:
+                events[event_id] = stored
+                self._parse(calendar_id, event_id, stored)
+                changed = True
+        if changed:
+            self._sorted.pop(calendar_id, None)
+        return changed
+
+    def _parse(self, calendar_id, event_id, event):
+        try:
+            self.records[calendar_id][event_id] = CalendarEvent.from_api(event)
+        except (KeyError, ValueError):
+            # Malformed entries stay on disk but are never shown.
+            self.records[calendar_id].pop(event_id, None)
+
+    def prune(self, now):
+        """Removes events that have already ended."""
+        pruned = False
+        for calendar_id, records in self.records.items():
+            expired = [event_id for event_id, record in records.items() if record.end <= now]
+            for event_id in expired:
+                del self.calendars[calendar_id]['events'][event_id]
+                del records[event_id]
+            if expired:
+                self._sorted.pop(calendar_id, None)
+                pruned = True
+        return pruned
+
+    def _sorted_records(self, calendar_id):
+        ordered = self._sorted.get(calendar_id)
+        if ordered is None:
+            ordered = sorted(self.records[calendar_id].values(), key=lambda record: record.start)
+            self._sorted[calendar_id] = ordered
+        return ordered
+
+    def upcoming(self, now, limit=10, until=None):
+        """
+        Returns CalendarEvent records that have not ended yet and start before
+        'until' (if given), ordered by start time.
+        The per-calendar sorted lists are merged lazily with a heap, so only as many
+        events as needed are looked at. Events shared between calendars appear once.
+        """
+        per_calendar = (
+            (record for record in self._sorted_records(calendar_id) if record.end > now)
+            for calendar_id in self.calendar_ids
+        )
+        merged = heapq.merge(*per_calendar, key=lambda record: record.start)
+        if until is not None:
+            merged = itertools.takewhile(lambda record: record.start < until, merged)
+        seen = set()
+        unique = (record for record in merged if not (record.id in seen or seen.add(record.id)))
+        return list(itertools.islice(unique, limit))
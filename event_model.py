@@ -0,0 +1,43 @@
+# event_model.py
+
+import datetime
+from dataclasses import dataclass
+
+
+def parse_event_time(time_info):
+    """
+    Converts an API 'start'/'end' object into an aware datetime.
+    All-day events only carry a 'date', which is treated as local midnight.
+    """
+    if 'dateTime' in time_info:
+        return datetime.datetime.fromisoformat(time_info['dateTime']).astimezone()
+    day = datetime.date.fromisoformat(time_info['date'])
+    return datetime.datetime.combine(day, datetime.time()).astimezone()
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarEvent:
+    """
+    A single agenda entry. Times are parsed once when the event is ingested and
+    are always timezone-aware in the local zone.
+    """
+    id: str
+    summary: str
+    start: datetime.datetime
+    end: datetime.datetime
+    all_day: bool = False
+    html_link: str | None = None
+
+    @classmethod
+    def from_api(cls, item):
+        """Builds an event from a Calendar API event resource. Raises KeyError/ValueError if malformed."""
+        start = parse_event_time(item['start'])
+        end = parse_event_time(item['end']) if 'end' in item else start
+        return cls(
+            id=item['id'],
+            summary=item.get('summary', 'No Title'),
+            start=start,
+            end=end,
+            all_day='dateTime' not in item['start'],
+            html_link=item.get('htmlLink'),
+        )
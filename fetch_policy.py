@@ -0,0 +1,127 @@
+# fetch_policy.py
+
+import random
+import time
+
+from instrumentation import get_instruments
+
+# Showing the overlay asks for a refresh; within this long of the last
+# successful sync the cached events are served instead.
+MIN_REFRESH_SECONDS = 300
+
+# Exponential backoff after quota and server errors, with jitter so clients that
+# failed together don't retry together.
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 30 * 60
+
+# After this many consecutive retryable failures the breaker opens and no calls
+# are made for BREAKER_OPEN_SECONDS; then a single trial call decides.
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_OPEN_SECONDS = 15 * 60
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def is_retryable(error):
+    """
+    True for errors that say "not now" rather than "never": quota and rate
+    limits (403, 429), server errors (5xx) and network failures, including
+    those hit while refreshing the access token.
+    """
+    import httplib2
+    from google.auth.exceptions import TransportError
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status in (403, 429) or status >= 500
+    return isinstance(error, (OSError, httplib2.HttpLib2Error, TransportError))
+
+
+class FetchPolicy:
+    """
+    Decides whether a calendar sync may hit the network right now.
+    Combines a minimum refresh interval, exponential backoff with jitter after
+    retryable errors, and a circuit breaker. Callers serve their last known good
+    events whenever allow_fetch() says no.
+    Not thread-safe; it is only used from the calendar fetch thread.
+    """
+    def __init__(self, clock=time.monotonic, rng=random.random):
+        self.clock = clock
+        self.rng = rng
+        self.state = CLOSED
+        self.failures = 0
+        self.last_success = None
+        self.retry_at = None
+
+    def allow_fetch(self):
+        now = self.clock()
+        if self.state == OPEN:
+            if now < self.retry_at:
+                return False
+            # Cool-down over: let exactly one trial call through.
+            self.state = HALF_OPEN
+            get_instruments().log('calendar_breaker', "Calendar circuit breaker half-open. Trying one sync.", state=HALF_OPEN)
+            return True
+        if self.state == HALF_OPEN:
+            # The trial call is still out.
+            return False
+        if self.retry_at is not None and now < self.retry_at:
+            return False
+        if self.last_success is not None and now - self.last_success < MIN_REFRESH_SECONDS:
+            return False
+        return True
+
+    def record_success(self):
+        if self.state != CLOSED:
+            get_instruments().log('calendar_breaker', "Calendar circuit breaker closed.", state=CLOSED)
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = None
+        self.last_success = self.clock()
+
+    def record_failure(self, error):
+        now = self.clock()
+        if not is_retryable(error):
+            # Retrying sooner won't fix a bad request or revoked credentials, so
+            # just wait out the normal refresh interval.
+            self.state = CLOSED
+            self.failures = 0
+            self.retry_at = now + MIN_REFRESH_SECONDS
+            return
+
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= BREAKER_FAILURE_THRESHOLD:
+            self.state = OPEN
+            self.retry_at = now + BREAKER_OPEN_SECONDS
+            instruments = get_instruments()
+            instruments.count('calendar_breaker_opens')
+            instruments.log(
+                'calendar_breaker',
+                f"Calendar circuit breaker open for {BREAKER_OPEN_SECONDS} s after {self.failures} failures.",
+                state=OPEN, failures=self.failures,
+            )
+            return
+
+        self.retry_at = now + self.backoff_delay(self.failures)
+        instruments = get_instruments()
+        instruments.count('calendar_backoffs')
+        instruments.log(
+            'calendar_backoff',
+            f"Backing off calendar sync for {self.retry_at - now:.0f} s.",
+            seconds=round(self.retry_at - now, 1), failures=self.failures,
+        )
+
+    def backoff_delay(self, attempt):
+        """Delay after the given number of consecutive failures: half fixed, half random."""
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+        return delay / 2 + self.rng() * delay / 2
+
+    def reset(self):
+        """Forgets all history, e.g. after the user asks for a refresh explicitly."""
+        self.state = CLOSED
+        self.failures = 0
+        self.last_success = None
+        self.retry_at = None
@@ -0,0 +1,565 @@
+# ics_reader.py
+
+import calendar
+import datetime
+import hashlib
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from event_model import CalendarEvent
+
+# Properties kept from each VEVENT; everything else is dropped while parsing.
+KEPT_PROPERTIES = (
+    'UID', 'SUMMARY', 'STATUS', 'URL', 'DTSTART', 'DTEND', 'DURATION',
+    'RRULE', 'RDATE', 'EXDATE', 'RECURRENCE-ID',
+)
+# Properties that may appear more than once and are collected into lists.
+MULTI_PROPERTIES = ('RDATE', 'EXDATE')
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+SUPPORTED_FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+# Rule parts expand_rrule() understands; rules with any other part (BYWEEKNO,
+# BYYEARDAY, BYHOUR, ...) only show their first occurrence.
+SUPPORTED_RULE_PARTS = ('FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'BYSETPOS', 'WKST')
+
+_warned_timezones = set()
+_warned_rules = set()
+
+
+# --- Streaming parser ---
+
+def _unfolded_lines(lines):
+    """Joins RFC 5545 folded lines (continuations start with a space or tab)."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _split_content_line(line):
+    """Splits 'NAME;PARAM=VALUE:value' into (name, params, value). Quoted parameter values may contain ':'."""
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        return None
+
+    name, *raw_params = head.split(';')
+    params = {}
+    for raw in raw_params:
+        key, _, param_value = raw.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _unescape(text):
+    return (
+        text.replace('\\n', '\n').replace('\\N', '\n')
+        .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+    )
+
+
+def _time_value(params, value):
+    """Compact, JSON-friendly form of a date or date-time property: [tzid, value]."""
+    return [params.get('TZID'), value]
+
+
+def iter_vevents(lines):
+    """
+    Yields one dict per VEVENT as soon as its END line is read, so files of any
+    size are parsed in constant memory. Only KEPT_PROPERTIES are kept; date and
+    time properties become [tzid, value] pairs (lists of them for RDATE/EXDATE).
+    Nested components such as VALARM are skipped.
+    """
+    event = None
+    depth = 0
+    for line in _unfolded_lines(lines):
+        parsed = _split_content_line(line)
+        if parsed is None:
+            continue
+        name, params, value = parsed
+        if name == 'BEGIN':
+            if event is not None:
+                depth += 1
+            elif value.upper() == 'VEVENT':
+                event = {}
+            continue
+        if name == 'END':
+            if depth:
+                depth -= 1
+            elif event is not None and value.upper() == 'VEVENT':
+                yield event
+                event = None
+            continue
+        if event is None or depth or name not in KEPT_PROPERTIES:
+            continue
+
+        if name in ('SUMMARY', 'URL', 'UID', 'STATUS', 'RRULE', 'DURATION'):
+            event[name] = _unescape(value) if name == 'SUMMARY' else value
+        elif name in MULTI_PROPERTIES:
+            event.setdefault(name, []).extend(
+                _time_value(params, part) for part in value.split(',') if part
+            )
+        else:
+            event[name] = _time_value(params, value)
+
+
+# --- Date and time values ---
+
+def _zone(tzid):
+    """Returns the tzinfo for a TZID, or None (floating, local time) if it is unknown here."""
+    if not tzid:
+        return None
+    try:
+        return ZoneInfo(tzid)
+    except (ZoneInfoNotFoundError, ValueError):
+        if tzid not in _warned_timezones:
+            _warned_timezones.add(tzid)
+            print(f"Unknown time zone '{tzid}' in calendar file. Treating its times as local time.")
+        return None
+
+
+def parse_time_value(time_value):
+    """
+    Returns (naive wall-clock datetime, tzinfo or None, is_date) for a [tzid, value] pair.
+    Recurrences are computed on the naive wall-clock time so they keep their
+    local time of day across DST changes.
+    """
+    tzid, value = time_value
+    # Slicing is several times faster than strptime, which matters for large calendars.
+    year, month, day = int(value[0:4]), int(value[4:6]), int(value[6:8])
+    if 'T' not in value:
+        return datetime.datetime(year, month, day), None, True
+    naive = datetime.datetime(year, month, day, int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if value.endswith('Z'):
+        return naive, datetime.UTC, False
+    return naive, _zone(tzid), False
+
+
+def _aware(naive, zone):
+    """Attaches the zone (local time if None) and converts to the local zone."""
+    if zone is None:
+        return naive.astimezone()
+    return naive.replace(tzinfo=zone).astimezone()
+
+
+def parse_duration(text):
+    """Parses an RFC 5545 DURATION such as 'PT1H30M', 'P1D' or '-P1W'."""
+    sign = -1 if text.startswith('-') else 1
+    text = text.lstrip('+-')[1:]
+    amounts = {'W': 0, 'D': 0, 'H': 0, 'M': 0, 'S': 0}
+    number = ''
+    for char in text:
+        if char.isdigit():
+            number += char
+        elif char in amounts:
+            amounts[char] = int(number or 0)
+            number = ''
+    return sign * datetime.timedelta(
+        weeks=amounts['W'], days=amounts['D'], hours=amounts['H'],
+        minutes=amounts['M'], seconds=amounts['S'],
+    )
+
+
+# --- Recurrence expansion ---
+
+def parse_rrule(text):
+    rule = {}
+    for part in text.split(';'):
+        key, _, value = part.partition('=')
+        rule[key.upper()] = value
+    return rule
+
+
+def _parse_byday(value):
+    """'MO,-1FR,2TU' -> [(None, 0), (-1, 4), (2, 1)]"""
+    result = []
+    for item in value.split(','):
+        item = item.strip().upper()
+        if len(item) < 2 or item[-2:] not in WEEKDAYS:
+            continue
+        ordinal = item[:-2]
+        result.append((int(ordinal) if ordinal not in ('', '+') else None, WEEKDAYS.index(item[-2:])))
+    return result
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip().lstrip('+-').isdigit()]
+
+
+def _select_by_weekday(days, byday):
+    """Days from a month or year that match BYDAY, where 'days' is that period's full list of dates."""
+    selected = set()
+    for ordinal, weekday in byday:
+        matching = [day for day in days if day.weekday() == weekday]
+        if ordinal is None:
+            selected.update(matching)
+        elif 0 < ordinal <= len(matching):
+            selected.add(matching[ordinal - 1])
+        elif 0 < -ordinal <= len(matching):
+            selected.add(matching[ordinal])
+    return selected
+
+
+def _month_days(year, month):
+    return [datetime.date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+
+
+def _month_candidates(year, month, rule, start_day):
+    days = _month_days(year, month)
+    byday = rule.get('byday')
+    bymonthday = rule.get('bymonthday')
+    if not byday and not bymonthday:
+        return [days[start_day - 1]] if start_day <= len(days) else []
+    selected = set(days)
+    if bymonthday:
+        selected &= {days[day - 1 if day > 0 else day] for day in bymonthday if 0 < abs(day) <= len(days)}
+    if byday:
+        selected &= _select_by_weekday(days, byday)
+    return sorted(selected)
+
+
+def _add_months(year, month, count):
+    index = year * 12 + month - 1 + count
+    return index // 12, index % 12 + 1
+
+
+def _period_candidates(freq, period_start, rule, dtstart):
+    """Dates a rule produces in the period (day, week, month or year) starting at period_start."""
+    if freq == 'DAILY':
+        candidates = [period_start]
+    elif freq == 'WEEKLY':
+        # Weeks start on WKST, so period_start is that weekday.
+        weekdays = [weekday for _, weekday in rule.get('byday') or []] or [dtstart.weekday()]
+        candidates = sorted(
+            period_start + datetime.timedelta(days=(weekday - period_start.weekday()) % 7) for weekday in set(weekdays)
+        )
+    elif freq == 'MONTHLY':
+        candidates = _month_candidates(period_start.year, period_start.month, rule, dtstart.day)
+    else:
+        months = rule.get('bymonth') or [dtstart.month]
+        if rule.get('byday') and not rule.get('bymonth') and not rule.get('bymonthday'):
+            # Ordinals like '20MO' count within the whole year.
+            year_days = [
+                datetime.date(period_start.year, 1, 1) + datetime.timedelta(days=offset)
+                for offset in range(366 if calendar.isleap(period_start.year) else 365)
+            ]
+            candidates = sorted(_select_by_weekday(year_days, rule['byday']))
+        else:
+            candidates = []
+            for month in sorted(months):
+                candidates.extend(_month_candidates(period_start.year, month, rule, dtstart.day))
+
+    if freq in ('DAILY', 'WEEKLY'):
+        if rule.get('bymonth'):
+            candidates = [day for day in candidates if day.month in rule['bymonth']]
+        if freq == 'DAILY' and rule.get('byday'):
+            weekdays = {weekday for _, weekday in rule['byday']}
+            candidates = [day for day in candidates if day.weekday() in weekdays]
+        if freq == 'DAILY' and rule.get('bymonthday'):
+            candidates = [day for day in candidates if day.day in rule['bymonthday']]
+    elif freq == 'MONTHLY' and rule.get('bymonth'):
+        candidates = [day for day in candidates if day.month in rule['bymonth']]
+
+    setpos = rule.get('bysetpos')
+    if setpos:
+        candidates = sorted({
+            candidates[pos - 1 if pos > 0 else pos] for pos in setpos if 0 < abs(pos) <= len(candidates)
+        })
+    return candidates
+
+
+def _first_period(freq, day, wkst=0):
+    if freq == 'WEEKLY':
+        return day - datetime.timedelta(days=(day.weekday() - wkst) % 7)
+    if freq == 'MONTHLY':
+        return day.replace(day=1)
+    if freq == 'YEARLY':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _advance_period(freq, period_start, periods):
+    if freq == 'DAILY':
+        return period_start + datetime.timedelta(days=periods)
+    if freq == 'WEEKLY':
+        return period_start + datetime.timedelta(weeks=periods)
+    if freq == 'MONTHLY':
+        year, month = _add_months(period_start.year, period_start.month, periods)
+        return datetime.date(year, month, 1)
+    return datetime.date(period_start.year + periods, 1, 1)
+
+
+def _periods_between(freq, first, target):
+    """How many whole periods lie between two period starts."""
+    if freq == 'DAILY':
+        return (target - first).days
+    if freq == 'WEEKLY':
+        return (target - first).days // 7
+    if freq == 'MONTHLY':
+        return (target.year - first.year) * 12 + target.month - first.month
+    return target.year - first.year
+
+
+def expand_rrule(rule_text, dtstart, zone, from_day, until_day):
+    """
+    Yields the naive wall-clock start of every occurrence of the rule, in order,
+    up to the last one starting on or before until_day.
+    Rules without COUNT jump straight to the period before from_day instead of
+    walking through years of history, so earlier occurrences may be skipped.
+    """
+    raw = parse_rrule(rule_text)
+    freq = raw.get('FREQ', '').upper()
+    unsupported = [part for part in raw if part not in SUPPORTED_RULE_PARTS]
+    if freq not in SUPPORTED_FREQUENCIES or unsupported:
+        if rule_text not in _warned_rules:
+            _warned_rules.add(rule_text)
+            detail = f" ({', '.join(unsupported)} not supported)" if unsupported else ''
+            print(f"Unsupported recurrence rule '{rule_text}'{detail}. Only its first occurrence is shown.")
+        yield dtstart
+        return
+
+    interval = max(1, int(raw.get('INTERVAL', '1') or 1))
+    count = int(raw['COUNT']) if raw.get('COUNT', '').isdigit() else None
+    until = None
+    if raw.get('UNTIL'):
+        until, until_zone, until_is_date = parse_time_value([None, raw['UNTIL']])
+        if until_is_date:
+            until = until.replace(hour=23, minute=59, second=59)
+        elif until_zone is not None:
+            # UNTIL is in UTC; compare in the event's own wall-clock time.
+            until = _to_wall_clock(until, until_zone, zone)
+    rule = {
+        'byday': _parse_byday(raw['BYDAY']) if raw.get('BYDAY') else None,
+        'bymonthday': _int_list(raw['BYMONTHDAY']) if raw.get('BYMONTHDAY') else None,
+        'bymonth': _int_list(raw['BYMONTH']) if raw.get('BYMONTH') else None,
+        'bysetpos': _int_list(raw['BYSETPOS']) if raw.get('BYSETPOS') else None,
+    }
+    wkst = raw.get('WKST', 'MO').upper()
+    wkst = WEEKDAYS.index(wkst) if wkst in WEEKDAYS else 0
+
+    time_of_day = dtstart.time()
+    first_period = _first_period(freq, dtstart.date(), wkst)
+    period = first_period
+    produced = 0
+    if count is None and from_day is not None:
+        # COUNT needs every earlier occurrence to be counted; everything else can skip
+        # to the last period before from_day that the interval lands on.
+        skip = _periods_between(freq, first_period, _first_period(freq, from_day, wkst)) - 1
+        if skip > 0:
+            period = _advance_period(freq, first_period, skip - skip % interval)
+
+    # A rule that never matches (e.g. BYMONTHDAY=31 with BYMONTH=2) must still end.
+    empty_periods = 0
+    while empty_periods < 1000:
+        if until_day is not None and period > until_day:
+            return
+        candidates = _period_candidates(freq, period, rule, dtstart)
+        empty_periods = 0 if candidates else empty_periods + 1
+        for day in candidates:
+            occurrence = datetime.datetime.combine(day, time_of_day)
+            if occurrence < dtstart:
+                continue
+            if until is not None and occurrence > until:
+                return
+            if until_day is not None and day > until_day:
+                return
+            yield occurrence
+            produced += 1
+            if count is not None and produced >= count:
+                return
+        period = _advance_period(freq, period, interval)
+
+
+# --- Events ---
+
+def _to_wall_clock(naive, source_zone, target_zone):
+    """Converts a wall-clock time between zones; None means local time."""
+    aware = naive.replace(tzinfo=source_zone) if source_zone else naive.astimezone()
+    converted = aware.astimezone(target_zone) if target_zone else aware.astimezone()
+    return converted.replace(tzinfo=None)
+
+
+def _instance_id(uid, naive, zone, is_date):
+    if is_date:
+        return f"{uid}_{naive:%Y%m%d}"
+    utc = naive.replace(tzinfo=zone).astimezone(datetime.UTC) if zone else naive.astimezone(datetime.UTC)
+    return f"{uid}_{utc:%Y%m%dT%H%M%SZ}"
+
+
+def expand_events(vevents, window_start, window_end):
+    """
+    Turns parsed VEVENT dicts into CalendarEvent records overlapping
+    [window_start, window_end), expanding RRULE/RDATE, applying EXDATE and
+    replacing instances that have a RECURRENCE-ID override. Recurrences are only
+    expanded as far as window_end.
+    Events with malformed values (dates, INTERVAL, BYDAY, ...) are skipped with
+    a warning instead of failing the whole calendar.
+    """
+    overrides = {}
+    masters = []
+    for vevent in vevents:
+        if 'DTSTART' not in vevent:
+            continue
+        if 'RECURRENCE-ID' in vevent:
+            overrides.setdefault(vevent.get('UID'), []).append(vevent)
+        else:
+            masters.append(vevent)
+
+    # Bounds for a cheap string comparison on the raw YYYYMMDD values, with two
+    # days of slack for time zones, so one-off events far outside the window are
+    # skipped without being parsed.
+    first_key = f"{window_start.date() - datetime.timedelta(days=2):%Y%m%d}"
+    last_key = f"{window_end.date() + datetime.timedelta(days=2):%Y%m%d}"
+
+    events = []
+    for vevent in masters:
+        added = len(events)
+        try:
+            _expand_master(events, vevent, overrides, window_start, window_end, first_key, last_key)
+        except (ValueError, IndexError) as e:
+            # A malformed value only costs its own event (or series), never the agenda.
+            del events[added:]
+            _skip_malformed(vevent, e)
+
+    # Overrides whose master isn't in the file are shown as plain events.
+    master_uids = {vevent.get('UID') for vevent in masters}
+    for uid, items in overrides.items():
+        if uid in master_uids:
+            continue
+        for override in items:
+            if override.get('STATUS', '').upper() == 'CANCELLED':
+                continue
+            try:
+                o_start, o_zone, o_is_date = parse_time_value(override['DTSTART'])
+                original, _, _ = parse_time_value(override['RECURRENCE-ID'])
+                _append_if_visible(
+                    events, override, _instance_id(uid, original, o_zone, o_is_date),
+                    o_start, o_zone, o_is_date, _duration(override, o_start, o_zone, o_is_date),
+                    window_start, window_end,
+                )
+            except (ValueError, IndexError) as e:
+                _skip_malformed(override, e)
+    return events
+
+
+def _expand_master(events, vevent, overrides, window_start, window_end, first_key, last_key):
+    """Appends the visible instances of one non-override VEVENT; raises ValueError or IndexError on malformed values."""
+    if vevent.get('STATUS', '').upper() == 'CANCELLED':
+        return
+    if 'RRULE' not in vevent and 'RDATE' not in vevent:
+        if vevent['DTSTART'][1][:8] > last_key:
+            return
+        if 'DURATION' not in vevent and vevent.get('DTEND', vevent['DTSTART'])[1][:8] < first_key:
+            return
+    uid = vevent.get('UID') or _fallback_uid(vevent)
+    dtstart, zone, is_date = parse_time_value(vevent['DTSTART'])
+    duration = _duration(vevent, dtstart, zone, is_date)
+
+    if 'RRULE' not in vevent and 'RDATE' not in vevent:
+        _append_if_visible(events, vevent, uid, dtstart, zone, is_date, duration, window_start, window_end)
+        return
+
+    excluded = set()
+    for time_value in vevent.get('EXDATE', []):
+        excluded.add(_occurrence_key(time_value, zone, is_date))
+    replaced = {}
+    for override in overrides.get(vevent.get('UID'), []):
+        replaced[_occurrence_key(override['RECURRENCE-ID'], zone, is_date)] = override
+
+    # Expansion runs in the event's wall-clock time, so pad the window by a day
+    # for zone differences and by the duration for occurrences still running.
+    from_day = (_to_wall_clock(window_start.replace(tzinfo=None), window_start.tzinfo, zone).date()
+                - datetime.timedelta(days=duration.days + 1))
+    until_day = _to_wall_clock(window_end.replace(tzinfo=None), window_end.tzinfo, zone).date() + datetime.timedelta(days=1)
+    starts = set()
+    if 'RRULE' in vevent:
+        starts.update(expand_rrule(vevent['RRULE'], dtstart, zone, from_day, until_day))
+    else:
+        starts.add(dtstart)
+    for time_value in vevent.get('RDATE', []):
+        starts.add(parse_time_value(time_value)[0])
+
+    for start in sorted(starts):
+        key = start.date() if is_date else start
+        if key in excluded or key in replaced:
+            continue
+        _append_if_visible(
+            events, vevent, _instance_id(uid, start, zone, is_date),
+            start, zone, is_date, duration, window_start, window_end,
+        )
+
+    for override in replaced.values():
+        if override.get('STATUS', '').upper() == 'CANCELLED':
+            continue
+        original, _, _ = parse_time_value(override['RECURRENCE-ID'])
+        o_start, o_zone, o_is_date = parse_time_value(override['DTSTART'])
+        _append_if_visible(
+            events, override, _instance_id(uid, original, zone, is_date),
+            o_start, o_zone, o_is_date, _duration(override, o_start, o_zone, o_is_date),
+            window_start, window_end,
+        )
+
+
+def _skip_malformed(vevent, error):
+    print(f"Skipping malformed calendar event '{vevent.get('UID') or vevent.get('SUMMARY', '?')}': {error}")
+
+
+def _fallback_uid(vevent):
+    """An id for events without a UID that stays the same when other events are added or reordered."""
+    tzid, value = vevent['DTSTART']
+    content = f"{tzid or ''}|{value}|{vevent.get('SUMMARY', '')}"
+    return f"ics-{hashlib.sha1(content.encode('utf-8', 'replace')).hexdigest()[:16]}"
+
+
+def _occurrence_key(time_value, zone, is_date):
+    """Normalises an EXDATE/RECURRENCE-ID to the master's wall-clock time (or date)."""
+    naive, value_zone, value_is_date = parse_time_value(time_value)
+    if is_date or value_is_date:
+        return naive.date()
+    if value_zone is None or value_zone == zone:
+        # Values without a zone share the master's.
+        return naive
+    return _to_wall_clock(naive, value_zone, zone)
+
+
+def _duration(vevent, dtstart, zone, is_date):
+    if 'DTEND' in vevent:
+        end, end_zone, _ = parse_time_value(vevent['DTEND'])
+        if is_date:
+            return end - dtstart
+        return _aware(end, end_zone) - _aware(dtstart, zone)
+    if 'DURATION' in vevent:
+        return parse_duration(vevent['DURATION'])
+    return datetime.timedelta(days=1) if is_date else datetime.timedelta()
+
+
+def _append_if_visible(events, vevent, event_id, naive_start, zone, is_date, duration, window_start, window_end):
+    if is_date:
+        # All-day events are local midnight to local midnight, like the API path.
+        start = naive_start.astimezone()
+        end = (naive_start + duration).astimezone()
+    else:
+        start = _aware(naive_start, zone)
+        end = start + duration
+    if start >= window_end or max(end, start) <= window_start:
+        return
+    events.append(CalendarEvent(
+        id=event_id,
+        summary=vevent.get('SUMMARY', 'No Title'),
+        start=start,
+        end=end,
+        all_day=is_date,
+        html_link=vevent.get('URL'),
+    ))
@@ -1,26 +1,424 @@
 import ctypes
-import ctypes.wintypes
+import ctypes.util
+import os
+import sys
+import time
 
-# Define the LASTINPUTINFO structure from the Windows API. Thisstructure is used to retrieve the time of the last input event.
+# Set this environment variable to force a backend: windows, x11, mutter, logind or fake.
+BACKEND_ENV_VAR = 'FOCUSVIEW_IDLE_BACKEND'
+
+
+class IdleBackend:
+    """
+    Base class for idle-detection backends.
+    Every backend reports the current idle time. Backends that set
+    supports_notifications can additionally push idle and resume notifications,
+    so the controller does not need to poll them while the overlay is hidden.
+    """
+    name = 'base'
+    supports_notifications = False
+
+    @classmethod
+    def is_available(cls):
+        return False
+
+    def get_idle_time(self):
+        """Returns the number of seconds since the last user input."""
+        raise NotImplementedError
+
+    def start_notifications(self, threshold_seconds, on_idle, on_resume):
+        """
+        Calls on_idle() once the user has been idle for threshold_seconds and
+        on_resume() on the first input after that.
+        """
+        raise NotImplementedError(f"The {self.name} backend cannot push notifications.")
+
+    def stop_notifications(self):
+        pass
+
+
+# --- Windows ---
+
+# Define the LASTINPUTINFO structure from the Windows API. This structure is used to retrieve the time of the last input event.
 class LASTINPUTINFO(ctypes.Structure):
     _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
 
+
+class WindowsIdleBackend(IdleBackend):
+    name = 'windows'
+
+    @classmethod
+    def is_available(cls):
+        return sys.platform == 'win32'
+
+    def get_idle_time(self):
+        #Returns the number of seconds the system has been idle. It works by comparing the tick count of the last input event with the current system tick count.
+        lastInputInfo = LASTINPUTINFO()
+        lastInputInfo.cbSize = ctypes.sizeof(lastInputInfo)
+
+        # Call the GetLastInputInfo function from user32.dll.
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(lastInputInfo)):
+            # Get the current system tick count.
+            current_tick = ctypes.windll.kernel32.GetTickCount()
+            last_input_tick = lastInputInfo.dwTime
+
+            # Calculate the idle time in milliseconds. Both counters are 32-bit and wrap after ~49 days.
+            idle_millis = (current_tick - last_input_tick) & 0xFFFFFFFF
+
+            # Return idle time in seconds.
+            return idle_millis / 1000.0
+
+        return 0.0 # Return 0.0 on failure.
+
+
+# --- X11 (XScreenSaver extension) ---
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ('window', ctypes.c_ulong),
+        ('state', ctypes.c_int),
+        ('kind', ctypes.c_int),
+        ('til_or_since', ctypes.c_ulong),
+        ('idle', ctypes.c_ulong),
+        ('eventMask', ctypes.c_ulong),
+    ]
+
+
+class X11IdleBackend(IdleBackend):
+    """Reads the idle time from the X server through libXss. Also works under XWayland on some compositors."""
+    name = 'x11'
+
+    def __init__(self):
+        self._xlib = ctypes.cdll.LoadLibrary(ctypes.util.find_library('X11'))
+        self._xss = ctypes.cdll.LoadLibrary(ctypes.util.find_library('Xss'))
+
+        self._xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self._xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        self._xss.XScreenSaverQueryInfo.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)
+        ]
+
+        # The display connection and info struct are reused for every query.
+        self._display = self._xlib.XOpenDisplay(None)
+        if not self._display:
+            raise RuntimeError("Cannot open the X display.")
+        self._root = self._xlib.XDefaultRootWindow(self._display)
+        self._info = self._xss.XScreenSaverAllocInfo()
+
+    @classmethod
+    def is_available(cls):
+        return bool(
+            os.environ.get('DISPLAY')
+            and ctypes.util.find_library('X11')
+            and ctypes.util.find_library('Xss')
+        )
+
+    def get_idle_time(self):
+        if self._xss.XScreenSaverQueryInfo(self._display, self._root, self._info):
+            return self._info.contents.idle / 1000.0
+        return 0.0
+
+
+# --- D-Bus backends (Linux) ---
+
+def _dbus_value(value):
+    """Unwraps a QDBusVariant returned by org.freedesktop.DBus.Properties.Get."""
+    return value.variant() if hasattr(value, 'variant') else value
+
+
+class MutterIdleBackend(IdleBackend):
+    """
+    Uses the compositor's idle monitor on GNOME (X11 and Wayland).
+    Idle and user-active watches are pushed as D-Bus signals, so no polling is needed.
+    Requires a running QCoreApplication.
+    """
+    name = 'mutter'
+    supports_notifications = True
+
+    SERVICE = 'org.gnome.Mutter.IdleMonitor'
+    PATH = '/org/gnome/Mutter/IdleMonitor/Core'
+    INTERFACE = 'org.gnome.Mutter.IdleMonitor'
+
+    def __init__(self):
+        from PyQt6.QtDBus import QDBusConnection, QDBusInterface
+
+        self._bus = QDBusConnection.sessionBus()
+        self._iface = QDBusInterface(self.SERVICE, self.PATH, self.INTERFACE, self._bus)
+        if not self._iface.isValid():
+            raise RuntimeError("The GNOME idle monitor is not available on the session bus.")
+        self._receiver = None
+        self._idle_watch = None
+        self._active_watch = None
+
+    @classmethod
+    def is_available(cls):
+        try:
+            from PyQt6.QtDBus import QDBusConnection
+        except ImportError:
+            return False
+        bus = QDBusConnection.sessionBus()
+        return bus.isConnected() and bus.interface().isServiceRegistered(cls.SERVICE).value()
+
+    def get_idle_time(self):
+        reply = self._iface.call('GetIdletime')
+        arguments = reply.arguments()
+        return arguments[0] / 1000.0 if arguments else 0.0
+
+    def start_notifications(self, threshold_seconds, on_idle, on_resume):
+        self._receiver = _make_signal_receiver(self._on_watch_fired)
+        self._bus.connect(self.SERVICE, self.PATH, self.INTERFACE, 'WatchFired', self._receiver.receive)
+        self._on_idle = on_idle
+        self._on_resume = on_resume
+
+        reply = self._iface.call('AddIdleWatch', _uint64(int(threshold_seconds * 1000)))
+        self._idle_watch = reply.arguments()[0] if reply.arguments() else None
+
+    def stop_notifications(self):
+        for watch in (self._idle_watch, self._active_watch):
+            if watch is not None:
+                self._iface.call('RemoveWatch', _uint32(watch))
+        self._idle_watch = self._active_watch = None
+        if self._receiver is not None:
+            self._bus.disconnect(self.SERVICE, self.PATH, self.INTERFACE, 'WatchFired', self._receiver.receive)
+            self._receiver = None
+
+    def _on_watch_fired(self, message):
+        watch_id = message.arguments()[0]
+        if watch_id == self._idle_watch:
+            # User-active watches are one-shot, so re-arm one for every idle period.
+            reply = self._iface.call('AddUserActiveWatch')
+            self._active_watch = reply.arguments()[0] if reply.arguments() else None
+            self._on_idle()
+        elif watch_id == self._active_watch:
+            self._active_watch = None
+            self._on_resume()
+
+
+class LogindIdleBackend(IdleBackend):
+    """
+    Follows the IdleHint of the current logind session.
+    The hint is raised by the desktop environment after its own idle delay, so
+    on_idle fires at the later of that delay and the threshold. It is only picked
+    automatically when no more precise backend is available.
+    Requires a running QCoreApplication.
+    """
+    name = 'logind'
+    supports_notifications = True
+
+    SERVICE = 'org.freedesktop.login1'
+    MANAGER_PATH = '/org/freedesktop/login1'
+    SESSION_INTERFACE = 'org.freedesktop.login1.Session'
+    PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+    def __init__(self):
+        from PyQt6.QtDBus import QDBusConnection, QDBusInterface
+
+        self._bus = QDBusConnection.systemBus()
+        manager = QDBusInterface(self.SERVICE, self.MANAGER_PATH, 'org.freedesktop.login1.Manager', self._bus)
+        reply = manager.call('GetSessionByPID', _uint32(os.getpid()))
+        if not reply.arguments():
+            raise RuntimeError("This process does not belong to a logind session.")
+        self._session_path = reply.arguments()[0].path()
+        self._properties = QDBusInterface(self.SERVICE, self._session_path, self.PROPERTIES_INTERFACE, self._bus)
+        self._receiver = None
+        self._idle_timer = None
+
+    @classmethod
+    def is_available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            from PyQt6.QtDBus import QDBusConnection
+        except ImportError:
+            return False
+        bus = QDBusConnection.systemBus()
+        return bus.isConnected() and bus.interface().isServiceRegistered(cls.SERVICE).value()
+
+    def _get_property(self, name):
+        reply = self._properties.call('Get', self.SESSION_INTERFACE, name)
+        arguments = reply.arguments()
+        return _dbus_value(arguments[0]) if arguments else None
+
+    def get_idle_time(self):
+        if not self._get_property('IdleHint'):
+            return 0.0
+        idle_since = self._get_property('IdleSinceHintMonotonic')
+        if not idle_since:
+            return 0.0
+        return max(0.0, time.monotonic() - idle_since / 1_000_000)
+
+    def start_notifications(self, threshold_seconds, on_idle, on_resume):
+        from PyQt6.QtCore import QTimer
+
+        self._threshold = threshold_seconds
+        self._on_idle = on_idle
+        self._on_resume = on_resume
+        self._is_idle = False
+        self._idle_timer = QTimer()
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self._fire_idle)
+
+        self._receiver = _make_signal_receiver(self._on_properties_changed)
+        self._bus.connect(self.SERVICE, self._session_path, self.PROPERTIES_INTERFACE,
+                          'PropertiesChanged', self._receiver.receive)
+        self._update_hint(bool(self._get_property('IdleHint')))
+
+    def stop_notifications(self):
+        if self._idle_timer is not None:
+            self._idle_timer.stop()
+            self._idle_timer = None
+        if self._receiver is not None:
+            self._bus.disconnect(self.SERVICE, self._session_path, self.PROPERTIES_INTERFACE,
+                                 'PropertiesChanged', self._receiver.receive)
+            self._receiver = None
+
+    def _on_properties_changed(self, message):
+        arguments = message.arguments()
+        if len(arguments) < 2 or arguments[0] != self.SESSION_INTERFACE:
+            return
+        changed = arguments[1]
+        if 'IdleHint' in changed:
+            self._update_hint(bool(_dbus_value(changed['IdleHint'])))
+
+    def _update_hint(self, idle_hint):
+        if idle_hint:
+            # Wait out whatever part of the threshold has not elapsed yet.
+            remaining = self._threshold - self.get_idle_time()
+            self._idle_timer.start(max(0, int(remaining * 1000)))
+            return
+        self._idle_timer.stop()
+        if self._is_idle:
+            self._is_idle = False
+            self._on_resume()
+
+    def _fire_idle(self):
+        self._is_idle = True
+        self._on_idle()
+
+
+def _uint32(value):
+    from PyQt6.QtCore import QMetaType
+    from PyQt6.QtDBus import QDBusArgument
+    return QDBusArgument(value, QMetaType.Type.UInt.value)
+
+
+def _uint64(value):
+    from PyQt6.QtCore import QMetaType
+    from PyQt6.QtDBus import QDBusArgument
+    return QDBusArgument(value, QMetaType.Type.ULongLong.value)
+
+
+def _make_signal_receiver(callback):
+    """Wraps a callback in a QObject slot that QDBusConnection.connect can deliver messages to."""
+    from PyQt6.QtCore import QObject, pyqtSlot
+    from PyQt6.QtDBus import QDBusMessage
+
+    class Receiver(QObject):
+        @pyqtSlot(QDBusMessage)
+        def receive(self, message):
+            callback(message)
+
+    return Receiver()
+
+
+# --- Fake backend for tests ---
+
+class FakeIdleBackend(IdleBackend):
+    """
+    Deterministic backend driven by the caller instead of real input.
+    Idle time only changes through advance() and simulate_input(), which makes
+    show/hide behaviour reproducible in tests and benchmarks.
+    """
+    name = 'fake'
+
+    def __init__(self, supports_notifications=False):
+        self.supports_notifications = supports_notifications
+        self.idle_time = 0.0
+        self._threshold = None
+        self._notified_idle = False
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def get_idle_time(self):
+        return self.idle_time
+
+    def start_notifications(self, threshold_seconds, on_idle, on_resume):
+        if not self.supports_notifications:
+            return super().start_notifications(threshold_seconds, on_idle, on_resume)
+        self._threshold = threshold_seconds
+        self._on_idle = on_idle
+        self._on_resume = on_resume
+        self._check_threshold()
+
+    def stop_notifications(self):
+        self._threshold = None
+
+    def advance(self, seconds):
+        self.idle_time += seconds
+        self._check_threshold()
+
+    def set_idle_time(self, seconds):
+        self.idle_time = float(seconds)
+        self._check_threshold()
+
+    def simulate_input(self):
+        self.idle_time = 0.0
+        if self._threshold is not None and self._notified_idle:
+            self._notified_idle = False
+            self._on_resume()
+
+    def _check_threshold(self):
+        if self._threshold is not None and not self._notified_idle and self.idle_time >= self._threshold:
+            self._notified_idle = True
+            self._on_idle()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (WindowsIdleBackend, X11IdleBackend, MutterIdleBackend, LogindIdleBackend, FakeIdleBackend)
+}
+
+
+def create_backend(name=None):
+    """
+    Returns an idle backend instance. Uses the given name or the FOCUSVIEW_IDLE_BACKEND
+    environment variable if set, otherwise the most precise backend available here.
+    """
+    name = name or os.environ.get(BACKEND_ENV_VAR)
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown idle backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+        return BACKENDS[name]()
+
+    if sys.platform == 'win32':
+        candidates = [WindowsIdleBackend]
+    elif os.environ.get('WAYLAND_DISPLAY'):
+        # X11 idle times under XWayland only cover X clients, so prefer the compositor.
+        candidates = [MutterIdleBackend, LogindIdleBackend, X11IdleBackend]
+    else:
+        candidates = [MutterIdleBackend, X11IdleBackend, LogindIdleBackend]
+
+    for backend in candidates:
+        if not backend.is_available():
+            continue
+        try:
+            return backend()
+        except (OSError, RuntimeError) as e:
+            print(f"Idle backend '{backend.name}' unavailable: {e}")
+    raise RuntimeError("No idle detection backend is available on this system.")
+
+
+_default_backend = None
+
+
 def get_idle_time():
- #Returns the number of seconds the system has been idle (Windows only). It works by comparing the tick count of the last input event with the current system tick count.
-    
-    lastInputInfo = LASTINPUTINFO()
-    lastInputInfo.cbSize = ctypes.sizeof(lastInputInfo)
-
-    # Call the GetLastInputInfo function from user32.dll. [9]
-    if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(lastInputInfo)):
-        # Get the current system tick count.
-        current_tick = ctypes.windll.kernel32.GetTickCount()
-        last_input_tick = lastInputInfo.dwTime
-        
-        # Calculate the idle time in milliseconds.
-        idle_millis = current_tick - last_input_tick
-        
-        # Return idle time in seconds.
-        return idle_millis / 1000.0
-        
-    return 0.0 # Return 0.0 on failure.
\ No newline at end of file
+    """Returns the number of seconds the system has been idle, using the default backend."""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = create_backend()
+    return _default_backend.get_idle_time()
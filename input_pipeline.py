@@ -0,0 +1,127 @@
+# input_pipeline.py
+
+import enum
+import math
+import time
+from PyQt6.QtCore import QEvent, QObject, QTimer, Qt, pyqtSignal
+
+# Pointer travel (in logical pixels) that counts as the user moving the mouse.
+# Smaller movements are sensor noise: desk vibrations, high-DPI mice settling.
+MOTION_THRESHOLD_PX = 12
+# Travel has to reach the threshold within this window; slow drift is re-anchored.
+MOTION_WINDOW_SECONDS = 0.5
+# Input is collected for one frame before a hide is requested.
+FRAME_MS = 16
+# After a right-click or Alt opens the menu, the idle check won't hide the
+# overlay for this long even though the idle time was reset.
+MENU_GRACE_SECONDS = 3.0
+
+
+class HideReason(enum.Enum):
+    """Why the overlay was hidden."""
+    KEY_PRESS = 'key press'
+    MOUSE_BUTTON = 'mouse button'
+    MOUSE_MOTION = 'mouse motion'
+    WHEEL = 'mouse wheel'
+    IDLE_RESET = 'idle time reset'
+    SNOOZE = 'snoozed'
+    POSTPONE = 'postponed'
+    MARK_DONE = 'event marked done'
+    CLOSE_SESSION = 'closed for session'
+
+
+class InputPipeline(QObject):
+    """
+    Turns raw input on the overlay windows into at most one hide request per
+    shown period. Installed as an event filter on every overlay window.
+    - Right-click and Alt open the context menu instead (menu_requested) and
+      hold off idle-based hides for MENU_GRACE_SECONDS.
+    - Pointer motion only counts once it travels MOTION_THRESHOLD_PX from where
+      it rested, so jitter never hides the overlay.
+    - Everything that arrives within a frame is coalesced: the first reason
+      wins and hide_requested fires once, then the pipeline stays disarmed
+      until arm() is called for the next show.
+    """
+    hide_requested = pyqtSignal(HideReason)
+    # Carries the global QPoint of a right-click, or None for "centre of the overlay".
+    menu_requested = pyqtSignal(object)
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__()
+        self.clock = clock
+        self.armed = False
+        self.pending_reason = None
+        self.grace_until = 0.0
+        self._anchor = None
+        self._anchor_time = 0.0
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._frame_timer.setInterval(FRAME_MS)
+        self._frame_timer.timeout.connect(self._flush)
+
+    def arm(self):
+        """Starts a new shown period in which one hide may be requested."""
+        self.armed = True
+        self.pending_reason = None
+        self._anchor = None
+
+    def disarm(self):
+        self.armed = False
+        self.pending_reason = None
+        self._frame_timer.stop()
+
+    def in_grace_period(self):
+        return self.clock() < self.grace_until
+
+    def start_grace_period(self):
+        """Holds off idle-based hides while the context menu opens."""
+        self.grace_until = self.clock() + MENU_GRACE_SECONDS
+
+    def eventFilter(self, obj, event):
+        event_type = event.type()
+
+        if event_type == QEvent.Type.MouseButtonPress:
+            if event.button() == Qt.MouseButton.RightButton:
+                self._open_menu(event.globalPosition().toPoint())
+                return True
+            self._note(HideReason.MOUSE_BUTTON)
+        elif event_type == QEvent.Type.KeyPress:
+            if event.key() in (Qt.Key.Key_Alt, Qt.Key.Key_AltGr):
+                self._open_menu(None)
+                return True
+            self._note(HideReason.KEY_PRESS)
+        elif event_type == QEvent.Type.MouseMove:
+            self._on_motion(event.globalPosition())
+        elif event_type == QEvent.Type.Wheel:
+            self._note(HideReason.WHEEL)
+        return False
+
+    def _open_menu(self, position):
+        self.start_grace_period()
+        self.menu_requested.emit(position)
+
+    def _on_motion(self, position):
+        now = self.clock()
+        if self._anchor is None or now - self._anchor_time > MOTION_WINDOW_SECONDS:
+            # Measure from where the pointer rested; slow drift never adds up.
+            self._anchor = position
+            self._anchor_time = now
+            return
+        distance = math.hypot(position.x() - self._anchor.x(), position.y() - self._anchor.y())
+        if distance >= MOTION_THRESHOLD_PX:
+            self._note(HideReason.MOUSE_MOTION)
+
+    def _note(self, reason):
+        if not self.armed or self.pending_reason is not None:
+            return
+        self.pending_reason = reason
+        self._frame_timer.start()
+
+    def _flush(self):
+        reason = self.pending_reason
+        if not self.armed or reason is None:
+            return
+        self.disarm()
+        self.hide_requested.emit(reason)
@@ -0,0 +1,356 @@
+# instrumentation.py
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+METRICS_LOG_ENV_VAR = 'FOCUSVIEW_METRICS_LOG'
+# Path of a JSON lines file that receives every span, counter increment and
+# diagnostic; None keeps them on the console only.
+# FOCUSVIEW_METRICS_LOG overrides it.
+METRICS_LOG = None
+# The log is written by a background thread, which flushes it at most this long
+# after a record arrives, so recording never waits on the disk.
+LOG_FLUSH_SECONDS = 1.0
+METRICS_PORT_ENV_VAR = 'FOCUSVIEW_METRICS_PORT'
+# Port of the local metrics endpoint (Prometheus text format on /metrics); 0 disables it.
+# In split mode the overlay process serves its own metrics on the next port.
+# FOCUSVIEW_METRICS_PORT overrides it.
+METRICS_PORT = 0
+# The endpoint is only ever reachable from this machine.
+METRICS_HOST = '127.0.0.1'
+METRIC_PREFIX = 'focusview_'
+# Upper bounds (seconds) of the span histogram buckets, from a paint to a slow sync.
+SPAN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# How often the sampling profiler looks at the GUI thread's stack while it runs.
+PROFILE_INTERVAL_SECONDS = 0.005
+# Folded stacks of the last profile, ready for flamegraph.pl or speedscope.
+PROFILE_FILE = 'focusview_profile.folded'
+
+_instruments = None
+# Queued by close() to make the log writer flush and exit.
+_CLOSE_LOG = object()
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Span:
+    """Times a block: `with instruments.span('name') as span:`; labels may still be set inside it."""
+    __slots__ = ('instruments', 'name', 'labels', 'started')
+
+    def __init__(self, instruments, name, labels):
+        self.instruments = instruments
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels.setdefault('outcome', 'error')
+        self.instruments.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that can be switched on and off while FocusView runs.
+    A background thread samples the Python stack of one thread (the GUI thread
+    by default) every PROFILE_INTERVAL_SECONDS and counts identical stacks, so
+    the profiled code runs at full speed and nothing is traced. Samples taken
+    while the event loop waits end in the frame that called exec(). A sample
+    can only be taken when the GUI thread releases the GIL, which busy Python
+    code does at least every sys.getswitchinterval().
+    """
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.interval = interval
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.samples = {}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='focusview-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling and returns the profile as folded stacks, one 'a;b;c count' line each."""
+        if not self.running:
+            return self.folded()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return self.folded()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+
+class Instruments:
+    """
+    Spans, counters and gauges for one process, plus its diagnostics.
+    Every record is appended to the JSON lines log when one is configured, by a
+    writer thread that flushes it within LOG_FLUSH_SECONDS and on close(); the aggregates are
+    served in the Prometheus text format by start_endpoint(). Safe to use from
+    the calendar fetch thread; recording is a dictionary update under a lock,
+    so it can stay on in production.
+    """
+    def __init__(self, log_path=None, process='main'):
+        self.process = process
+        self.counters = {}
+        self.gauges = {}
+        # (name, label key) -> [count per bucket..., sum, count]
+        self.spans = {}
+        self.profiler = SamplingProfiler()
+        self.server = None
+        self._lock = threading.Lock()
+        self._log_queue = None
+        self._log_writer = None
+        if log_path:
+            try:
+                log = open(log_path, 'a', encoding='utf-8')
+            except OSError as e:
+                print(f"Could not open metrics log '{log_path}': {e}")
+            else:
+                self._log_queue = queue.SimpleQueue()
+                self._log_writer = threading.Thread(
+                    target=self._write_log, args=(log, self._log_queue), name='focusview-metrics-log', daemon=True
+                )
+                self._log_writer.start()
+
+    # --- Recording ---
+
+    def count(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._export({'type': 'count', 'name': name, 'amount': amount, **labels})
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+        self._export({'type': 'gauge', 'name': name, 'value': value, **labels})
+
+    def observe(self, name, seconds, **labels):
+        """Records one span of the given duration."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            entry = self.spans.get(key)
+            if entry is None:
+                entry = self.spans[key] = [0] * (len(SPAN_BUCKETS) + 2)
+            for index, bound in enumerate(SPAN_BUCKETS):
+                if seconds <= bound:
+                    entry[index] += 1
+                    break
+            entry[-2] += seconds
+            entry[-1] += 1
+        self._export({'type': 'span', 'name': name, 'ms': round(seconds * 1000, 3), **labels})
+
+    def span(self, name, **labels):
+        return Span(self, name, labels)
+
+    def log(self, name, message, **fields):
+        """Prints a diagnostic and exports it as a record named name, with fields as structured data."""
+        print(message)
+        self._export({'type': 'log', 'name': name, 'message': message, **fields})
+
+    def _export(self, record):
+        log_queue = self._log_queue
+        if log_queue is None:
+            return
+        # Serialising and writing happen on the writer thread.
+        log_queue.put({'ts': round(time.time(), 3), 'process': self.process, **record})
+
+    def _write_log(self, log, log_queue):
+        """Runs on the writer thread: serialises queued records and flushes within LOG_FLUSH_SECONDS."""
+        flush_at = None
+        while True:
+            timeout = None if flush_at is None else max(0.0, flush_at - time.monotonic())
+            try:
+                record = log_queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            try:
+                if record is _CLOSE_LOG:
+                    log.close()
+                    return
+                if record is not None:
+                    log.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str) + '\n')
+                    if flush_at is None:
+                        flush_at = time.monotonic() + LOG_FLUSH_SECONDS
+                if flush_at is not None and time.monotonic() >= flush_at:
+                    flush_at = None
+                    log.flush()
+            except (OSError, ValueError):
+                pass
+
+    # --- Export ---
+
+    def prometheus_text(self):
+        """The aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            spans = {key: list(entry) for key, entry in self.spans.items()}
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, key), value in sorted(counters.items()):
+            metric = f'{METRIC_PREFIX}{name}_total'
+            declare(metric, 'counter')
+            lines.append(f'{metric}{_format_labels(key)} {value}')
+        for (name, key), value in sorted(gauges.items()):
+            metric = f'{METRIC_PREFIX}{name}'
+            declare(metric, 'gauge')
+            lines.append(f'{metric}{_format_labels(key)} {value}')
+        for (name, key), entry in sorted(spans.items()):
+            metric = f'{METRIC_PREFIX}{name}_seconds'
+            declare(metric, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(SPAN_BUCKETS, entry):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{_format_labels(key, [("le", repr(bound))])} {cumulative}')
+            lines.append(f'{metric}_bucket{_format_labels(key, [("le", "+Inf")])} {entry[-1]}')
+            lines.append(f'{metric}_sum{_format_labels(key)} {entry[-2]:.6f}')
+            lines.append(f'{metric}_count{_format_labels(key)} {entry[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def start_profiler(self):
+        self.profiler.start()
+        self.log('profiler', "Sampling profiler started.", running=True)
+
+    def stop_profiler(self, path=PROFILE_FILE):
+        """Stops the profiler, writes its folded stacks to path and returns them."""
+        folded = self.profiler.stop()
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(folded)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write profile '{path}': {e}")
+        self.log('profiler', f"Sampling profiler stopped; {sum(self.profiler.samples.values())} samples written to '{path}'.", running=False)
+        return folded
+
+    def start_endpoint(self, port):
+        """
+        Serves GET /metrics on localhost from a background thread, and
+        POST /profile/start and /profile/stop to toggle the sampling profiler
+        (stop returns the folded stacks).
+        """
+        if self.server is not None or not port:
+            return
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        instruments = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    self._reply(200, instruments.prometheus_text(), 'text/plain; version=0.0.4')
+                else:
+                    self._reply(404, 'Not found\n')
+
+            def do_POST(self):
+                if self.path == '/profile/start':
+                    instruments.start_profiler()
+                    self._reply(200, 'Profiler started\n')
+                elif self.path == '/profile/stop':
+                    self._reply(200, instruments.stop_profiler())
+                else:
+                    self._reply(404, 'Not found\n')
+
+            def _reply(self, status, text, content_type='text/plain'):
+                body = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would drown the console.
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((METRICS_HOST, port), Handler)
+        except OSError as e:
+            print(f"Could not serve metrics on {METRICS_HOST}:{port}: {e}")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='focusview-metrics', daemon=True).start()
+        self.log('metrics_endpoint', f"Serving metrics on http://{METRICS_HOST}:{port}/metrics", port=port)
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.profiler.running:
+            self.profiler.stop()
+        if self._log_writer is not None:
+            log_queue, self._log_queue = self._log_queue, None
+            log_queue.put(_CLOSE_LOG)
+            self._log_writer.join()
+            self._log_writer = None
+
+
+def metrics_port():
+    """The configured metrics endpoint port, or 0 when the endpoint is off."""
+    try:
+        return int(os.environ.get(METRICS_PORT_ENV_VAR) or METRICS_PORT)
+    except ValueError:
+        print(f"Ignoring invalid {METRICS_PORT_ENV_VAR}; the metrics endpoint stays off.")
+        return 0
+
+
+def get_instruments():
+    """Returns this process's shared Instruments, creating it on first use."""
+    global _instruments
+    if _instruments is None:
+        _instruments = Instruments(os.environ.get(METRICS_LOG_ENV_VAR) or METRICS_LOG)
+    return _instruments
@@ -0,0 +1,105 @@
+# ipc.py
+
+import datetime
+import json
+import os
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QLocalSocket
+
+from event_model import CalendarEvent
+
+# Each message is a 4-byte big-endian length followed by that many bytes of
+# compact JSON: an object whose 't' field names the message type.
+HEADER_BYTES = 4
+# Far above any real message (a full agenda is a few KB); anything larger means a broken peer.
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+
+
+def server_name():
+    """Local socket name for this daemon; unique per process so two sessions never collide."""
+    return f'focusview-{os.getpid()}'
+
+
+def encode_message(message):
+    payload = json.dumps(message, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return len(payload).to_bytes(HEADER_BYTES, 'big') + payload
+
+
+def encode_events(events):
+    """CalendarEvents as positional rows: [id, summary, start, end, all_day, html_link]."""
+    return [
+        [event.id, event.summary, event.start.isoformat(), event.end.isoformat(), event.all_day, event.html_link]
+        for event in events
+    ]
+
+
+def decode_events(rows):
+    return [
+        CalendarEvent(
+            id=row[0],
+            summary=row[1],
+            start=datetime.datetime.fromisoformat(row[2]),
+            end=datetime.datetime.fromisoformat(row[3]),
+            all_day=row[4],
+            html_link=row[5],
+        )
+        for row in rows
+    ]
+
+
+class MessageChannel(QObject):
+    """
+    Framed JSON messages over a connected QLocalSocket. Messages sent before
+    the socket is connected are queued and flushed once it is.
+    """
+    message_received = pyqtSignal(dict)
+    disconnected = pyqtSignal()
+
+    def __init__(self, socket, parent=None):
+        super().__init__(parent)
+        self.socket = socket
+        self._buffer = bytearray()
+        self._queued = []
+        socket.setParent(self)
+        socket.readyRead.connect(self._on_ready_read)
+        socket.connected.connect(self._flush_queue)
+        socket.disconnected.connect(self.disconnected)
+
+    def is_connected(self):
+        return self.socket.state() == QLocalSocket.LocalSocketState.ConnectedState
+
+    def send(self, message_type, **fields):
+        data = encode_message({'t': message_type, **fields})
+        if self.is_connected():
+            self.socket.write(data)
+        else:
+            self._queued.append(data)
+
+    def close(self):
+        self._queued = []
+        self.socket.disconnectFromServer()
+
+    def _flush_queue(self):
+        queued, self._queued = self._queued, []
+        for data in queued:
+            self.socket.write(data)
+
+    def _on_ready_read(self):
+        self._buffer += bytes(self.socket.readAll())
+        while len(self._buffer) >= HEADER_BYTES:
+            length = int.from_bytes(self._buffer[:HEADER_BYTES], 'big')
+            if length > MAX_MESSAGE_BYTES:
+                print(f"Dropping overlay connection after an oversized message ({length} bytes).")
+                self._buffer.clear()
+                self.socket.abort()
+                return
+            if len(self._buffer) < HEADER_BYTES + length:
+                return
+            payload = bytes(self._buffer[HEADER_BYTES:HEADER_BYTES + length])
+            del self._buffer[:HEADER_BYTES + length]
+            try:
+                message = json.loads(payload)
+            except ValueError as e:
+                print(f"Ignoring malformed overlay message: {e}")
+                continue
+            self.message_received.emit(message)
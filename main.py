@@ -1,219 +1,454 @@
 # main.py
 
-import sys
 import time
+# Taken before the other imports so the startup report includes them.
+_imports_started = time.perf_counter()
+
+import datetime
+import gc
+import sys
 import webbrowser
-from PyQt6.QtWidgets import QApplication, QMenu
-from PyQt6.QtCore import QTimer, Qt, QObject, QEvent
+from PyQt6.QtCore import QCoreApplication, QEvent
 
 import idle_monitor
-import calendar_service
-from screensaver_window import ScreensaverWindow
+import calendar_sources
+from calendar_worker import CalendarFetcher
+from input_pipeline import HideReason, InputPipeline
+from instrumentation import get_instruments, metrics_port
+from memory_stats import format_bytes, release_free_memory, resident_memory_bytes
+from scheduler import WakeupScheduler
+from state_store import AppState
+from timeline import EventTimeline
+
+IMPORT_SECONDS = time.perf_counter() - _imports_started
 
 IDLE_THRESHOLD_SECONDS = 10
+# The overlay windows and the calendar client are only built this long before the
+# idle threshold is reached, so a freshly started FocusView stays small.
+PREWARM_LEAD_SECONDS = 3
+# Once the overlay has been hidden this long, its windows and pre-rendered
+# backgrounds are released; prewarm() rebuilds them before the next show.
+DORMANT_AFTER_SECONDS = 5 * 60
+# How often a visible overlay re-checks for activity when the idle backend can't notify us.
 CHECK_INTERVAL_SECONDS = 2
+CALENDAR_REFRESH_SECONDS = 15 * 60
+# Lower bound for idle re-checks while hidden, so clock jitter can't cause a busy loop.
+MIN_IDLE_CHECK_SECONDS = 0.25
+# Run as a small daemon (idle detection, calendar sync, state) that starts the
+# overlay in a separate GUI process when needed; also enabled by --split.
+SPLIT_PROCESS = False
+# After the overlay process crashes, wait this long before the idle check may start a new one.
+OVERLAY_RESTART_DELAY_SECONDS = 5
 
-# --- Global State Flags ---
-snooze_until = 0
-postpone_until_next_event = False
-session_closed = False
-completed_events = set()
 
-
-class ActivityFilter(QObject):
-    """
-    Event filter that suppresses right-clicks and Alt presses from being treated
-    as 'activity' that hides the overlay. It also asks controller to show the
-    context menu when those inputs are detected.
-    """
-    def __init__(self, controller):
-        super().__init__()
-        self.controller = controller
-
-    def eventFilter(self, obj, event):
-        # Right-click: show context menu at the pointer and prevent hide.
-        if event.type() == QEvent.Type.MouseButtonPress and event.button() == Qt.MouseButton.RightButton:
-            # Set a short grace period so the idle checker doesn't hide immediately.
-            self.controller.ignore_activity_until = time.time() + 3.0
-            # Show context menu using the event's global position
-            try:
-                self.controller.show_context_menu(event)
-            except Exception:
-                # fallback: show centered if something goes wrong
-                self.controller.show_context_menu_at_center()
-            return True  # stop further processing (prevents activity hide)
-
-        # Alt key pressed: show context menu centered and prevent hide.
-        if event.type() == QEvent.Type.KeyPress and event.key() in (Qt.Key.Key_Alt, Qt.Key.Key_AltGr):
-            self.controller.ignore_activity_until = time.time() + 3.0
-            self.controller.show_context_menu_at_center()
-            return True  # stop further processing
-
-        return False  # other events are processed normally
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms"
 
 
 class AppController:
-    """The main controller that orchestrates the application's logic."""
-    def __init__(self):
-        self.app = QApplication(sys.argv)
-        self.window = ScreensaverWindow()
-        self.window.activity_detected.connect(self.hide_screensaver_on_activity)
-
-        # Track a timestamp until which idle-based hides will be ignored
-        self.ignore_activity_until = 0.0
-
-        # Add custom event filter to capture right-clicks and Alt presses
-        self.filter = ActivityFilter(self)
-        self.window.installEventFilter(self.filter)
+    """
+    The main controller that orchestrates the application's logic.
+    Only the idle monitor and the cached agenda are set up at startup; the
+    overlay windows (one per screen) and the calendar client are built by
+    prewarm() shortly before the idle threshold is reached, and the windows
+    are released again after DORMANT_AFTER_SECONDS hidden.
+    clock (monotonic seconds) and wall_clock (seconds since the epoch) drive
+    every deadline and agenda decision, so a harness can run it on virtual time.
+    """
+    def __init__(self, source=None, state=None, split_process=SPLIT_PROCESS, clock=time.monotonic, wall_clock=time.time):
+        started = time.perf_counter()
+        self.startup_timings = {'imports': IMPORT_SECONDS}
+        # Spans, counters and diagnostics; exported as JSON lines and on the metrics endpoint.
+        self.instruments = get_instruments()
+        # Resident memory last measured in each state: startup, visible, hidden, dormant.
+        self.memory_figures = {}
+
+        self.split_process = split_process
+        self.wall_clock = wall_clock
+        if split_process:
+            # The daemon never shows a window, so it doesn't load QtGui or QtWidgets.
+            self.app = QCoreApplication(sys.argv)
+        else:
+            from PyQt6.QtWidgets import QApplication
+            self.app = QApplication(sys.argv)
+        self.source = source or calendar_sources.create_source()
+        self.overlay = None
+        self.prewarmed = False
+        # Idle time at which the overlay and calendar client get built.
+        self.prewarm_at = max(IDLE_THRESHOLD_SECONDS - PREWARM_LEAD_SECONDS, 1)
+        self.startup_timings['qt'] = time.perf_counter() - started
+
+        phase_started = time.perf_counter()
+        self.idle_backend = idle_monitor.create_backend()
+        self.startup_timings['idle_backend'] = time.perf_counter() - phase_started
+
+        # Turns input on the overlay windows into a single hide per shown period.
+        self.input = InputPipeline(clock)
+        self.input.hide_requested.connect(self.hide_screensaver_on_activity)
+        self.input.menu_requested.connect(self.show_context_menu)
+
+        # A single timer armed for whichever of the idle check, clock tick, idle label,
+        # calendar refresh or snooze expiry comes next.
+        self.scheduler = WakeupScheduler(clock)
+        self.idle_started_at = 0.0
+
+        # Snooze, postpone, close-for-session and done marks survive restarts.
+        phase_started = time.perf_counter()
+        self.state = state or AppState(clock=wall_clock)
+        self.startup_timings['state'] = time.perf_counter() - phase_started
+
+        # Start from the last known agenda so the overlay never waits on the network.
+        # The cache is read here, before the background fetcher touches it.
+        phase_started = time.perf_counter()
+        self.set_events(self.source.cached_events())
+        self.startup_timings['cached_events'] = time.perf_counter() - phase_started
+
+        self.fetcher = CalendarFetcher(self.source)
+        self.fetcher.events_ready.connect(self.on_events_ready)
+        self.app.aboutToQuit.connect(self.fetcher.stop)
+        self.resume_state()
+        self.startup_timings['total'] = IMPORT_SECONDS + time.perf_counter() - started
+
+    def resume_state(self):
+        """Re-arms the end of a snooze or postponement that was restored from the state journal."""
+        if self.state.session_closed:
+            self.instruments.log('session_closed', "Overlay closed for this session before the restart; it stays closed.")
+        if self.state.is_snoozed():
+            self.scheduler.schedule_in('snooze_end', self.state.snooze_until - self.wall_clock(), self.check_idle_status)
+        if self.state.is_postponed():
+            self.schedule_postpone_end()
+
+    def report_startup(self):
+        phases = ', '.join(f"{name} {_ms(seconds)}" for name, seconds in self.startup_timings.items())
+        for name, seconds in self.startup_timings.items():
+            self.instruments.gauge('startup_seconds', round(seconds, 6), phase=name)
+        self.instruments.log('startup', f"Startup timings: {phases}")
+        self.record_memory('startup')
+
+    def record_memory(self, state):
+        self.memory_figures[state] = resident_memory_bytes()
+        if self.memory_figures[state] is not None:
+            self.instruments.gauge('resident_memory_bytes', self.memory_figures[state], state=state)
+        self.instruments.log('memory', f"Memory ({state}): {format_bytes(self.memory_figures[state])}")
+
+    def ensure_overlay(self):
+        """Builds the overlay windows on first use."""
+        if self.overlay is not None:
+            return self.overlay
+        started = time.perf_counter()
+        if self.split_process:
+            from overlay_process import RemoteOverlay
+
+            self.overlay = RemoteOverlay(self)
+            self.instruments.log('overlay_started', "Starting the overlay process.")
+        else:
+            from overlay_manager import OverlayManager
+
+            self.overlay = OverlayManager(self.app)
+            elapsed = time.perf_counter() - started
+            self.instruments.observe('overlay_build', elapsed)
+            self.instruments.log(
+                'overlay_started',
+                f"Overlay windows for {len(self.overlay.windows())} screen(s) built in {_ms(elapsed)}.",
+                screens=len(self.overlay.windows()),
+            )
+        self.overlay.installEventFilter(self.input)
+        self.refresh_agenda()
+        return self.overlay
+
+    def prewarm(self):
+        """Builds the overlay, pre-renders its backgrounds and prepares the calendar client in the background."""
+        if self.prewarmed:
+            return
+        self.prewarmed = True
+        self.ensure_overlay().prewarm_backgrounds()
+        self.fetcher.prewarm()
 
-        self.main_timer = QTimer()
-        self.main_timer.timeout.connect(self.check_idle_status)
+    def enter_dormant(self):
+        """
+        Releases the hidden overlay windows, their widgets and the pre-rendered
+        backgrounds; in split mode the overlay process exits instead.
+        """
+        if self.overlay is None or self.overlay.isVisible():
+            return
+        self.record_memory('hidden')
+        self.overlay.removeEventFilter(self.input)
+        self.overlay.release()
+        self.overlay = None
+        self.prewarmed = False
+        if not self.split_process:
+            from PyQt6.QtGui import QPixmapCache
+            from render_cache import get_background_cache
+
+            # Delete the windows now rather than on the next event loop pass, so the figure below is accurate.
+            self.app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+            get_background_cache().invalidate()
+            QPixmapCache.clear()
+        gc.collect()
+        release_free_memory()
+        self.record_memory('dormant')
+
+    def on_overlay_lost(self, overlay):
+        """
+        Called when the overlay process died. Sync and state live in this
+        process and are unaffected; a later idle check starts a new overlay.
+        """
+        if overlay is not self.overlay:
+            return
+        self.overlay = None
+        self.prewarmed = False
+        self.input.disarm()
+        self.instruments.count('overlay_crashes')
+        self.scheduler.cancel('clock_tick', 'idle_label', 'countdown', 'timeline', 'calendar_refresh', 'dormant')
+        self.scheduler.schedule_in('idle_check', OVERLAY_RESTART_DELAY_SECONDS, self.check_idle_status)
 
-        self.calendar_refresh_timer = QTimer()
-        self.calendar_refresh_timer.timeout.connect(self.update_calendar_data)
+    def now(self):
+        """The current local time as an aware datetime."""
+        return datetime.datetime.fromtimestamp(self.wall_clock()).astimezone()
 
-        self.current_events = []
+    def is_overlay_visible(self):
+        return self.overlay is not None and self.overlay.isVisible()
 
     def run(self):
-        print("FocusView started. Monitoring for inactivity...")
-        self.main_timer.start(CHECK_INTERVAL_SECONDS * 1000)
+        self.instruments.log(
+            'started',
+            f"FocusView started ({self.idle_backend.name} idle backend, {self.source.name} calendar). "
+            "Monitoring for inactivity...",
+            idle_backend=self.idle_backend.name,
+            source=self.source.name,
+        )
+        self.instruments.start_endpoint(metrics_port())
+        self.app.aboutToQuit.connect(self.instruments.close)
+        self.report_startup()
+        if self.idle_backend.supports_notifications:
+            # Push backends wake us up themselves at the prewarm point; polling only
+            # bridges the last seconds to the threshold and runs while the overlay is visible.
+            self.idle_backend.start_notifications(
+                self.prewarm_at, self.check_idle_status, self.check_idle_status
+            )
+            self.app.aboutToQuit.connect(self.idle_backend.stop_notifications)
+        else:
+            self.check_idle_status()
         sys.exit(self.app.exec())
 
     def check_idle_status(self):
-        global snooze_until, postpone_until_next_event, session_closed
-
-        if session_closed or time.time() < snooze_until or postpone_until_next_event:
+        # While suppressed nothing is scheduled; snooze and postpone expiry schedule their own re-check.
+        if self.state.is_suppressed():
             return
 
-        idle_time = idle_monitor.get_idle_time()
-        is_window_visible = self.window.isVisible()
+        idle_time = self.idle_backend.get_idle_time()
+        self.instruments.count('idle_polls')
+        is_window_visible = self.is_overlay_visible()
+
+        if idle_time >= self.prewarm_at:
+            self.prewarm()
+            # Release only counts down while the user is active.
+            self.scheduler.cancel('dormant')
 
         # --- Show Logic ---
         if idle_time >= IDLE_THRESHOLD_SECONDS and not is_window_visible:
-            print(f"Idle threshold reached ({idle_time:.0f}s). Showing screensaver.")
-            self.update_calendar_data()
-            self.window.update_idle_timer(idle_time)
-            self.window.showFullScreen()
-            self.calendar_refresh_timer.start(15 * 60 * 1000)
-
-        elif idle_time >= IDLE_THRESHOLD_SECONDS and is_window_visible:
-            self.window.update_idle_timer(idle_time)
+            self.show_screensaver(idle_time)
 
         # --- Hide Logic ---
         elif idle_time < 1 and is_window_visible:
-            # Respect the grace period after filtered inputs (right-click / Alt)
-            if time.time() < self.ignore_activity_until:
-                # Debug info to help if you still see hides: extend or log
-                # print("Ignoring idle-based hide due to recent filtered input.")
-                return
-            self.hide_screensaver_on_activity()
+            # Opening the menu resets the idle time too; that isn't a reason to hide.
+            if not self.input.in_grace_period():
+                self.hide_screensaver_on_activity(HideReason.IDLE_RESET)
 
-    def hide_screensaver_on_activity(self):
-        if self.window.isVisible():
-            print("Activity event detected. Hiding screensaver instantly.")
-            self.window.hide()
-            self.calendar_refresh_timer.stop()
+        # --- Release Logic ---
+        elif idle_time < self.prewarm_at and self.overlay is not None and not is_window_visible:
+            # Prewarmed but never shown (the user came back before the threshold),
+            # or hidden earlier: released after the same delay as a hidden overlay.
+            if not self.scheduler.is_scheduled('dormant'):
+                self.scheduler.schedule_in('dormant', DORMANT_AFTER_SECONDS, self.enter_dormant)
 
-    def update_calendar_data(self):
-        print("Fetching latest calendar events...")
-        events = calendar_service.get_upcoming_events()
-        self.current_events = events
-        self.window.update_events(events)
+        self.schedule_idle_check(idle_time)
 
-    # --- Context Menu Logic ---
-    def show_context_menu(self, event_or_qt_event):
+    def schedule_idle_check(self, idle_time):
         """
-        Accept either the QContextMenuEvent-like object from the filter (it has globalPos())
-        or a QEvent passed explicitly. We'll extract globalPos() if available.
+        Arms the next idle poll. Backends that push notifications only need one,
+        to get from the prewarm point to the threshold.
         """
-        global snooze_until, postpone_until_next_event, session_closed
-
-        pos = None
-        try:
-            # event may be a Qt event object with globalPos()
-            pos = event_or_qt_event.globalPos()
-        except Exception:
-            pos = None
-
-        menu = QMenu(self.window)
-        menu.addAction("Snooze 5 min", lambda: self.snooze_overlay(5))
-        menu.addAction("Snooze 10 min", lambda: self.snooze_overlay(10))
-        menu.addAction("Snooze 15 min", lambda: self.snooze_overlay(15))
-        menu.addSeparator()
-        menu.addAction("Postpone until next event", self.postpone_overlay)
-        menu.addAction("Mark current event as done", self.mark_done)
-        menu.addAction("Open in Google Calendar", self.open_calendar)
-        menu.addSeparator()
-        menu.addAction("Close overlay for session", self.close_for_session)
-
-        # If we have a global pos, use it; otherwise show centered on window
-        if pos:
-            menu.exec(pos)
+        if self.is_overlay_visible():
+            if self.idle_backend.supports_notifications:
+                return
+            delay = CHECK_INTERVAL_SECONDS
+        else:
+            if idle_time < self.prewarm_at:
+                if self.idle_backend.supports_notifications:
+                    # The backend's idle watch fires at the prewarm point.
+                    self.scheduler.cancel('idle_check')
+                    return
+                target = self.prewarm_at
+            else:
+                target = IDLE_THRESHOLD_SECONDS
+            # Nothing can change before the remaining idle time has elapsed.
+            delay = max(target - idle_time, MIN_IDLE_CHECK_SECONDS)
+        self.scheduler.schedule_in('idle_check', delay, self.check_idle_status)
+
+    def show_screensaver(self, idle_time):
+        self.instruments.log(
+            'show', f"Idle threshold reached ({idle_time:.0f}s). Showing screensaver.", idle_seconds=round(idle_time, 1)
+        )
+        with self.instruments.span('show'):
+            self.ensure_overlay()
+            self.scheduler.cancel('dormant')
+            self.idle_started_at = self.scheduler.now() - idle_time
+            self.overlay.update_time_and_date()
+            self.update_idle_label()
+            self.refresh_agenda()
+            self.overlay.show()
+        self.input.arm()
+        self.schedule_clock_tick()
+        self.schedule_countdown()
+        self.schedule_timeline_transition()
+        self.update_calendar_data()
+
+    def hide_screensaver_on_activity(self, reason):
+        """Hides the overlay once per shown period; reason is a HideReason for the log."""
+        if self.is_overlay_visible():
+            self.instruments.count('hides', reason=reason.name.lower())
+            self.instruments.log('hide', f"Hiding screensaver ({reason.value}).", reason=reason.name.lower())
+            self.input.disarm()
+            self.record_memory('visible')
+            self.overlay.hide()
+            # UI deadlines only matter while the overlay is on screen.
+            self.scheduler.cancel('clock_tick', 'idle_label', 'countdown', 'timeline', 'calendar_refresh')
+            self.schedule_idle_check(0.0)
+            self.scheduler.schedule_in('dormant', DORMANT_AFTER_SECONDS, self.enter_dormant)
+
+    def schedule_clock_tick(self):
+        """Updates the clock exactly on the next minute boundary."""
+        seconds_into_minute = self.wall_clock() % 60
+        self.scheduler.schedule_in('clock_tick', 60 - seconds_into_minute, self.on_clock_tick)
+
+    def on_clock_tick(self):
+        self.overlay.update_time_and_date()
+        self.schedule_clock_tick()
+
+    def schedule_at_time(self, key, when, callback):
+        """Schedules callback at an aware wall-clock datetime; cancels key if when is None."""
+        if when is None:
+            self.scheduler.cancel(key)
+            return
+        delay = (when - self.now()).total_seconds()
+        self.scheduler.schedule_in(key, delay, callback)
+
+    def schedule_countdown(self):
+        """Re-renders the next event's countdown exactly when its text changes."""
+        next_change = None
+        if self.is_overlay_visible():
+            next_change = self.overlay.refresh_countdown(self.now())
+        self.schedule_at_time('countdown', next_change, self.schedule_countdown)
+
+    def schedule_timeline_transition(self):
+        """Refreshes the agenda exactly when the next event starts or a running one ends."""
+        transition = None
+        if self.is_overlay_visible():
+            transition = self.timeline.next_transition(self.now())
+        self.schedule_at_time('timeline', transition, self.on_timeline_transition)
+
+    def on_timeline_transition(self):
+        self.refresh_agenda()
+        self.schedule_countdown()
+        self.schedule_timeline_transition()
+
+    def update_idle_label(self):
+        """Redraws the 'Away for ...' label and schedules the moment its text next changes."""
+        # Rounded, so float error can't leave it a hair below the boundary it just
+        # reached, which would schedule the next update for right now, again and again.
+        idle_time = round(self.scheduler.now() - self.idle_started_at, 3)
+        self.overlay.update_idle_timer(idle_time)
+        if idle_time < 60:
+            next_change = int(idle_time) + 1
         else:
-            self.show_menu_centered(menu)
-
-    def show_context_menu_at_center(self):
-        """Helper to show a context menu centered within the screensaver window."""
-        menu = QMenu(self.window)
-        menu.addAction("Snooze 5 min", lambda: self.snooze_overlay(5))
-        menu.addAction("Snooze 10 min", lambda: self.snooze_overlay(10))
-        menu.addAction("Snooze 15 min", lambda: self.snooze_overlay(15))
-        menu.addSeparator()
-        menu.addAction("Postpone until next event", self.postpone_overlay)
-        menu.addAction("Mark current event as done", self.mark_done)
-        menu.addAction("Open in Google Calendar", self.open_calendar)
-        menu.addSeparator()
-        menu.addAction("Close overlay for session", self.close_for_session)
-        self.show_menu_centered(menu)
-
-    def show_menu_centered(self, menu: QMenu):
-        """Exec the menu centered inside the window."""
-        try:
-            center_point = self.window.mapToGlobal(self.window.rect().center())
-            menu.exec(center_point)
-        except Exception:
-            # last resort: exec without a position
-            menu.exec()
+            next_change = (int(idle_time) // 60 + 1) * 60
+        self.scheduler.schedule_at('idle_label', self.idle_started_at + next_change, self.update_idle_label)
+
+    def update_calendar_data(self):
+        self.instruments.log('sync_requested', "Syncing latest calendar events...")
+        self.fetcher.request_refresh()
+        if self.is_overlay_visible():
+            self.scheduler.schedule_in('calendar_refresh', CALENDAR_REFRESH_SECONDS, self.update_calendar_data)
+
+    def on_events_ready(self, events):
+        self.set_events(events)
+        self.schedule_countdown()
+        self.schedule_timeline_transition()
+        if self.state.is_postponed():
+            self.schedule_postpone_end()
+
+    def set_events(self, events):
+        self.current_events = events
+        self.timeline = EventTimeline(events, self.state.completed_events)
+        self.refresh_agenda()
+
+    def refresh_agenda(self):
+        """Shows the events that have not ended and are not marked as done."""
+        if self.overlay is None:
+            return
+        self.overlay.update_events(self.timeline.upcoming(self.now()))
+
+    # --- Context Menu Logic ---
+    def show_context_menu(self, pos=None):
+        """Shows the context menu at the global position pos, or centered on the primary window."""
+        from context_menu import show_context_menu
+
+        show_context_menu(self.overlay.primary, self, pos)
 
     def snooze_overlay(self, minutes):
-        global snooze_until
-        snooze_until = time.time() + minutes * 60
-        print(f"Overlay snoozed for {minutes} minutes.")
-        self.hide_screensaver_on_activity()
+        self.state.snooze(minutes * 60)
+        self.scheduler.schedule_in('snooze_end', minutes * 60, self.check_idle_status)
+        self.instruments.log('snooze', f"Overlay snoozed for {minutes} minutes.", minutes=minutes)
+        self.hide_screensaver_on_activity(HideReason.SNOOZE)
 
     def postpone_overlay(self):
-        global postpone_until_next_event
-        postpone_until_next_event = True
-        print("Overlay postponed until next calendar event.")
-        self.hide_screensaver_on_activity()
+        self.state.postpone()
+        self.instruments.log('postpone', "Overlay postponed until next calendar event.")
+        self.schedule_postpone_end()
+        self.hide_screensaver_on_activity(HideReason.POSTPONE)
+
+    def schedule_postpone_end(self):
+        """
+        Ends the postponement when the first event after the moment it began
+        starts, right away if that happened while FocusView wasn't running. If
+        no such event is known yet, the next calendar update re-arms it.
+        """
+        postponed_at = datetime.datetime.fromtimestamp(self.state.postponed_at).astimezone()
+        next_event = self.timeline.next(postponed_at)
+        self.schedule_at_time('postpone_end', next_event.start if next_event else None, self.end_postpone)
+
+    def end_postpone(self):
+        self.state.end_postpone()
+        self.instruments.log('postpone_end', "Next calendar event started. Overlay postponement ended.")
+        self.check_idle_status()
 
     def mark_done(self):
-        global completed_events
-        if self.current_events:
-            completed_events.add(self.current_events[0]['id'])
-            print(f"Event marked as done: {self.current_events[0]['summary']}")
-        self.hide_screensaver_on_activity()
+        event = self.timeline.current_or_next(self.now())
+        if event:
+            self.state.mark_done(event.id)
+            self.instruments.log('mark_done', f"Event marked as done: {event.summary}", event_id=event.id)
+            self.refresh_agenda()
+        self.hide_screensaver_on_activity(HideReason.MARK_DONE)
 
     def open_calendar(self):
-        if self.current_events:
-            url = self.current_events[0].get('htmlLink')
+        event = self.timeline.current_or_next(self.now())
+        if event:
+            url = event.html_link
             if url:
-                print(f"Opening calendar event: {url}")
+                self.instruments.log('open_calendar', f"Opening calendar event: {url}")
                 webbrowser.open(url)
 
     def close_for_session(self):
-        global session_closed
-        session_closed = True
-        print("Overlay closed for session.")
-        self.hide_screensaver_on_activity()
+        self.state.close_session()
+        self.instruments.log('close_session', "Overlay closed for session.")
+        self.hide_screensaver_on_activity(HideReason.CLOSE_SESSION)
 
 
 if __name__ == '__main__':
-    import os
-    if not os.path.exists(calendar_service.TOKEN_FILE):
-        print(f"Error: '{calendar_service.TOKEN_FILE}' not found!")
-        print("Please run 'python authenticate.py' once to log in and authorize the application.")
+    source = calendar_sources.create_source()
+    if not source.is_ready():
         sys.exit(1)
 
-    controller = AppController()
+    controller = AppController(source, split_process=SPLIT_PROCESS or '--split' in sys.argv)
     controller.run()
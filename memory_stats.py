@@ -0,0 +1,68 @@
+# memory_stats.py
+
+import ctypes
+import os
+import sys
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [
+        ('cb', ctypes.c_ulong),
+        ('PageFaultCount', ctypes.c_ulong),
+        ('PeakWorkingSetSize', ctypes.c_size_t),
+        ('WorkingSetSize', ctypes.c_size_t),
+        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+        ('PagefileUsage', ctypes.c_size_t),
+        ('PeakPagefileUsage', ctypes.c_size_t),
+    ]
+
+
+def _windows_resident_bytes():
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def _linux_resident_bytes():
+    # The second field of statm is the resident set size in pages.
+    with open('/proc/self/statm', 'r') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def resident_memory_bytes():
+    """Returns the current resident set size (working set on Windows) in bytes, or None if unknown."""
+    try:
+        if sys.platform == 'win32':
+            return _windows_resident_bytes()
+        if os.path.exists('/proc/self/statm'):
+            return _linux_resident_bytes()
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def format_bytes(size):
+    if size is None:
+        return 'unknown'
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def release_free_memory():
+    """
+    Asks the C allocator to hand freed memory back to the OS. glibc keeps freed
+    heap pages otherwise, so the resident size wouldn't drop after a release.
+    """
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        libc = ctypes.CDLL('libc.so.6')
+        libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
@@ -0,0 +1,203 @@
+# overlay_manager.py
+
+import os
+import time
+from PyQt6.QtCore import QObject
+
+import screensaver_window
+from instrumentation import get_instruments
+from render_cache import MAX_CACHED_BACKGROUNDS, get_background_cache
+from transitions import OverlayFade
+
+RENDER_MODE_ENV_VAR = 'FOCUSVIEW_RENDER_MODE'
+# 'widgets' builds the overlay from style-sheeted Qt widgets; 'painted' draws it
+# directly with QPainter, a much cheaper paint path for large displays and thin
+# clients. FOCUSVIEW_RENDER_MODE overrides it.
+RENDER_MODE = 'widgets'
+
+
+def window_classes(mode=None):
+    """Returns the (primary, secondary) overlay window classes for a render mode."""
+    mode = mode or os.environ.get(RENDER_MODE_ENV_VAR) or RENDER_MODE
+    if mode == 'painted':
+        import painted_overlay
+        return painted_overlay.PaintedScreensaverWindow, painted_overlay.PaintedSecondaryWindow
+    if mode != 'widgets':
+        print(f"Unknown render mode '{mode}', using 'widgets'.")
+    return screensaver_window.ScreensaverWindow, screensaver_window.SecondaryOverlayWindow
+
+
+class OverlayManager(QObject):
+    """
+    One overlay window per screen: the full ScreensaverWindow on the primary
+    screen and a SecondaryOverlayWindow (clock and next event) on every other.
+    All windows show the same event list and paint from the shared background
+    cache, so screens with the same geometry and devicePixelRatio share one
+    pre-rendered background.
+    Screens that are plugged in or removed only create or delete their own
+    secondary window; a primary screen change swaps the existing windows.
+    Offers the window-like API the controller needs (show, hide, updates).
+    show() and hide() fade all windows together; isVisible() turns False as
+    soon as a fade-out starts.
+    """
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.events = []
+        self.event_filters = []
+        self.visible = False
+        self.background_cache = get_background_cache()
+        self.fade = OverlayFade(self.windows, self)
+        self.instruments = get_instruments()
+        self.show_started = None
+
+        self.primary_class, self.secondary_class = window_classes()
+        self.primary_screen = app.primaryScreen()
+        self.primary = self._create_window(self.primary_class)
+        self.secondaries = {}
+        for screen in app.screens():
+            if screen is not self.primary_screen:
+                self.secondaries[screen] = self._create_window(self.secondary_class)
+        self._reserve_backgrounds()
+
+        app.screenAdded.connect(self._on_screen_added)
+        app.screenRemoved.connect(self._on_screen_removed)
+        app.primaryScreenChanged.connect(self._on_primary_screen_changed)
+
+    def _create_window(self, window_class):
+        window = window_class()
+        for event_filter in self.event_filters:
+            window.installEventFilter(event_filter)
+        window.update_events(self.events)
+        return window
+
+    def _reserve_backgrounds(self):
+        self.background_cache.reserve(max(MAX_CACHED_BACKGROUNDS, len(self.app.screens()) + 1))
+
+    def windows(self):
+        return [self.primary, *self.secondaries.values()]
+
+    def placements(self):
+        """Returns (screen, window) pairs for every window that currently has a screen."""
+        pairs = list(self.secondaries.items())
+        if self.primary_screen is not None:
+            pairs.insert(0, (self.primary_screen, self.primary))
+        return pairs
+
+    # --- Window-like API ---
+
+    def isVisible(self):
+        return self.visible
+
+    def show(self):
+        self.visible = True
+        self.show_started = time.perf_counter()
+        self.primary.on_frame_painted = self._on_first_frame
+        if self.primary.isVisible():
+            # Reversing a fade-out: no paint is pending, so request the frame that is measured.
+            self.primary.update()
+        for screen, window in self.placements():
+            self._show_on(window, screen)
+        self.fade.fade_in(self._refresh_rate())
+
+    def _show_on(self, window, screen):
+        self.fade.apply(window)
+        window.setScreen(screen)
+        window.setGeometry(screen.geometry())
+        window.showFullScreen()
+
+    def _on_first_frame(self):
+        self.instruments.observe('show_first_frame', time.perf_counter() - self.show_started, screens=len(self.windows()))
+
+    def hide(self):
+        self.visible = False
+        if self.primary is not None:
+            self.primary.on_frame_painted = None
+        self.fade.fade_out(self._hide_windows, self._refresh_rate())
+
+    def _hide_windows(self):
+        for window in self.windows():
+            window.hide()
+
+    def _refresh_rate(self):
+        return self.primary_screen.refreshRate() if self.primary_screen is not None else None
+
+    def installEventFilter(self, event_filter):
+        self.event_filters.append(event_filter)
+        for window in self.windows():
+            window.installEventFilter(event_filter)
+
+    def removeEventFilter(self, event_filter):
+        if event_filter in self.event_filters:
+            self.event_filters.remove(event_filter)
+        for window in self.windows():
+            window.removeEventFilter(event_filter)
+
+    def update_time_and_date(self):
+        for window in self.windows():
+            window.update_time_and_date()
+
+    def update_idle_timer(self, seconds):
+        self.primary.update_idle_timer(seconds)
+
+    def update_events(self, events):
+        self.events = events
+        with self.instruments.span('update_events'):
+            for window in self.windows():
+                window.update_events(events)
+
+    def refresh_countdown(self, now=None):
+        """Refreshes every window's countdown; returns the earliest next change, or None."""
+        changes = [change for change in (window.refresh_countdown(now) for window in self.windows()) if change]
+        return min(changes) if changes else None
+
+    def prewarm_backgrounds(self):
+        """Renders the background for every screen, once per distinct size and pixel ratio."""
+        for screen in self.app.screens():
+            self.background_cache.pixmap_for(screen.size(), screen.devicePixelRatio())
+
+    def release(self):
+        """Deletes all windows. The manager can't be used afterwards."""
+        self.app.screenAdded.disconnect(self._on_screen_added)
+        self.app.screenRemoved.disconnect(self._on_screen_removed)
+        self.app.primaryScreenChanged.disconnect(self._on_primary_screen_changed)
+        self.fade.stop()
+        for window in self.windows():
+            window.deleteLater()
+        self.secondaries = {}
+        self.primary = None
+
+    # --- Screen hot-plug ---
+
+    def _on_screen_added(self, screen):
+        if screen is self.primary_screen or screen in self.secondaries:
+            return
+        window = self._create_window(self.secondary_class)
+        self.secondaries[screen] = window
+        self._reserve_backgrounds()
+        if self.visible:
+            self._show_on(window, screen)
+
+    def _on_screen_removed(self, screen):
+        window = self.secondaries.pop(screen, None)
+        if window is not None:
+            window.hide()
+            window.deleteLater()
+        if screen is self.primary_screen:
+            # primaryScreenChanged moves the full overlay to the new primary screen.
+            self.primary_screen = None
+
+    def _on_primary_screen_changed(self, screen):
+        old_screen = self.primary_screen
+        self.primary_screen = screen
+        # The new primary screen's lightweight window moves to the old primary
+        # screen if that is still connected, so no widget tree is rebuilt.
+        secondary = self.secondaries.pop(screen, None)
+        if old_screen is not None and old_screen in self.app.screens():
+            self.secondaries[old_screen] = secondary or self._create_window(self.secondary_class)
+        elif secondary is not None:
+            secondary.hide()
+            secondary.deleteLater()
+        if self.visible:
+            for placed_screen, window in self.placements():
+                self._show_on(window, placed_screen)
@@ -0,0 +1,272 @@
+# overlay_process.py
+
+import datetime
+import os
+import sys
+import time
+from PyQt6.QtCore import QObject, QProcess, QTimer
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+import ipc
+from input_pipeline import HideReason, InputPipeline
+from instrumentation import get_instruments, metrics_port
+from timeline import format_countdown
+
+CLIENT_SCRIPT = os.path.abspath(__file__)
+# How long a released overlay process gets to exit on its own before it is killed.
+QUIT_TIMEOUT_MS = 5000
+# Menu entries the overlay process may trigger in the daemon, by message name.
+ACTIONS = {
+    'snooze': lambda controller, message: controller.snooze_overlay(int(message['m'])),
+    'postpone': lambda controller, message: controller.postpone_overlay(),
+    'done': lambda controller, message: controller.mark_done(),
+    'open': lambda controller, message: controller.open_calendar(),
+    'close': lambda controller, message: controller.close_for_session(),
+}
+
+
+class RemoteOverlay(QObject):
+    """
+    Daemon-side stand-in for OverlayManager. Starts the overlay GUI in its own
+    process and forwards the window-like API to it over a local socket, so the
+    daemon keeps idle detection, calendar sync and the state store while the
+    windows, fonts and pixmaps live (and die) with the overlay process.
+    Messages sent before the process has connected are queued. Input and the
+    context menu are handled in the overlay process, which reports hide
+    requests and menu choices back to the controller.
+    Parented to the application, so a released proxy (and its QProcess) lives
+    on until the overlay process has exited and then deletes itself.
+    """
+    def __init__(self, controller):
+        super().__init__(controller.app)
+        self.controller = controller
+        self.visible = False
+        self.events = []
+        self.releasing = False
+        self.channel = None
+        self._queued = []
+        self._sent_events = None
+        self.started = time.perf_counter()
+
+        self.name = ipc.server_name()
+        QLocalServer.removeServer(self.name)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+        if not self.server.listen(self.name):
+            print(f"Could not listen for the overlay process on '{self.name}': {self.server.errorString()}")
+
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.ForwardedChannels)
+        self.process.finished.connect(self._on_process_finished)
+        self.process.errorOccurred.connect(self._on_process_error)
+        self.process.start(sys.executable, ['-u', CLIENT_SCRIPT, self.name])
+
+    # --- Window-like API ---
+
+    def isVisible(self):
+        return self.visible
+
+    def show(self):
+        self.visible = True
+        self._send('show')
+
+    def hide(self):
+        self.visible = False
+        self._send('hide')
+
+    def update_time_and_date(self):
+        self._send('clock')
+
+    def update_idle_timer(self, seconds):
+        self._send('idle', s=int(seconds))
+
+    def update_events(self, events):
+        self.events = events
+        rows = ipc.encode_events(events)
+        if rows != self._sent_events:
+            self._sent_events = rows
+            self._send('events', e=rows)
+
+    def refresh_countdown(self, now=None):
+        """Asks the windows to refresh their countdown and returns when its text next changes, or None."""
+        self._send('countdown')
+        if not self.events:
+            return None
+        return format_countdown(self.events[0].start, now or datetime.datetime.now().astimezone())[1]
+
+    def prewarm_backgrounds(self):
+        self._send('prewarm')
+
+    def installEventFilter(self, event_filter):
+        # Input is filtered by the overlay process's own InputPipeline.
+        pass
+
+    def removeEventFilter(self, event_filter):
+        pass
+
+    def release(self):
+        """Lets the overlay process exit, which returns all of its memory. The proxy can't be used afterwards."""
+        self.releasing = True
+        self.visible = False
+        self._send('quit')
+        self.server.close()
+        QTimer.singleShot(QUIT_TIMEOUT_MS, self.process.kill)
+
+    # --- Connection ---
+
+    def _send(self, message_type, **fields):
+        if self.channel is None:
+            self._queued.append((message_type, fields))
+        else:
+            self.channel.send(message_type, **fields)
+
+    def _on_new_connection(self):
+        socket = self.server.nextPendingConnection()
+        if self.channel is not None:
+            # Only the process we started may connect.
+            socket.abort()
+            return
+        self.channel = ipc.MessageChannel(socket, self)
+        self.channel.message_received.connect(self._on_message)
+        queued, self._queued = self._queued, []
+        for message_type, fields in queued:
+            self.channel.send(message_type, **fields)
+
+    def _on_message(self, message):
+        kind = message.get('t')
+        if kind == 'ready':
+            elapsed = time.perf_counter() - self.started
+            get_instruments().observe('overlay_build', elapsed)
+            get_instruments().log(
+                'overlay_ready',
+                f"Overlay process ready with {message.get('screens')} screen(s) {elapsed * 1000:.0f} ms after it was started.",
+                screens=message.get('screens'),
+            )
+        elif kind == 'hide':
+            reason = HideReason.__members__.get(message.get('r'), HideReason.KEY_PRESS)
+            self.controller.hide_screensaver_on_activity(reason)
+        elif kind == 'menu':
+            self.controller.input.start_grace_period()
+        elif kind == 'action' and message.get('a') in ACTIONS:
+            ACTIONS[message['a']](self.controller, message)
+
+    def _on_process_finished(self, exit_code, exit_status):
+        if self.releasing:
+            self.deleteLater()
+            return
+        self._lost(f"Overlay process exited unexpectedly (code {exit_code}).", exit_code=exit_code)
+
+    def _on_process_error(self, error):
+        # A process that never started emits no finished signal.
+        if error == QProcess.ProcessError.FailedToStart:
+            self._lost(f"Could not start the overlay process: {self.process.errorString()}.")
+
+    def _lost(self, message, **fields):
+        get_instruments().log('overlay_lost', f"{message} Calendar sync and state are unaffected.", **fields)
+        self.visible = False
+        self.server.close()
+        if not self.releasing:
+            self.controller.on_overlay_lost(self)
+        self.deleteLater()
+
+
+class OverlayClient(QObject):
+    """
+    The overlay GUI process: the overlay windows of every screen, their input
+    pipeline and the context menu, driven by messages from the daemon.
+    Quits when told to, or as soon as the daemon goes away.
+    """
+    def __init__(self, app, name):
+        super().__init__()
+        from overlay_manager import OverlayManager
+
+        started = time.perf_counter()
+        self.app = app
+        self.overlay = OverlayManager(app)
+        self.input = InputPipeline()
+        self.input.hide_requested.connect(self.on_hide_requested)
+        self.input.menu_requested.connect(self.on_menu_requested)
+        self.overlay.installEventFilter(self.input)
+
+        socket = QLocalSocket()
+        socket.errorOccurred.connect(self._on_socket_error)
+        self.channel = ipc.MessageChannel(socket, self)
+        self.channel.message_received.connect(self.on_message)
+        self.channel.disconnected.connect(app.quit)
+        socket.connectToServer(name)
+        self.channel.send('ready', screens=len(self.overlay.windows()), ms=round((time.perf_counter() - started) * 1000))
+
+    def on_message(self, message):
+        kind = message.get('t')
+        if kind == 'events':
+            self.overlay.update_events(ipc.decode_events(message['e']))
+        elif kind == 'clock':
+            self.overlay.update_time_and_date()
+        elif kind == 'idle':
+            self.overlay.update_idle_timer(message['s'])
+        elif kind == 'countdown':
+            self.overlay.refresh_countdown()
+        elif kind == 'prewarm':
+            self.overlay.prewarm_backgrounds()
+        elif kind == 'show':
+            self.overlay.show()
+            self.input.arm()
+        elif kind == 'hide':
+            self.input.disarm()
+            if self.overlay.isVisible():
+                self.overlay.hide()
+        elif kind == 'quit':
+            self.app.quit()
+
+    def on_hide_requested(self, reason):
+        # Start fading right away; the daemon's confirming 'hide' is then a no-op.
+        self.overlay.hide()
+        self.channel.send('hide', r=reason.name)
+
+    def on_menu_requested(self, pos):
+        from context_menu import show_context_menu
+
+        self.channel.send('menu')
+        show_context_menu(self.overlay.primary, self, pos)
+
+    def _on_socket_error(self, error):
+        if error != QLocalSocket.LocalSocketError.PeerClosedError:
+            print(f"Lost the connection to FocusView: {self.channel.socket.errorString()}")
+        self.app.quit()
+
+    # --- Menu actions, carried out by the daemon ---
+
+    def snooze_overlay(self, minutes):
+        self.channel.send('action', a='snooze', m=minutes)
+
+    def postpone_overlay(self):
+        self.channel.send('action', a='postpone')
+
+    def mark_done(self):
+        self.channel.send('action', a='done')
+
+    def open_calendar(self):
+        self.channel.send('action', a='open')
+
+    def close_for_session(self):
+        self.channel.send('action', a='close')
+
+
+def run_overlay_client(name):
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    # Spans from this process go to the same JSON lines log; its own endpoint is on the next port.
+    instruments = get_instruments()
+    instruments.process = 'overlay'
+    if metrics_port():
+        instruments.start_endpoint(metrics_port() + 1)
+    app.aboutToQuit.connect(instruments.close)
+    client = OverlayClient(app, name)
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    run_overlay_client(sys.argv[1])
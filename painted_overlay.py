@@ -0,0 +1,404 @@
+# painted_overlay.py
+
+import datetime
+from collections import OrderedDict
+from PyQt6.QtCore import QPoint, QPointF, QRect, QRectF, QSize, Qt
+from PyQt6.QtGui import (
+    QColor, QFont, QFontMetrics, QImage, QPainter, QPainterPath, QPixmap, QRegion, QStaticText, QTextOption,
+    QTransform,
+)
+
+from screensaver_window import OverlayWindow
+
+FONT_FAMILIES = ['Segoe UI', 'Helvetica']
+BACKGROUND_COLOR = QColor('#1A2827')
+TEXT_COLOR = QColor('#FFFFFF')
+SECONDARY_TEXT_COLOR = QColor('#CCCCCC')
+CARD_FILL = QColor(0, 0, 0, 89)
+CARD_BORDER = QColor(255, 255, 255, 46)
+CARD_RADIUS = 12
+# Same look as the QGraphicsDropShadowEffect on the widget version's agenda title.
+TITLE_SHADOW_BLUR = 16
+TITLE_SHADOW_OFFSET = 2
+# Card pixmaps differ only by size; agenda cards usually share one.
+MAX_CACHED_CARDS = 32
+
+_card_cache = OrderedDict()
+_title_cache = {}
+
+
+def _font(pixel_size, weight, letter_spacing=0):
+    font = QFont()
+    font.setFamilies(FONT_FAMILIES)
+    font.setStyleHint(QFont.StyleHint.SansSerif)
+    font.setPixelSize(pixel_size)
+    font.setWeight(QFont.Weight(weight))
+    if letter_spacing:
+        font.setLetterSpacing(QFont.SpacingType.AbsoluteSpacing, letter_spacing)
+    return font
+
+
+def card_pixmap(size, device_pixel_ratio):
+    """Returns the rounded glass card background for a logical size, rendered once per size and pixel ratio."""
+    key = (size.width(), size.height(), round(device_pixel_ratio, 3))
+    pixmap = _card_cache.get(key)
+    if pixmap is not None:
+        _card_cache.move_to_end(key)
+        return pixmap
+
+    pixmap = QPixmap(round(size.width() * device_pixel_ratio), round(size.height() * device_pixel_ratio))
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setPen(CARD_BORDER)
+    painter.setBrush(CARD_FILL)
+    painter.drawRoundedRect(QRectF(0.5, 0.5, size.width() - 1, size.height() - 1), CARD_RADIUS, CARD_RADIUS)
+    painter.end()
+
+    _card_cache[key] = pixmap
+    while len(_card_cache) > MAX_CACHED_CARDS:
+        _card_cache.popitem(last=False)
+    return pixmap
+
+
+def _blurred(image, radius):
+    # Scaling down and back up smoothly is a cheap box-like blur; it only runs once per title.
+    factor = max(2, radius // 2)
+    small = image.scaled(
+        max(1, image.width() // factor), max(1, image.height() // factor),
+        Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation,
+    )
+    return small.scaled(image.size(), Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+def title_pixmap(text, device_pixel_ratio):
+    """
+    Returns the agenda title ("LATER TODAY") on its dark plate with the drop
+    shadow baked in, so painting it is a single blit. The plate starts
+    TITLE_SHADOW_BLUR pixels into the pixmap on each side.
+    """
+    key = (text, round(device_pixel_ratio, 3))
+    pixmap = _title_cache.get(key)
+    if pixmap is not None:
+        return pixmap
+
+    font = _font(32, 700, letter_spacing=2)
+    metrics = QFontMetrics(font)
+    blur, offset = TITLE_SHADOW_BLUR, TITLE_SHADOW_OFFSET
+    plate = QRect(blur, blur, metrics.horizontalAdvance(text) + 5, metrics.height() + 12)
+    logical = QSize(plate.width() + 2 * blur, plate.height() + 2 * blur + offset)
+
+    layer = QImage(logical * device_pixel_ratio, QImage.Format.Format_ARGB32_Premultiplied)
+    layer.setDevicePixelRatio(device_pixel_ratio)
+    layer.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(layer)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    path = QPainterPath()
+    path.addRoundedRect(QRectF(plate), 8, 8)
+    painter.fillPath(path, QColor(0, 0, 0, 128))
+    painter.setFont(font)
+    painter.setPen(TEXT_COLOR)
+    painter.drawText(plate.x() + 5, plate.y() + metrics.ascent(), text)
+    painter.end()
+
+    shadow = QImage(layer)
+    painter = QPainter(shadow)
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
+    painter.fillRect(QRect(0, 0, logical.width(), logical.height()), Qt.GlobalColor.black)
+    painter.end()
+    shadow = _blurred(shadow, blur)
+    shadow.setDevicePixelRatio(device_pixel_ratio)
+
+    result = QImage(layer.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    result.setDevicePixelRatio(device_pixel_ratio)
+    result.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(result)
+    painter.drawImage(0, offset, shadow)
+    painter.drawImage(0, 0, layer)
+    painter.end()
+
+    pixmap = _title_cache[key] = QPixmap.fromImage(result)
+    return pixmap
+
+
+class TextItem:
+    """
+    One piece of text laid out once with QStaticText and re-laid out only when
+    its text or wrap width changes.
+    """
+    def __init__(self, font, color=TEXT_COLOR):
+        self.font = font
+        self.color = color
+        self.text = None
+        self.max_width = None
+        self.static = QStaticText()
+        self.static.setTextFormat(Qt.TextFormat.PlainText)
+        self.static.setPerformanceHint(QStaticText.PerformanceHint.AggressiveCaching)
+        option = QTextOption(Qt.AlignmentFlag.AlignHCenter)
+        option.setWrapMode(QTextOption.WrapMode.WordWrap)
+        self.static.setTextOption(option)
+        self.metrics = QFontMetrics(font)
+
+    def set_text(self, text, max_width=None):
+        if text == self.text and max_width == self.max_width:
+            return
+        self.text = text
+        self.max_width = max_width
+        self.static.setText(text)
+        # Only wrap text that doesn't fit; unwrapped text keeps its natural width.
+        wraps = max_width is not None and self.metrics.horizontalAdvance(text) > max_width
+        self.static.setTextWidth(max_width if wraps else -1)
+        self.static.prepare(QTransform(), self.font)
+
+    def size(self):
+        size = self.static.size()
+        return QSize(int(size.width() + 0.999), int(size.height() + 0.999))
+
+    def draw(self, painter, top_left):
+        painter.setFont(self.font)
+        painter.setPen(self.color)
+        painter.drawStaticText(QPointF(top_left), self.static)
+
+
+class PaintedOverlayWindow(OverlayWindow):
+    """
+    Overlay window without child widgets: everything is drawn in paintEvent
+    from cached text layouts and pre-rendered card pixmaps, so updates never go
+    through style sheets, layouts or graphics effects.
+    Subclasses place their content in _layout(), which returns the paint
+    operations keyed by name. Each operation carries its rect and a signature
+    of what it shows, and only rects whose operation changed are repainted.
+    """
+    def __init__(self):
+        super().__init__()
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        # key -> (rect, signature, draw(painter)), in paint order.
+        self.paint_ops = {}
+
+    # --- Painting ---
+    def paintEvent(self, event):
+        dirty = event.rect()
+        painter = QPainter(self)
+        pixmap = self.background_cache.pixmap_for(self.size(), self.devicePixelRatioF())
+        if pixmap:
+            ratio = pixmap.devicePixelRatio()
+            source = QRectF(dirty.x() * ratio, dirty.y() * ratio, dirty.width() * ratio, dirty.height() * ratio)
+            painter.drawPixmap(QRectF(dirty), pixmap, source)
+        else:
+            painter.fillRect(dirty, BACKGROUND_COLOR)
+        for rect, _, draw in self.paint_ops.values():
+            if rect.intersects(dirty):
+                draw(painter)
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.relayout()
+
+    def relayout(self):
+        """Re-places the content and schedules a repaint of exactly the rects that changed."""
+        ops = self._layout()
+        dirty = QRegion()
+        for key, (rect, signature, _) in ops.items():
+            old = self.paint_ops.get(key)
+            if old is None or old[0] != rect or old[1] != signature:
+                dirty = dirty.united(rect)
+                if old is not None:
+                    dirty = dirty.united(old[0])
+        for key, (rect, _, _) in self.paint_ops.items():
+            if key not in ops:
+                dirty = dirty.united(rect)
+        self.paint_ops = ops
+        if not dirty.isEmpty():
+            self.update(dirty)
+
+    def _layout(self):
+        raise NotImplementedError
+
+    def _text_op(self, ops, key, item, top_left):
+        # A little slack around the layout box covers antialiased glyph edges.
+        rect = QRect(top_left, item.size()).adjusted(-2, -2, 2, 2)
+        ops[key] = (rect, item.text, lambda painter: item.draw(painter, top_left))
+
+    def _card_op(self, ops, key, rect):
+        dpr = self.devicePixelRatioF()
+        ops[key] = (rect, None, lambda painter: painter.drawPixmap(rect.topLeft(), card_pixmap(rect.size(), dpr)))
+
+    # --- UI Updates ---
+    def update_time_and_date(self):
+        now = datetime.datetime.now()
+        self.clock.set_text(now.strftime("%H:%M"))
+        self.date.set_text(now.strftime("%A, %B %d"))
+        self.relayout()
+
+    def refresh_countdown(self, now=None):
+        if self.next_event is None:
+            return None
+        text, next_change = self.format_countdown(self.next_event.start, now or datetime.datetime.now().astimezone())
+        if self.next_time.text != text:
+            self.next_time.set_text(text)
+            self.relayout()
+        return next_change
+
+    def _set_next_event(self, events):
+        self.next_event = events[0] if events else None
+        if self.next_event is None:
+            self.next_summary.set_text("No upcoming events", self.next_summary.max_width)
+            self.next_time.set_text("")
+        else:
+            self.next_summary.set_text(self.next_event.summary, self.next_summary.max_width)
+            text, _ = self.format_countdown(self.next_event.start, datetime.datetime.now().astimezone())
+            self.next_time.set_text(text)
+
+
+class PaintedScreensaverWindow(PaintedOverlayWindow):
+    """Painted version of ScreensaverWindow: clock, next event, agenda and idle time."""
+    MARGIN_X, MARGIN_Y, COLUMN_SPACING = 80, 60, 80
+    CARD_PADDING = 26
+    AGENDA_CARD_PADDING_X, AGENDA_CARD_PADDING_Y = 27, 25
+    AGENDA_SIZE = 5
+    # Longer agenda titles wrap instead of widening the column.
+    AGENDA_MAX_TEXT_WIDTH = 420
+
+    def __init__(self):
+        super().__init__()
+        self.clock = TextItem(_font(220, 400))
+        self.date = TextItem(_font(36, 400))
+        self.next_summary = TextItem(_font(36, 500))
+        self.next_summary.set_text("Checking calendar...")
+        self.next_time = TextItem(_font(28, 400))
+        self.next_time.set_text("")
+        self.idle = TextItem(_font(32, 600), QColor(255, 255, 255, 242))
+        self.idle.set_text("")
+        self.agenda_fonts = (_font(18, 500), _font(14, 400))
+        # One pair of text items per agenda row, reused as the list changes.
+        self.agenda_rows = []
+        self.agenda_events = []
+        self.update_time_and_date()
+
+    def _layout(self):
+        """Sizes both columns to their content and centers them, like the widget layout does."""
+        ops = {}
+        padding = self.CARD_PADDING
+
+        # Left column: the clock card and the next event card share the clock card's width.
+        clock_size, date_size, time_size = self.clock.size(), self.date.size(), self.next_time.size()
+        left_inner = max(clock_size.width(), date_size.width(), time_size.width())
+        self.next_summary.set_text(self.next_summary.text, left_inner)
+        summary_size = self.next_summary.size()
+        left_inner = max(left_inner, summary_size.width())
+        left_width = left_inner + 2 * padding
+        clock_height = clock_size.height() + 6 + date_size.height() + 2 * padding
+        next_height = summary_size.height() + 6 + time_size.height() + 2 * padding
+        left_height = clock_height + 30 + next_height
+
+        # Right column: the title plate above one card per agenda event.
+        title = title_pixmap("LATER TODAY", self.devicePixelRatioF())
+        title_size = title.deviceIndependentSize().toSize()
+        plate_width = title_size.width() - 2 * TITLE_SHADOW_BLUR
+        plate_height = title_size.height() - 2 * TITLE_SHADOW_BLUR - TITLE_SHADOW_OFFSET
+        rows = self._agenda_row_items(self.AGENDA_MAX_TEXT_WIDTH)
+        text_width = max([plate_width - 2 * self.AGENDA_CARD_PADDING_X] + [
+            max(summary.size().width(), time_text.size().width()) for summary, time_text in rows
+        ])
+        right_width = text_width + 2 * self.AGENDA_CARD_PADDING_X
+        row_heights = [
+            summary.size().height() + 4 + time_text.size().height() + 2 * self.AGENDA_CARD_PADDING_Y
+            for summary, time_text in rows
+        ]
+        right_height = plate_height + 15 + sum(row_heights) + 10 * max(0, len(rows) - 1)
+
+        left_x = max(self.MARGIN_X, (self.width() - left_width - self.COLUMN_SPACING - right_width) // 2)
+        right_x = left_x + left_width + self.COLUMN_SPACING
+        top = max(self.MARGIN_Y, (self.height() - max(left_height, right_height)) // 2)
+
+        # Cards go first so text paints over them.
+        clock_rect = QRect(left_x, top, left_width, clock_height)
+        next_rect = QRect(left_x, clock_rect.bottom() + 1 + 30, left_width, next_height)
+        self._card_op(ops, 'clock_card', clock_rect)
+        self._card_op(ops, 'next_card', next_rect)
+        self._centered_text(ops, 'clock', self.clock, clock_rect, clock_rect.y() + padding)
+        self._centered_text(ops, 'date', self.date, clock_rect, clock_rect.y() + padding + clock_size.height() + 6)
+        self._centered_text(ops, 'next_summary', self.next_summary, next_rect, next_rect.y() + padding)
+        self._centered_text(
+            ops, 'next_time', self.next_time, next_rect, next_rect.y() + padding + summary_size.height() + 6,
+        )
+
+        title_pos = QPoint(right_x + (right_width - plate_width) // 2 - TITLE_SHADOW_BLUR, top - TITLE_SHADOW_BLUR)
+        ops['title'] = (QRect(title_pos, title_size), None, lambda painter: painter.drawPixmap(title_pos, title))
+        y = top + plate_height + 15
+        for index, ((summary, time_text), height) in enumerate(zip(rows, row_heights)):
+            self._card_op(ops, f'agenda_card_{index}', QRect(right_x, y, right_width, height))
+            text_x = right_x + self.AGENDA_CARD_PADDING_X
+            text_y = y + self.AGENDA_CARD_PADDING_Y
+            self._text_op(ops, f'agenda_summary_{index}', summary, QPoint(text_x, text_y))
+            self._text_op(
+                ops, f'agenda_time_{index}', time_text,
+                QPoint(text_x, text_y + summary.size().height() + 4),
+            )
+            y += height + 10
+
+        idle_size = self.idle.size()
+        self._text_op(
+            ops, 'idle', self.idle,
+            QPoint(self.width() - idle_size.width() - 20, self.height() - idle_size.height() - 20),
+        )
+        return ops
+
+    def _centered_text(self, ops, key, item, card_rect, y):
+        x = card_rect.x() + (card_rect.width() - item.size().width()) // 2
+        self._text_op(ops, key, item, QPoint(x, y))
+
+    def _agenda_row_items(self, text_width):
+        summary_font, time_font = self.agenda_fonts
+        while len(self.agenda_rows) < len(self.agenda_events):
+            self.agenda_rows.append((TextItem(summary_font), TextItem(time_font, SECONDARY_TEXT_COLOR)))
+        rows = self.agenda_rows[:len(self.agenda_events)]
+        for (summary, time_text), event in zip(rows, self.agenda_events):
+            summary.set_text(event.summary, max(1, text_width))
+            time_text.set_text(self.format_event_time(event))
+        return rows
+
+    # --- UI Updates ---
+    def update_idle_timer(self, seconds):
+        text = self.format_idle_time(seconds)
+        if text != self.idle.text:
+            self.idle.set_text(text)
+            self.relayout()
+
+    def update_events(self, events):
+        self._set_next_event(events)
+        self.agenda_events = events[1:1 + self.AGENDA_SIZE]
+        self.relayout()
+
+
+class PaintedSecondaryWindow(PaintedOverlayWindow):
+    """Painted version of SecondaryOverlayWindow: clock, date and the next event, stacked and centered."""
+    SPACING = 20
+
+    def __init__(self):
+        super().__init__()
+        self.clock = TextItem(_font(160, 400))
+        self.date = TextItem(_font(30, 400))
+        self.next_summary = TextItem(_font(30, 500))
+        self.next_summary.set_text("Checking calendar...")
+        self.next_time = TextItem(_font(24, 400))
+        self.next_time.set_text("")
+        self.update_time_and_date()
+
+    def _layout(self):
+        ops = {}
+        self.next_summary.set_text(self.next_summary.text, max(1, self.width() - 160))
+        items = [('clock', self.clock), ('date', self.date), ('next_summary', self.next_summary), ('next_time', self.next_time)]
+        heights = [item.size().height() for _, item in items]
+        y = (self.height() - sum(heights) - self.SPACING * (len(items) - 1)) // 2
+        for (key, item), height in zip(items, heights):
+            x = (self.width() - item.size().width()) // 2
+            self._text_op(ops, key, item, QPoint(x, y))
+            y += height + self.SPACING
+        return ops
+
+    def update_events(self, events):
+        self._set_next_event(events)
+        self.relayout()
@@ -0,0 +1,104 @@
+# render_cache.py
+
+import math
+import os
+from collections import OrderedDict
+from PyQt6.QtCore import QFileSystemWatcher, QRect, QSize
+from PyQt6.QtGui import QImageReader, QPixmap
+
+BACKGROUND_IMAGE = 'background.jpg'
+# Enough for a few screens or a resize round trip without keeping stale sizes forever.
+MAX_CACHED_BACKGROUNDS = 4
+
+
+class BackgroundRenderCache:
+    """
+    Holds the background image pre-scaled and pre-cropped for each
+    (width, height, devicePixelRatio) it is painted at.
+    The image is decoded directly at the target resolution with QImageReader's
+    scaled reading, so the full-size image is never resampled during paint.
+    Entries are dropped when the image file changes on disk.
+    """
+    def __init__(self, image_path=BACKGROUND_IMAGE, max_entries=MAX_CACHED_BACKGROUNDS):
+        self.image_path = image_path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._watcher = QFileSystemWatcher()
+        if os.path.exists(image_path):
+            self._watcher.addPath(image_path)
+        self._watcher.fileChanged.connect(self._on_image_changed)
+
+    def has_image(self):
+        return os.path.exists(self.image_path)
+
+    def pixmap_for(self, size, device_pixel_ratio):
+        """Returns the background for a widget of the given logical size, or None if it can't be read."""
+        key = (size.width(), size.height(), round(device_pixel_ratio, 3))
+        pixmap = self._entries.get(key)
+        if pixmap is not None:
+            self._entries.move_to_end(key)
+            return pixmap
+
+        pixmap = self._render(size, device_pixel_ratio)
+        if pixmap is None:
+            return None
+        self._entries[key] = pixmap
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return pixmap
+
+    def reserve(self, count):
+        """Makes room for at least count sizes, e.g. one per connected screen."""
+        self.max_entries = max(self.max_entries, count)
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def _render(self, size, device_pixel_ratio):
+        reader = QImageReader(self.image_path)
+        source_size = reader.size()
+        if not source_size.isValid() or size.isEmpty():
+            return None
+
+        # Target size in physical pixels.
+        target_width = math.ceil(size.width() * device_pixel_ratio)
+        target_height = math.ceil(size.height() * device_pixel_ratio)
+
+        # Same geometry as KeepAspectRatioByExpanding followed by a centred crop.
+        scale = max(target_width / source_size.width(), target_height / source_size.height())
+        scaled_size = QSize(
+            max(target_width, round(source_size.width() * scale)),
+            max(target_height, round(source_size.height() * scale)),
+        )
+        reader.setScaledSize(scaled_size)
+        reader.setScaledClipRect(QRect(
+            (scaled_size.width() - target_width) // 2,
+            (scaled_size.height() - target_height) // 2,
+            target_width,
+            target_height,
+        ))
+
+        image = reader.read()
+        if image.isNull():
+            print(f"Could not read background image: {reader.errorString()}")
+            return None
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        return pixmap
+
+    def _on_image_changed(self, path):
+        self.invalidate()
+        # Editors often replace the file, which drops it from the watch list.
+        if os.path.exists(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+
+
+_shared_background_cache = None
+
+
+def get_background_cache():
+    """Returns the background cache shared by all overlay windows."""
+    global _shared_background_cache
+    if _shared_background_cache is None:
+        _shared_background_cache = BackgroundRenderCache()
+    return _shared_background_cache
@@ -0,0 +1,73 @@
+# scheduler.py
+
+import math
+import time
+from PyQt6.QtCore import QObject, QTimer, Qt
+
+# QTimer intervals are 32-bit milliseconds; longer deadlines are re-armed on the way.
+MAX_TIMER_INTERVAL_MS = 24 * 60 * 60 * 1000
+
+
+class WakeupScheduler(QObject):
+    """
+    Keeps a set of named deadlines and arms a single timer for the earliest one.
+    Scheduling an existing key replaces its previous deadline, so callers simply
+    re-schedule whenever they know when they next need to run. With nothing
+    scheduled the timer is stopped and the app causes no wakeups at all.
+    """
+    def __init__(self, clock=time.monotonic, parent=None):
+        super().__init__(parent)
+        self._clock = clock
+        self._deadlines = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self.run_due)
+
+    def now(self):
+        return self._clock()
+
+    def schedule_at(self, key, when, callback):
+        """Runs callback once at the monotonic time 'when'."""
+        self._deadlines[key] = (when, callback)
+        self._rearm()
+
+    def schedule_in(self, key, delay_seconds, callback):
+        self.schedule_at(key, self._clock() + delay_seconds, callback)
+
+    def cancel(self, *keys):
+        for key in keys:
+            self._deadlines.pop(key, None)
+        self._rearm()
+
+    def is_scheduled(self, key):
+        return key in self._deadlines
+
+    def next_deadline(self):
+        """Returns the earliest pending deadline, or None when nothing is scheduled."""
+        if not self._deadlines:
+            return None
+        return min(when for when, _ in self._deadlines.values())
+
+    def run_due(self):
+        """Runs every callback whose deadline has passed, then re-arms for the next one."""
+        now = self._clock()
+        due = [(when, key) for key, (when, _) in self._deadlines.items() if when <= now]
+        for _, key in sorted(due):
+            # An earlier callback may have cancelled or re-scheduled this key.
+            entry = self._deadlines.get(key)
+            if entry is None or entry[0] > now:
+                continue
+            del self._deadlines[key]
+            entry[1]()
+        self._rearm()
+
+    def _rearm(self):
+        deadline = self.next_deadline()
+        if deadline is None:
+            self._timer.stop()
+            return
+        # Round up so the timer never fires just before the deadline.
+        delay_ms = math.ceil(max(0.0, deadline - self._clock()) * 1000)
+        self._timer.start(min(delay_ms, MAX_TIMER_INTERVAL_MS))
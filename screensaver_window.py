@@ -1,28 +1,106 @@
 # screensaver_window.py
 
 import datetime
-import os
 from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QFrame
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-from PyQt6.QtGui import QPainter, QPixmap
+from PyQt6.QtCore import QEvent, Qt, QTimer
+from PyQt6.QtGui import QPainter
 
+from instrumentation import get_instruments
+from render_cache import get_background_cache
+from timeline import format_countdown
 
-class ScreensaverWindow(QWidget):
-    activity_detected = pyqtSignal()
 
+FONT_FAMILY = "'Segoe UI', 'Helvetica', sans-serif"
+
+
+class OverlayWindow(QWidget):
+    """
+    What every overlay window shares: frameless full-screen setup, the
+    background from the shared render cache, the clock, and the next event's
+    countdown. Input is interpreted by input_pipeline.InputPipeline, which is
+    installed as an event filter on every window.
+    Subclasses create clock_label, date_label and next_event_time_label.
+    """
     def __init__(self):
         super().__init__()
         self.setWindowTitle("FocusView")
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
         self.setMouseTracking(True)
-
-        image_path = 'background.jpg'
-        if os.path.exists(image_path):
-            self.background_pixmap = QPixmap(image_path)
-        else:
-            self.background_pixmap = None
+        self.next_event = None
+        # Called once the next frame has been painted; set by OverlayManager.show().
+        self.on_frame_painted = None
+        self.instruments = get_instruments()
+
+        # Pre-scaled backgrounds are shared with every other overlay window.
+        self.background_cache = get_background_cache()
+        if not self.background_cache.has_image():
             self.setStyleSheet("background-color: #1A2827;")
 
+    # --- Painting ---
+    def event(self, event):
+        kind = event.type()
+        if kind == QEvent.Type.UpdateRequest:
+            # Repaints of the window and all of its children happen inside this event.
+            with self.instruments.span('paint', window=type(self).__name__):
+                return super().event(event)
+        if kind == QEvent.Type.Paint and self.on_frame_painted is not None:
+            # Runs right after the children have painted and the frame was flushed.
+            QTimer.singleShot(0, self.on_frame_painted)
+            self.on_frame_painted = None
+        return super().event(event)
+
+    def paintEvent(self, event):
+        pixmap = self.background_cache.pixmap_for(self.size(), self.devicePixelRatioF())
+        if pixmap:
+            painter = QPainter(self)
+            painter.drawPixmap(0, 0, pixmap)
+            painter.end()
+        super().paintEvent(event)
+
+    # --- UI Updates ---
+    def update_time_and_date(self):
+        now = datetime.datetime.now()
+        self.clock_label.setText(now.strftime("%H:%M"))
+        self.date_label.setText(now.strftime("%A, %B %d"))
+
+    def update_idle_timer(self, seconds):
+        pass
+
+    def refresh_countdown(self, now=None):
+        """
+        Re-renders the next event's countdown if its text changed.
+        Returns the moment the text will change next, or None if it won't.
+        now defaults to the current local time.
+        """
+        if self.next_event is None:
+            return None
+        text, next_change = self.format_countdown(self.next_event.start, now or datetime.datetime.now().astimezone())
+        if self.next_event_time_label.text() != text:
+            self.next_event_time_label.setText(text)
+        return next_change
+
+    # --- Helper Functions ---
+    def format_countdown(self, dt_event, now):
+        return format_countdown(dt_event, now)
+
+    def format_event_time(self, event):
+        if event.all_day:
+            return "All Day"
+        return event.start.strftime("%I:%M %p")
+
+    def format_idle_time(self, total_seconds):
+        total_seconds = int(total_seconds)
+        if total_seconds < 60:
+            return f"Away for {total_seconds} seconds"
+        minutes = total_seconds // 60
+        return f"Away for {minutes} minutes"
+
+
+class ScreensaverWindow(OverlayWindow):
+    """The full overlay for the primary screen: clock, next event, agenda and idle time."""
+    def __init__(self):
+        super().__init__()
+
         # --- Layouts ---
         window_layout = QVBoxLayout(self)
         window_layout.setContentsMargins(0, 0, 0, 0)
@@ -90,6 +168,10 @@ class ScreensaverWindow(QWidget):
         right_panel_layout.addWidget(agenda_title, alignment=Qt.AlignmentFlag.AlignHCenter)
         self.agenda_items_layout = QVBoxLayout()
         self.agenda_items_layout.setSpacing(10)
+        # Visible agenda cards keyed by event identity, in display order, plus
+        # detached cards kept around for reuse.
+        self.agenda_cards = {}
+        self.agenda_card_pool = []
         agenda_items_widget = QWidget()
         agenda_items_widget.setLayout(self.agenda_items_layout)
         right_panel_layout.addWidget(agenda_items_widget)
@@ -99,51 +181,12 @@ class ScreensaverWindow(QWidget):
         main_content_layout.addLayout(left_panel_layout, 2)
         main_content_layout.addLayout(right_panel_layout, 1)
 
-        # --- Apply Styles & Timers ---
+        # --- Apply Styles ---
+        # The clock is refreshed by the controller's scheduler, and only while visible.
         self.apply_styles()
-        self.clock_timer = QTimer(self)
-        self.clock_timer.timeout.connect(self.update_time_and_date)
-        self.clock_timer.start(1000)
         self.update_time_and_date()
 
-    # --- Event Handlers ---
-    def keyPressEvent(self, event):
-        """Ignore Alt key so it can be used for menu actions."""
-        key = event.key()
-        if key in (Qt.Key.Key_Alt, Qt.Key.Key_AltGr):
-            event.accept()
-            return
-        # all other keys count as activity
-        self.activity_detected.emit()
-        super().keyPressEvent(event)
-
-    def mousePressEvent(self, event):
-        """Ignore right-clicks to allow context menu."""
-        if event.button() == Qt.MouseButton.RightButton:
-            event.accept()
-            return
-        # Left and middle clicks count as activity
-        self.activity_detected.emit()
-        super().mousePressEvent(event)
-
-    def mouseMoveEvent(self, event):
-        """Mouse movement still counts as activity."""
-        self.activity_detected.emit()
-        super().mouseMoveEvent(event)
-
-    # --- Painting & Layout ---
-    def paintEvent(self, event):
-        if self.background_pixmap:
-            painter = QPainter(self)
-            scaled_pixmap = self.background_pixmap.scaled(
-                self.size(),
-                Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            point = self.rect().center() - scaled_pixmap.rect().center()
-            painter.drawPixmap(point, scaled_pixmap)
-        super().paintEvent(event)
-
+    # --- Layout ---
     def resizeEvent(self, event):
         super().resizeEvent(event)
         x = self.width() - self.idle_timer_label.width() - 20
@@ -152,7 +195,7 @@ class ScreensaverWindow(QWidget):
 
     # --- UI Updates ---
     def apply_styles(self):
-        font_family = "'Segoe UI', 'Helvetica', sans-serif"
+        font_family = FONT_FAMILY
         self.setStyleSheet(f"""
             #glassCard, .agendaCard {{
                 background-color: rgba(0, 0, 0, 0.35);
@@ -193,84 +236,135 @@ class ScreensaverWindow(QWidget):
             QFrame[frameShape="5"] {{ color: rgba(255, 255, 255, 0.2); }}
         """)
 
-    def update_time_and_date(self):
-        now = datetime.datetime.now()
-        self.clock_label.setText(now.strftime("%H:%M"))
-        self.date_label.setText(now.strftime("%A, %B %d"))
-
-    def _create_agenda_card(self, event):
+    def _create_agenda_card(self):
         card = QFrame()
         card.setProperty("class", "agendaCard")
         layout = QVBoxLayout(card)
         layout.setSpacing(4)
         layout.setContentsMargins(12, 10, 12, 10)
-        summary_label = QLabel(event['summary'])
-        summary_label.setProperty("class", "agendaSummary")
-        time_label = QLabel(self.format_event_time(event['start']))
-        time_label.setProperty("class", "agendaTime")
-        layout.addWidget(summary_label)
-        layout.addWidget(time_label)
+        card.summary_label = QLabel()
+        card.summary_label.setProperty("class", "agendaSummary")
+        card.time_label = QLabel()
+        card.time_label.setProperty("class", "agendaTime")
+        layout.addWidget(card.summary_label)
+        layout.addWidget(card.time_label)
         return card
 
+    def _set_card_content(self, card, event):
+        # Only touch labels whose text actually changed, so unchanged cards cause no relayout.
+        summary = event.summary
+        time_text = self.format_event_time(event)
+        if card.summary_label.text() != summary:
+            card.summary_label.setText(summary)
+        if card.time_label.text() != time_text:
+            card.time_label.setText(time_text)
+
+    def _agenda_keys(self, events):
+        """Returns a unique identity per event; repeated ids get an occurrence counter."""
+        keys = []
+        seen = {}
+        for event in events:
+            key = event.id
+            count = seen.get(key, 0)
+            seen[key] = count + 1
+            keys.append((key, count))
+        return keys
+
+    def _reconcile_agenda(self, agenda_events):
+        """
+        Brings the agenda cards in line with agenda_events.
+        Cards of events that are still listed are kept, new events reuse pooled
+        cards, and the layout is only reordered where positions changed.
+        """
+        keys = self._agenda_keys(agenda_events)
+        old_cards = self.agenda_cards
+        new_cards = {}
+        for key, event in zip(keys, agenda_events):
+            card = old_cards.pop(key, None)
+            if card is None:
+                card = self.agenda_card_pool.pop() if self.agenda_card_pool else self._create_agenda_card()
+            self._set_card_content(card, event)
+            new_cards[key] = card
+
+        # Detach cards of events that disappeared and keep them for later.
+        for card in old_cards.values():
+            self.agenda_items_layout.removeWidget(card)
+            card.hide()
+            self.agenda_card_pool.append(card)
+
+        for index, key in enumerate(keys):
+            card = new_cards[key]
+            if self.agenda_items_layout.indexOf(card) != index:
+                self.agenda_items_layout.removeWidget(card)
+                self.agenda_items_layout.insertWidget(index, card)
+            if card.isHidden():
+                card.show()
+        self.agenda_cards = new_cards
+
     def update_idle_timer(self, seconds):
         self.idle_timer_label.setText(self.format_idle_time(seconds))
         self.idle_timer_label.adjustSize()
 
     def update_events(self, events):
-        for i in reversed(range(self.agenda_items_layout.count())):
-            item = self.agenda_items_layout.takeAt(i)
-            if item.widget():
-                item.widget().deleteLater()
-
         if not events:
+            self.next_event = None
+            self._reconcile_agenda([])
             self.next_event_summary_label.setText("No upcoming events")
             self.next_event_time_label.setText("")
             return
 
-        first_event = events[0]
-        self.next_event_summary_label.setText(first_event['summary'])
-        try:
-            event_dt = datetime.datetime.fromisoformat(first_event['start']).astimezone()
-            relative_str, _ = self.format_relative_time(event_dt)
-            self.next_event_time_label.setText(relative_str)
-        except (ValueError, TypeError):
-            self.next_event_time_label.setText(self.format_event_time(first_event['start']))
+        self.next_event = events[0]
+        self.next_event_summary_label.setText(self.next_event.summary)
+        self.refresh_countdown()
 
-        agenda_events = events[1:6]
-        for event in agenda_events:
-            card = self._create_agenda_card(event)
-            self.agenda_items_layout.addWidget(card)
+        # New cards pick up the window stylesheet when they are parented, so
+        # there is no need to re-polish the whole window here.
+        self._reconcile_agenda(events[1:6])
 
-        self.style().unpolish(self)
-        self.style().polish(self)
 
-    # --- Helper Functions ---
-    def format_idle_time(self, total_seconds):
-        total_seconds = int(total_seconds)
-        if total_seconds < 60:
-            return f"Away for {total_seconds} seconds"
-        minutes = total_seconds // 60
-        return f"Away for {minutes} minutes"
+class SecondaryOverlayWindow(OverlayWindow):
+    """
+    Lightweight overlay for additional screens: just the clock and the next
+    event, so extra monitors add little layout and styling work to a show.
+    """
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.setSpacing(20)
+
+        self.clock_label = QLabel()
+        self.clock_label.setObjectName("clockLabel")
+        self.date_label = QLabel()
+        self.date_label.setObjectName("dateLabel")
+        self.next_event_summary_label = QLabel("Checking calendar...")
+        self.next_event_summary_label.setObjectName("nextEventSummary")
+        self.next_event_summary_label.setWordWrap(True)
+        self.next_event_time_label = QLabel("")
+        self.next_event_time_label.setObjectName("nextEventTime")
+        for label in (self.clock_label, self.date_label, self.next_event_summary_label, self.next_event_time_label):
+            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            layout.addWidget(label, alignment=Qt.AlignmentFlag.AlignCenter)
 
-    def format_relative_time(self, dt_event):
-        now = datetime.datetime.now().astimezone()
-        delta = dt_event - now
-        if delta.total_seconds() <= 1:
-            return "starts now", "high"
-        days, hours, minutes = delta.days, int(delta.total_seconds() / 3600) % 24, int(delta.total_seconds() / 60) % 60
-        if days > 1:
-            return f"in {days} days", "low"
-        if days == 1:
-            return "in 1 day", "low"
-        if hours > 0:
-            return f"in {hours}h {minutes}m", "medium"
-        return f"in {minutes} minutes", "high"
-
-    def format_event_time(self, time_str):
-        try:
-            if 'T' not in time_str:
-                return "All Day"
-            dt = datetime.datetime.fromisoformat(time_str).astimezone()
-            return dt.strftime("%I:%M %p")
-        except (ValueError, TypeError):
-            return ""
+        self.setStyleSheet(f"""
+            QLabel {{
+                color: #FFFFFF;
+                font-family: {FONT_FAMILY};
+                background-color: transparent;
+            }}
+            #clockLabel {{ font-size: 160px; font-weight: 400; }}
+            #dateLabel {{ font-size: 30px; font-weight: 400; }}
+            #nextEventSummary {{ font-size: 30px; font-weight: 500; }}
+            #nextEventTime {{ font-size: 24px; font-weight: 400; }}
+        """)
+        self.update_time_and_date()
+
+    def update_events(self, events):
+        self.next_event = events[0] if events else None
+        if self.next_event is None:
+            self.next_event_summary_label.setText("No upcoming events")
+            self.next_event_time_label.setText("")
+            return
+        if self.next_event_summary_label.text() != self.next_event.summary:
+            self.next_event_summary_label.setText(self.next_event.summary)
+        self.refresh_countdown()
@@ -0,0 +1,195 @@
+# state_store.py
+
+import ctypes
+import json
+import os
+import sys
+import time
+
+STATE_FILE = 'focusview_state.jsonl'
+STATE_VERSION = 1
+# Once the journal holds this many records after its snapshot, it is rewritten
+# as a single snapshot, so startup never replays more than this many lines.
+COMPACT_AFTER_RECORDS = 64
+# "Done" marks older than this are dropped at compaction; their events are long over.
+COMPLETED_RETENTION_SECONDS = 30 * 24 * 60 * 60
+# Two boot time readings this close together belong to the same boot.
+BOOT_TIME_TOLERANCE_SECONDS = 60
+
+
+def boot_time():
+    """Returns when the machine booted (seconds since the epoch), or None if unknown."""
+    try:
+        if sys.platform == 'win32':
+            ctypes.windll.kernel32.GetTickCount64.restype = ctypes.c_uint64
+            return time.time() - ctypes.windll.kernel32.GetTickCount64() / 1000
+        with open('/proc/stat', 'r') as f:
+            for line in f:
+                if line.startswith('btime '):
+                    return float(line.split()[1])
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+class AppState:
+    """
+    The user's overlay choices (snooze, postpone, close for session, events
+    marked as done), kept in an append-only journal of JSON lines.
+    Every change appends and fsyncs exactly one line, so nothing is written
+    unless the user (or a postponement ending) changes something, and a crash
+    loses at most the line being written: a torn last line is skipped on load.
+    The first line is a snapshot of the whole state; after
+    COMPACT_AFTER_RECORDS changes the file is atomically rewritten as a new
+    snapshot, which keeps the restore at startup bounded.
+    "Close overlay for session" only holds until the machine reboots.
+    """
+    def __init__(self, path=STATE_FILE, clock=time.time, current_boot=None):
+        self.path = path
+        self.clock = clock
+        self.current_boot = current_boot if current_boot is not None else boot_time()
+        self.snooze_until = 0.0
+        # Wall-clock time the overlay was postponed until the next event, or None.
+        self.postponed_at = None
+        self.closed_boot = None
+        self._completed = {}
+        self._records = 0
+        self.load()
+
+    # --- Queries ---
+
+    def is_snoozed(self):
+        return self.clock() < self.snooze_until
+
+    def is_postponed(self):
+        return self.postponed_at is not None
+
+    @property
+    def session_closed(self):
+        if self.closed_boot is None or self.current_boot is None:
+            return False
+        return abs(self.closed_boot - self.current_boot) < BOOT_TIME_TOLERANCE_SECONDS
+
+    def is_suppressed(self):
+        """True while the overlay must not appear for any of the user's reasons."""
+        return self.session_closed or self.is_snoozed() or self.is_postponed()
+
+    @property
+    def completed_events(self):
+        """Ids of events marked as done; a live view that supports 'in'."""
+        return self._completed.keys()
+
+    # --- Changes ---
+
+    def snooze(self, seconds):
+        self.snooze_until = self.clock() + seconds
+        self._append({'op': 'snooze', 'until': self.snooze_until})
+
+    def postpone(self):
+        self.postponed_at = self.clock()
+        self._append({'op': 'postpone', 'at': self.postponed_at})
+
+    def end_postpone(self):
+        if self.postponed_at is None:
+            return
+        self.postponed_at = None
+        self._append({'op': 'postpone', 'at': None})
+
+    def close_session(self):
+        self.closed_boot = self.current_boot
+        self._append({'op': 'close', 'boot': self.closed_boot})
+
+    def mark_done(self, event_id):
+        if event_id in self._completed:
+            return
+        self._completed[event_id] = self.clock()
+        self._append({'op': 'done', 'id': event_id, 'at': self._completed[event_id]})
+
+    # --- Journal ---
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'snapshot':
+            self.snooze_until = record['snooze_until']
+            self.postponed_at = record['postponed_at']
+            self.closed_boot = record['closed_boot']
+            self._completed.clear()
+            self._completed.update(record['completed'])
+        elif op == 'snooze':
+            self.snooze_until = record['until']
+        elif op == 'postpone':
+            self.postponed_at = record['at']
+        elif op == 'close':
+            self.closed_boot = record['boot']
+        elif op == 'done':
+            self._completed[record['id']] = record['at']
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f"Ignoring unreadable state journal '{self.path}': {e}")
+            return
+        damaged = False
+        for number, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+                if number == 0 and record.get('version') != STATE_VERSION:
+                    # An unknown format is replaced by a fresh snapshot on the next change.
+                    self._records = COMPACT_AFTER_RECORDS
+                    return
+                self._apply(record)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # Only a crash mid-append leaves a bad line, and it can only be the last one.
+                print(f"Skipping damaged line {number + 1} of state journal '{self.path}'.")
+                damaged = True
+        self._records = max(0, len(lines) - 1)
+        if damaged or (lines and not lines[-1].endswith('\n')):
+            # Appending after a torn line would glue the next record onto it; compact instead.
+            self._records = COMPACT_AFTER_RECORDS
+
+    def _snapshot(self):
+        # Pruned in place: timelines hold live views of this dict.
+        cutoff = self.clock() - COMPLETED_RETENTION_SECONDS
+        for event_id in [event_id for event_id, at in self._completed.items() if at < cutoff]:
+            del self._completed[event_id]
+        return {
+            'op': 'snapshot',
+            'version': STATE_VERSION,
+            'snooze_until': self.snooze_until,
+            'postponed_at': self.postponed_at,
+            'closed_boot': self.closed_boot,
+            'completed': self._completed,
+        }
+
+    def _append(self, record):
+        if self._records >= COMPACT_AFTER_RECORDS or not os.path.exists(self.path):
+            self.compact()
+            return
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Could not write state journal '{self.path}': {e}")
+            return
+        self._records += 1
+
+    def compact(self):
+        """Rewrites the journal as one snapshot of the current state."""
+        # Write to a temp file first so a crash never leaves a truncated journal behind.
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self._snapshot(), separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write state journal '{self.path}': {e}")
+            return
+        self._records = 0
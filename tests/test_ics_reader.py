@@ -0,0 +1,175 @@
+"""Recurrence expansion checked against the examples in RFC 5545, section 3.8.5.3."""
+
+import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import ics_reader
+from ics_reader import expand_events, expand_rrule, iter_vevents, parse_time_value
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+
+def expand(rule, dtstart, until_day=datetime.date(1999, 1, 1)):
+    start, zone, _ = parse_time_value(['America/New_York', dtstart])
+    return [f'{occurrence:%Y%m%d}' for occurrence in expand_rrule(rule, start, zone, None, until_day)]
+
+
+def events_from(text, window_start, window_end):
+    return expand_events(iter_vevents(text.strip().splitlines()), window_start, window_end)
+
+
+def ny(*args):
+    return datetime.datetime(*args, tzinfo=NEW_YORK)
+
+
+@pytest.mark.parametrize('rule, dtstart, expected', [
+    pytest.param(
+        'FREQ=DAILY;COUNT=10', '19970902T090000',
+        ['19970902', '19970903', '19970904', '19970905', '19970906',
+         '19970907', '19970908', '19970909', '19970910', '19970911'],
+        id='daily-count',
+    ),
+    pytest.param(
+        'FREQ=DAILY;UNTIL=19970907T000000Z', '19970902T090000',
+        ['19970902', '19970903', '19970904', '19970905', '19970906'],
+        id='daily-until',
+    ),
+    pytest.param(
+        'FREQ=WEEKLY;INTERVAL=2;COUNT=4;BYDAY=TU,SU;WKST=MO', '19970805T090000',
+        ['19970805', '19970810', '19970819', '19970824'],
+        id='wkst-mo',
+    ),
+    pytest.param(
+        'FREQ=WEEKLY;INTERVAL=2;COUNT=4;BYDAY=TU,SU;WKST=SU', '19970805T090000',
+        ['19970805', '19970817', '19970819', '19970831'],
+        id='wkst-su',
+    ),
+    pytest.param(
+        'FREQ=WEEKLY;INTERVAL=2;UNTIL=19971224T000000Z;WKST=SU;BYDAY=MO,WE,FR', '19970901T090000',
+        ['19970901', '19970903', '19970905', '19970915', '19970917', '19970919', '19970929',
+         '19971001', '19971003', '19971013', '19971015', '19971017', '19971027', '19971029', '19971031',
+         '19971110', '19971112', '19971114', '19971124', '19971126', '19971128',
+         '19971208', '19971210', '19971212', '19971222'],
+        id='biweekly-until',
+    ),
+    pytest.param(
+        'FREQ=MONTHLY;COUNT=10;BYDAY=1FR', '19970905T090000',
+        ['19970905', '19971003', '19971107', '19971205', '19980102',
+         '19980206', '19980306', '19980403', '19980501', '19980605'],
+        id='monthly-first-friday',
+    ),
+    pytest.param(
+        'FREQ=MONTHLY;COUNT=3;BYDAY=TU,WE,TH;BYSETPOS=3', '19970904T090000',
+        ['19970904', '19971007', '19971106'],
+        id='bysetpos-third',
+    ),
+    pytest.param(
+        'FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-2', '19970929T090000',
+        ['19970929', '19971030', '19971127', '19971230', '19980129', '19980226', '19980330'],
+        id='bysetpos-second-to-last',
+    ),
+    pytest.param(
+        'FREQ=YEARLY;BYMONTH=3;BYDAY=TH', '19970313T090000',
+        ['19970313', '19970320', '19970327', '19980305', '19980312', '19980319', '19980326'],
+        id='yearly-bymonth-byday',
+    ),
+])
+def test_rfc5545_examples(rule, dtstart, expected):
+    until_day = datetime.date(1998, 3, 31) if 'COUNT' not in rule and 'UNTIL' not in rule else None
+    assert expand(rule, dtstart, until_day) == expected
+
+
+def test_wkst_when_skipping_to_the_window():
+    """Rules without COUNT jump ahead to the window; the jump must keep WKST's week boundaries."""
+    start, zone, _ = parse_time_value(['America/New_York', '19970805T090000'])
+    rule = 'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,SU;WKST=SU'
+    every = list(expand_rrule(rule, start, zone, None, datetime.date(1997, 12, 31)))
+    skipped = list(expand_rrule(rule, start, zone, datetime.date(1997, 11, 1), datetime.date(1997, 12, 31)))
+    assert skipped == [occurrence for occurrence in every if occurrence >= skipped[0]]
+    assert skipped[0].date() <= datetime.date(1997, 11, 1)
+
+
+def test_unsupported_parts_show_the_first_occurrence_with_a_warning(capsys):
+    ics_reader._warned_rules.clear()
+    assert expand('FREQ=YEARLY;BYWEEKNO=20;BYDAY=MO', '19970512T090000') == ['19970512']
+    assert 'BYWEEKNO not supported' in capsys.readouterr().out
+
+
+def test_exdate_and_recurrence_id():
+    events = events_from("""
+BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:standup
+SUMMARY:Standup
+DTSTART;TZID=America/New_York:19970902T090000
+DTEND;TZID=America/New_York:19970902T091500
+RRULE:FREQ=DAILY;COUNT=5
+EXDATE;TZID=America/New_York:19970903T090000
+END:VEVENT
+BEGIN:VEVENT
+UID:standup
+RECURRENCE-ID;TZID=America/New_York:19970905T090000
+SUMMARY:Standup (moved)
+DTSTART;TZID=America/New_York:19970905T140000
+DTEND;TZID=America/New_York:19970905T141500
+END:VEVENT
+BEGIN:VEVENT
+UID:standup
+RECURRENCE-ID;TZID=America/New_York:19970906T090000
+STATUS:CANCELLED
+DTSTART;TZID=America/New_York:19970906T090000
+END:VEVENT
+END:VCALENDAR
+""", ny(1997, 9, 1), ny(1997, 9, 30))
+    assert sorted((event.start, event.summary) for event in events) == [
+        (ny(1997, 9, 2, 9), 'Standup'),
+        (ny(1997, 9, 4, 9), 'Standup'),
+        (ny(1997, 9, 5, 14), 'Standup (moved)'),
+    ]
+    assert len({event.id for event in events}) == 3
+
+
+def test_events_without_uid_keep_their_id_when_reordered():
+    first = """
+BEGIN:VEVENT
+SUMMARY:Dentist
+DTSTART:19970910T150000Z
+DTEND:19970910T160000Z
+END:VEVENT"""
+    second = """
+BEGIN:VEVENT
+SUMMARY:Lunch
+DTSTART:19970911T160000Z
+DTEND:19970911T170000Z
+END:VEVENT"""
+    window = (ny(1997, 9, 1), ny(1997, 9, 30))
+
+    def ids(text):
+        return {event.summary: event.id for event in events_from(text, *window)}
+
+    assert ids(first + second) == ids(second + first)
+
+
+@pytest.mark.parametrize('bad_lines', [
+    pytest.param(['DTSTART:19970902T090000Z', 'RRULE:FREQ=MONTHLY;BYDAY=1XMO'], id='byday-ordinal'),
+    pytest.param(['DTSTART:19970902T090000Z', 'RRULE:FREQ=WEEKLY;INTERVAL=two'], id='interval'),
+    pytest.param(['DTSTART:1997090'], id='truncated-dtstart'),
+    pytest.param(['DTSTART:19970902T09'], id='truncated-dtstart-time'),
+])
+def test_malformed_events_are_skipped(bad_lines, capsys):
+    bad = '\n'.join(['BEGIN:VEVENT', 'UID:broken', 'SUMMARY:Broken', *bad_lines, 'END:VEVENT'])
+    events = events_from(f"""
+BEGIN:VCALENDAR
+{bad}
+BEGIN:VEVENT
+UID:fine
+SUMMARY:Fine
+DTSTART:19970910T150000Z
+DTEND:19970910T160000Z
+END:VEVENT
+END:VCALENDAR
+""", ny(1997, 9, 1), ny(1997, 9, 30))
+    assert [event.summary for event in events] == ['Fine']
+    assert "Skipping malformed calendar event 'broken'" in capsys.readouterr().out
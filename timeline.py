@@ -0,0 +1,86 @@
+# timeline.py
+
+import datetime
+from bisect import bisect_right
+
+
+def format_countdown(dt_event, now):
+    """
+    Returns (text, next_change) for an event starting at dt_event.
+    next_change is the first moment the text differs, or None once it reads "starts now".
+    """
+    remaining = (dt_event - now).total_seconds()
+    if remaining <= 1:
+        return "starts now", None
+    if remaining >= 86400:
+        days = int(remaining // 86400)
+        text = "in 1 day" if days == 1 else f"in {days} days"
+        boundary = days * 86400
+    else:
+        total_minutes = int(remaining // 60)
+        hours, minutes = total_minutes // 60, total_minutes % 60
+        text = f"in {hours}h {minutes}m" if hours > 0 else f"in {minutes} minutes"
+        boundary = max(total_minutes * 60, 1)
+    # The text changes as soon as the remaining time drops below the boundary.
+    return text, dt_event - datetime.timedelta(seconds=boundary) + datetime.timedelta(milliseconds=1)
+
+
+class EventTimeline:
+    """
+    Sorted interval index over CalendarEvent records.
+    Answers what is running now, what comes next and when the next state
+    transition (an event starting or ending) happens, using bisect on the start
+    times and a running maximum of end times to bound the backwards scan.
+    Events whose id is in 'completed' are skipped by every query.
+    """
+    def __init__(self, events=(), completed=frozenset()):
+        self.events = sorted(events, key=lambda event: event.start)
+        self.starts = [event.start for event in self.events]
+        self.completed = completed
+
+        # max_end[i] is the latest end among events[0..i]; scanning back from
+        # 'now' can stop as soon as it drops to or below 'now'.
+        self.max_end = []
+        latest = None
+        for event in self.events:
+            latest = event.end if latest is None or event.end > latest else latest
+            self.max_end.append(latest)
+
+    def _is_active(self, event):
+        return event.id not in self.completed
+
+    def current(self, now):
+        """Returns the events running at 'now', earliest start first."""
+        running = []
+        index = bisect_right(self.starts, now) - 1
+        while index >= 0 and self.max_end[index] > now:
+            event = self.events[index]
+            if event.end > now and self._is_active(event):
+                running.append(event)
+            index -= 1
+        running.reverse()
+        return running
+
+    def next(self, now):
+        """Returns the first event starting after 'now', or None."""
+        for index in range(bisect_right(self.starts, now), len(self.events)):
+            event = self.events[index]
+            if self._is_active(event):
+                return event
+        return None
+
+    def current_or_next(self, now):
+        running = self.current(now)
+        return running[0] if running else self.next(now)
+
+    def upcoming(self, now):
+        """Returns the events that have not ended yet, ordered by start."""
+        return [event for event in self.events if event.end > now and self._is_active(event)]
+
+    def next_transition(self, now):
+        """Returns the next moment an event starts or a running event ends, or None."""
+        candidates = [event.end for event in self.current(now)]
+        upcoming = self.next(now)
+        if upcoming is not None:
+            candidates.append(upcoming.start)
+        return min(candidates) if candidates else None
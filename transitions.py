@@ -0,0 +1,132 @@
+# transitions.py
+
+import time
+from PyQt6.QtCore import QEasingCurve, QObject, QVariantAnimation, Qt
+
+from instrumentation import get_instruments
+
+FADE_IN_MS = 300
+FADE_OUT_MS = 150
+# Assumed when the screen doesn't report its refresh rate.
+DEFAULT_REFRESH_HZ = 60.0
+# A frame counts as dropped when it took longer than this many frame budgets.
+DROPPED_FRAME_FACTOR = 1.5
+
+
+class FrameMetrics:
+    """Frame pacing of one animation: how many frames, the worst gap between two, and how many were dropped."""
+    def __init__(self, refresh_hz):
+        self.budget = 1.0 / refresh_hz
+        self.started = time.perf_counter()
+        self.last_frame = self.started
+        self.frames = 0
+        self.worst_frame = 0.0
+        self.dropped_frames = 0
+
+    def frame(self):
+        now = time.perf_counter()
+        interval = now - self.last_frame
+        self.last_frame = now
+        self.frames += 1
+        self.worst_frame = max(self.worst_frame, interval)
+        if interval > self.budget * DROPPED_FRAME_FACTOR:
+            # Every whole budget the frame overran by is a frame the display didn't get.
+            self.dropped_frames += max(1, round(interval / self.budget) - 1)
+
+    def as_dict(self):
+        return {
+            'frames': self.frames,
+            'duration_ms': round((self.last_frame - self.started) * 1000, 1),
+            'worst_frame_ms': round(self.worst_frame * 1000, 1),
+            'dropped_frames': self.dropped_frames,
+        }
+
+
+class OverlayFade(QObject):
+    """
+    Fades the overlay windows in and out through their window opacity, which the
+    compositor applies to the already rendered window, so no frame of the fade
+    relayouts, re-polishes a stylesheet or even repaints a widget. Without a
+    compositor the opacity is ignored and the windows simply appear.
+    A fade-out makes the windows transparent for input at once, so the click or
+    keystroke that ended the overlay reaches the application underneath, and a
+    fade in either direction reverses from the current opacity.
+    Frame pacing of the last fade in each direction is kept in last_metrics.
+    """
+    def __init__(self, windows, parent=None):
+        super().__init__(parent)
+        # Callable returning the windows to fade; the set changes with hot-plugged screens.
+        self.windows = windows
+        self.opacity = 0.0
+        self.direction = None
+        self.metrics = None
+        self.last_metrics = {}
+        self._on_hidden = None
+
+        self._animation = QVariantAnimation(self)
+        self._animation.setEasingCurve(QEasingCurve.Type.OutCubic)
+        self._animation.valueChanged.connect(self._on_frame)
+        self._animation.finished.connect(self._on_finished)
+
+    def fade_in(self, refresh_hz=None):
+        """Fades the shown windows in from their current opacity and lets them take input again."""
+        self._set_input_transparent(False)
+        self._start('in', 1.0, FADE_IN_MS, refresh_hz)
+
+    def fade_out(self, on_hidden, refresh_hz=None):
+        """Fades out and then calls on_hidden, unless a fade-in interrupts it first."""
+        self._on_hidden = on_hidden
+        self._set_input_transparent(True)
+        self._start('out', 0.0, FADE_OUT_MS, refresh_hz)
+
+    def apply(self, window):
+        """Brings a window that joins mid-way (a new screen) to the current opacity."""
+        window.setWindowOpacity(self.opacity)
+
+    def stop(self):
+        self._on_hidden = None
+        self._animation.stop()
+
+    def _start(self, direction, target, duration_ms, refresh_hz):
+        self._animation.stop()
+        if direction == 'in':
+            self._on_hidden = None
+        distance = abs(target - self.opacity)
+        self.direction = direction
+        self.metrics = FrameMetrics(refresh_hz or DEFAULT_REFRESH_HZ)
+        self._animation.setStartValue(self.opacity)
+        self._animation.setEndValue(target)
+        # A reversed fade only covers the remaining distance, at the same speed.
+        self._animation.setDuration(max(1, round(duration_ms * distance)))
+        self._animation.start()
+
+    def _on_frame(self, value):
+        self.opacity = value
+        for window in self.windows():
+            window.setWindowOpacity(value)
+        if self.metrics is not None:
+            self.metrics.frame()
+
+    def _on_finished(self):
+        if self.metrics is not None:
+            metrics = self.last_metrics[self.direction] = self.metrics.as_dict()
+            self.metrics = None
+            instruments = get_instruments()
+            instruments.count('dropped_frames', metrics['dropped_frames'], fade=self.direction)
+            instruments.log(
+                'fade',
+                f"Fade {self.direction}: {metrics['frames']} frames in {metrics['duration_ms']} ms, "
+                f"worst frame {metrics['worst_frame_ms']} ms, {metrics['dropped_frames']} dropped.",
+                direction=self.direction,
+                **metrics,
+            )
+        if self.direction == 'out' and self._on_hidden is not None:
+            on_hidden, self._on_hidden = self._on_hidden, None
+            on_hidden()
+
+    def _set_input_transparent(self, transparent):
+        # Set on the native window; QWidget.setWindowFlags would recreate it.
+        for window in self.windows():
+            handle = window.windowHandle()
+            if handle is not None:
+                handle.setFlag(Qt.WindowType.WindowTransparentForInput, transparent)